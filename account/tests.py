@@ -1,3 +1,66 @@
-from django.test import TestCase
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
 
-# Create your tests here.
+from monitoring.testing import QueryBudgetTestCase
+from .token import user_tokenizer_generate
+
+class AccountQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_register(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('register')))
+
+    def test_email_verify(self):
+        uid = urlsafe_base64_encode(force_bytes(self.customer.pk))
+        token = user_tokenizer_generate.make_token(self.customer)
+        url = reverse('email_verify', args=[uid, token])
+        self.assertQueryBudget(2, lambda: self.client.get(url), status=302)
+
+    def test_email_sent(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('email_sent')))
+
+    def test_email_success(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('email_success')))
+
+    def test_email_fail(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('email_fail')))
+
+    def test_my_login(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('my_login')))
+
+    def test_user_logout(self):
+        self.client.force_login(self.customer)
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('user_logout')), status=302)
+
+    def test_password_reset(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('password_reset')))
+
+    def test_password_reset_done(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('password_reset_done')))
+
+    def test_password_reset_confirm(self):
+        url = reverse('password_reset_confirm', args=['invalid', 'invalid-token'])
+        self.assertQueryBudget(1, lambda: self.client.get(url))
+
+    def test_password_reset_complete(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('password_reset_complete')))
+
+    def test_dashboard(self):
+        self.client.force_login(self.customer)
+        self.assertQueryBudget(2, lambda: self.client.get(reverse('dashboard')))
+
+    def test_profile_management(self):
+        self.client.force_login(self.customer)
+        self.assertQueryBudget(2, lambda: self.client.get(reverse('profile_management')))
+
+    def test_delete_account(self):
+        self.client.force_login(self.customer)
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('delete_account')))
+
+    def test_manage_shipping(self):
+        self.client.force_login(self.customer)
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('manage_shipping')))
+
+    def test_track_orders(self):
+        self.client.force_login(self.customer)
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('track_orders')))
@@ -135,7 +135,7 @@ def manage_shipping(request):
 @login_required(login_url='my_login')
 def track_orders(request):
     try:
-        orders = OrderItem.objects.filter(user=request.user)
+        orders = OrderItem.objects.filter(user=request.user).select_related('product')
         context = {'orders': orders}
         return render(request, 'account/track_orders.html', context=context)  
     except OrderItem.DoesNotExist:
@@ -1,5 +1,5 @@
 from decimal import Decimal
-from store.models import Product
+from store.snapshot import get_catalog_snapshot
 
 class Cart():
     def __init__(self, request):
@@ -11,6 +11,22 @@ class Cart():
 
         self.cart = cart
 
+    @classmethod
+    async def aload(cls, request):
+        """
+        The cart for an async view, loading the session with its async API
+
+        The session stays loaded afterwards, so the other methods don't
+        touch the database.
+        """
+        cart = cls.__new__(cls)
+        cart.session = request.session
+        cart.cart = await request.session.aget('session_key')
+        if cart.cart is None:
+            cart.cart = {}
+            await request.session.aset('session_key', cart.cart)
+        return cart
+
     def add(self, product, product_qty):
         product_id = str(product.id)
         if isinstance(product_qty, str):
@@ -38,14 +54,14 @@ class Cart():
         return sum(item['qty'] for item in self.cart.values())
     
     def __iter__(self):
-        all_product_ids = self.cart.keys()
-        products = Product.objects.filter(id__in=all_product_ids)
-        # OPTIMIZED: Prefetch related images to avoid additional database queries
-        products = Product.objects.filter(id__in=all_product_ids).prefetch_related('images')
+        # Products and their images come from the in-memory catalog snapshot
+        snapshot = get_catalog_snapshot()
         import copy
         cart = copy.deepcopy(self.cart)
-        for product in products:
-            cart[str(product.id)]['product'] = product
+        for product_id, item in cart.items():
+            product = snapshot.get_product(int(product_id))
+            if product is not None:
+                item['product'] = product
         for item in cart.values():
             item['price'] = Decimal(item['price'])
             item['total_price'] = item['price'] * item['qty']
@@ -1,3 +1,85 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.sessions.backends.db import SessionStore
+from django.http import Http404
+from django.test import AsyncRequestFactory, RequestFactory, TestCase
+from django.urls import reverse
+
+from monitoring.testing import QueryBudgetTestCase
+from store.models import Category, Product
+from .context_processors import cart
+from .views import async_cart_add, async_cart_delete, async_cart_update
+
+class CartQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.fill_cart()
+
+    def grow_dataset(self):
+        super().grow_dataset()
+        self.fill_cart()
+
+    def fill_cart(self):
+        """Put every product of the test category in the session cart"""
+        session = self.client.session
+        session['session_key'] = {
+            str(product.id): {'price': str(product.price), 'qty': 1}
+            for product in Product.objects.filter(category=self.category)
+        }
+        session.save()
+
+    def test_cart_summary(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('cart_summary')))
+
+    def test_cart_add(self):
+        data = {'action': 'post', 'product_id': self.product.id, 'product_quantity': 2}
+        self.assertQueryBudget(4, lambda: self.client.post(reverse('cart_add'), data))
+
+    def test_cart_update(self):
+        data = {'action': 'post', 'product_id': self.product.id, 'product_quantity': 3}
+        self.assertQueryBudget(4, lambda: self.client.post(reverse('cart_update'), data))
+
+    def test_cart_delete(self):
+        data = {'action': 'post', 'product_id': self.product.id}
+        self.assertQueryBudget(4, lambda: self.client.post(reverse('cart_delete'), data))
+
+    def test_cart_context_processor(self):
+        def evaluate():
+            request = RequestFactory().get('/')
+            request.session = self.client.session
+            return list(cart(request)['cart'])
+
+        self.assertQueryBudget(3, evaluate, status=None)
+
+class AsyncCartViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Consoles', slug='consoles')
+        cls.product = Product.objects.create(
+            category=category, title='Console', slug='console', price=Decimal('19.99'), stock=10,
+        )
+
+    def post(self, view, session, **data):
+        request = AsyncRequestFactory().post('/', {'action': 'post', 'product_id': self.product.id, **data})
+        request.session = session
+        return view(request)
+
+    async def test_add_update_delete(self):
+        session = SessionStore()
+        response = await self.post(async_cart_add, session, product_quantity=2)
+        self.assertEqual(json.loads(response.content), {'qty': 2})
+
+        response = await self.post(async_cart_update, session, product_quantity=3)
+        self.assertEqual(json.loads(response.content), {'qty': 3, 'total': str(self.product.price * 3)})
+
+        response = await self.post(async_cart_delete, session)
+        self.assertEqual(json.loads(response.content), {'qty': 0, 'total': 0})
+
+    async def test_add_unknown_product(self):
+        request = AsyncRequestFactory().post('/', {'action': 'post', 'product_id': '0', 'product_quantity': 1})
+        request.session = SessionStore()
+        with self.assertRaises(Http404):
+            await async_cart_add(request)
@@ -1,10 +1,11 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
 urlpatterns = [
     # the empty string matches the root /cart from the urls from settings.py
     path('', views.cart_summary, name='cart_summary'),
-    path('add/', views.cart_add, name='cart_add'),
-    path('delete/', views.cart_delete, name='cart_delete'),
-    path('update/', views.cart_update, name='cart_update'),
+    path('add/', views.async_cart_add if settings.ASYNC_VIEWS else views.cart_add, name='cart_add'),
+    path('delete/', views.async_cart_delete if settings.ASYNC_VIEWS else views.cart_delete, name='cart_delete'),
+    path('update/', views.async_cart_update if settings.ASYNC_VIEWS else views.cart_update, name='cart_update'),
 ]
\ No newline at end of file
@@ -1,7 +1,7 @@
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, redirect
 from .cart import Cart
-from store.models import Product
-from django.http import JsonResponse
+from store.snapshot import aget_catalog_snapshot, get_catalog_snapshot
+from django.http import Http404, JsonResponse
 
 def cart_summary(request):
     cart = Cart(request)
@@ -13,7 +13,9 @@ def cart_add(request):
     if request.POST.get('action') == 'post':
         product_id = request.POST.get('product_id')
         product_quantity = request.POST.get('product_quantity')
-        product = get_object_or_404(Product, id=product_id)
+        product = get_catalog_snapshot().get_product(int(product_id)) if str(product_id).isdigit() else None
+        if product is None:
+            raise Http404('No Product matches the given query.')
         cart.add(product=product, product_qty=product_quantity)
         cart_quantity = cart.__len__()
         response = JsonResponse({'qty': cart_quantity})
@@ -39,3 +41,34 @@ def cart_delete(request):
         cart_total = cart.get_total()
         response = JsonResponse({'qty':cart_quantity, 'total':cart_total})
         return response
+
+# Async versions of the JSON endpoints, routed instead of the above when
+# ASYNC_VIEWS is on (ASGI deployments). The session is loaded with the async
+# session API and products come from the in-memory catalog snapshot.
+
+async def async_cart_add(request):
+    cart = await Cart.aload(request)
+    if request.POST.get('action') == 'post':
+        product_id = request.POST.get('product_id')
+        product_quantity = request.POST.get('product_quantity')
+        snapshot = await aget_catalog_snapshot()
+        product = snapshot.get_product(int(product_id)) if str(product_id).isdigit() else None
+        if product is None:
+            raise Http404('No Product matches the given query.')
+        cart.add(product=product, product_qty=product_quantity)
+        return JsonResponse({'qty': len(cart)})
+
+async def async_cart_update(request):
+    cart = await Cart.aload(request)
+    if request.POST.get('action') == 'post':
+        product_id = int(request.POST.get('product_id'))
+        product_quantity = int(request.POST.get('product_quantity'))
+        cart.update(product=product_id, qty=product_quantity)
+        return JsonResponse({'qty': len(cart), 'total': cart.get_total()})
+
+async def async_cart_delete(request):
+    cart = await Cart.aload(request)
+    if request.POST.get('action') == 'post':
+        product_id = int(request.POST.get('product_id'))
+        cart.delete(product=product_id)
+        return JsonResponse({'qty': len(cart), 'total': cart.get_total()})
@@ -9,8 +9,46 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from asgiref.sync import sync_to_async
 from django.core.asgi import get_asgi_application
+from django.db import close_old_connections
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'game_store.settings')
+# Serve the async versions of the chatty JSON endpoints (see settings.ASYNC_VIEWS)
+os.environ.setdefault('ASYNC_VIEWS', 'True')
+# Each request's ORM work runs on a thread of its own, so a connection kept
+# for CONN_MAX_AGE would never be reused or closed; use DB_POOL_SIZE to
+# reuse connections here
+os.environ['CONN_MAX_AGE'] = '0'
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from store.snapshot import warm_catalog_snapshot  # noqa: E402
+from store.suggest import warm_suggestion_index  # noqa: E402
+
+def warm_caches():
+    """Load the catalog snapshot and search suggestion index"""
+    warm_catalog_snapshot()
+    warm_suggestion_index()
+    # The startup thread serves no requests, so nothing would reuse its connection
+    close_old_connections()
+
+async def application(scope, receive, send):
+    """
+    Django's ASGI application, answering the lifespan protocol as well
+
+    The warm-up runs on lifespan startup, in a worker thread: servers
+    import this module on their event loop, where the ORM refuses to run.
+    Under servers that don't send lifespan events (daphne) the first
+    request loads the snapshot and the index instead.
+    """
+    if scope['type'] != 'lifespan':
+        return await django_application(scope, receive, send)
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await sync_to_async(warm_caches)()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,185 @@
+"""
+Database backends sharing a per-process pool of connections among threads
+
+ENGINE 'game_store.db_pool.postgresql' (or '.sqlite3') behaves like the
+Django backend of the same name, except that opening a connection checks
+one out of the pool and closing it checks it back in. With CONN_MAX_AGE 0
+a threaded worker then holds at most POOL['SIZE'] connections however many
+threads it runs, and a request only pays for a new connection (TCP and TLS
+to the database) when the pool has none idle. settings.py switches to these
+when DB_POOL_SIZE is set.
+"""
+import threading
+import time
+from collections import deque
+
+from django.core.exceptions import ImproperlyConfigured
+
+from monitoring.metrics import DB_POOL_CHECKOUTS, DB_POOL_OPENS, DB_POOL_WAITS
+
+# Connections idle for longer than this are pinged before being handed out
+CHECK_AFTER = 5.0
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+class PoolTimeout(Exception):
+    pass
+
+def _ping(connection):
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+    return True
+
+class ConnectionPool:
+    """
+    Up to size DB-API connections, opened on demand and reused
+
+    Counters are kept for stats() and mirrored to the db_pool_* metrics:
+    checkouts, opens (checkouts that had to connect) and waits (checkouts
+    that found the pool exhausted).
+    """
+
+    def __init__(self, alias, size, timeout):
+        self.alias = alias
+        self.size = size
+        self.timeout = timeout
+        self.idle = deque()
+        self.open = 0
+        self.checkouts = 0
+        self.opens = 0
+        self.waits = 0
+        self.condition = threading.Condition()
+
+    def checkout(self, connect):
+        """
+        A connection from the pool, or a new one from connect() if there is room
+
+        Raises:
+            PoolTimeout: If every connection stayed checked out for timeout seconds
+        """
+        while True:
+            with self.condition:
+                if not self.idle and self.open >= self.size:
+                    self.waits += 1
+                    DB_POOL_WAITS.inc(database=self.alias)
+                    deadline = time.monotonic() + self.timeout
+                    while not self.idle and self.open >= self.size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeout(
+                                f"No connection to '{self.alias}' returned within {self.timeout}s "
+                                f"({self.size} in use)"
+                            )
+                        self.condition.wait(remaining)
+                self.checkouts += 1
+                DB_POOL_CHECKOUTS.inc(database=self.alias)
+                if self.idle:
+                    connection, returned_at = self.idle.pop()
+                else:
+                    connection = None
+                    # Claimed now, connected outside the lock
+                    self.open += 1
+                    self.opens += 1
+                    DB_POOL_OPENS.inc(database=self.alias)
+
+            if connection is None:
+                try:
+                    return connect()
+                except BaseException:
+                    self.discard(None)
+                    raise
+            if time.monotonic() - returned_at < CHECK_AFTER or _ping(connection):
+                return connection
+            # Dropped while idle, e.g. by a database restart or an idle timeout
+            self.discard(connection)
+
+    def checkin(self, connection):
+        with self.condition:
+            self.idle.append((connection, time.monotonic()))
+            self.condition.notify()
+
+    def discard(self, connection):
+        """Give up a checked out connection that can't be reused"""
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        with self.condition:
+            self.open -= 1
+            self.condition.notify()
+
+    def stats(self):
+        with self.condition:
+            return {
+                'size': self.size, 'open': self.open, 'idle': len(self.idle),
+                'checkouts': self.checkouts, 'opens': self.opens, 'waits': self.waits,
+            }
+
+def get_pool(alias, settings_dict):
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            options = settings_dict.get('POOL') or {}
+            pool = _pools[alias] = ConnectionPool(alias, options.get('SIZE', 10), options.get('TIMEOUT', 10))
+        return pool
+
+def close_pool(alias):
+    """Close an alias's idle connections and forget its pool, e.g. after changing its settings"""
+    with _pools_lock:
+        pool = _pools.pop(alias, None)
+    if pool is not None:
+        with pool.condition:
+            idle, pool.idle = pool.idle, deque()
+        for connection, returned_at in idle:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+def pool_stats():
+    """stats() of every pool opened in this process, by database alias"""
+    with _pools_lock:
+        return {alias: pool.stats() for alias, pool in _pools.items()}
+
+class PooledDatabaseWrapperMixin:
+    """Check connections out of the alias's pool instead of connecting and closing"""
+
+    def check_settings(self):
+        super().check_settings()
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured(
+                "Pooled connections are returned after every request; set CONN_MAX_AGE to 0."
+            )
+
+    @property
+    def connection_pool(self):
+        # Not "pool": the postgresql backend uses that name for psycopg 3's own pool
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connect = super().get_new_connection
+        return self.connection_pool.checkout(lambda: connect(conn_params))
+
+    def _close(self):
+        if self.connection is None:
+            return
+        connection = self.connection
+        try:
+            # Closed inside a transaction, or failed: don't pass it on as is
+            reusable = self.autocommit == self.settings_dict['AUTOCOMMIT'] and not self.in_atomic_block
+            if reusable and self.errors_occurred:
+                reusable = self.is_usable()
+        except Exception:
+            reusable = False
+        if reusable:
+            self.connection_pool.checkin(connection)
+        else:
+            self.connection_pool.discard(connection)
@@ -0,0 +1,6 @@
+from django.db.backends.sqlite3 import base
+
+from .. import PooledDatabaseWrapperMixin
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    pass
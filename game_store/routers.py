@@ -0,0 +1,144 @@
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Set by a browser that wrote recently, so its next requests still read its writes
+PIN_COOKIE = 'db_primary'
+
+_routing = ContextVar('db_routing', default=None)
+_forced = ContextVar('db_forced_primary', default=False)
+
+class _RequestRouting:
+    """Per-request routing state: the replica chosen and whether it wrote"""
+    __slots__ = ('replica', 'pinned', 'wrote')
+
+    def __init__(self, replica, pinned):
+        self.replica = replica
+        self.pinned = pinned
+        self.wrote = False
+
+def replica_aliases():
+    return getattr(settings, 'REPLICA_DATABASES', [])
+
+@contextmanager
+def use_primary():
+    """
+    Read from the primary inside this block, or in a function it decorates
+
+    For reads that decide a write (stock checks, order lookups) and for
+    anything cached under a version bumped by a write, which a lagging
+    replica would cache stale.
+    """
+    token = _forced.set(True)
+    try:
+        yield
+    finally:
+        _forced.reset(token)
+
+def _in_transaction():
+    # TestCase's own wrapping atomics don't count, as they don't for durable=True
+    return any(not block._from_testcase for block in connections[DEFAULT_DB_ALIAS].atomic_blocks)
+
+class ReplicaRouter:
+    """
+    Send a request's reads to a replica until it writes
+
+    Only requests passing through ReplicaPinningMiddleware read from
+    replicas; management commands, background threads and everything in
+    use_primary() stay on the primary. A request keeps one replica
+    throughout, so it never reads two different lags. Reads inside a
+    transaction go to the primary, which is the database that transaction
+    is on.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state.pinned or _forced.get() or _in_transaction():
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            # Everything it reads from now on must include this write
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema by replication
+        return db == DEFAULT_DB_ALIAS
+
+class ReplicaPinningMiddleware:
+    """
+    Choose a replica per request, and keep a browser on the primary after it writes
+
+    Sits before SessionMiddleware so session saves count as writes. A
+    request that wrote sets a cookie for REPLICA_PIN_SECONDS, covering the
+    redirect and follow-up pages while the replicas catch up.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        replicas = replica_aliases()
+        if not replicas:
+            return self.get_response(request)
+
+        state = self.start(request, replicas)
+        token = _routing.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(response, state)
+
+    async def __acall__(self, request):
+        replicas = replica_aliases()
+        if not replicas:
+            return await self.get_response(request)
+
+        # Async ORM queries run on another thread, which sees this context
+        state = self.start(request, replicas)
+        token = _routing.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing.reset(token)
+        return self.finish(response, state)
+
+    def start(self, request, replicas):
+        pinned = request.method not in ('GET', 'HEAD') or _pin_active(request.COOKIES.get(PIN_COOKIE))
+        return _RequestRouting(random.choice(replicas), pinned)
+
+    def finish(self, response, state):
+        if state.wrote:
+            seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+            response.set_cookie(PIN_COOKIE, str(int(time.time()) + seconds), max_age=seconds, httponly=True,
+                                samesite='Lax')
+        return response
+
+def _pin_active(value):
+    try:
+        return int(value) > time.time()
+    except (TypeError, ValueError):
+        return False
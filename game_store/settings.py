@@ -17,6 +17,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 from dotenv import load_dotenv
 import os
+import sys
 
 load_dotenv()
 
@@ -52,22 +53,103 @@ INSTALLED_APPS = [
     'account',
     'payment',
     'inventory',
+    'monitoring',
 ]
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'monitoring.middleware.MetricsMiddleware',
+    'monitoring.middleware.QueryInstrumentationMiddleware',
+    'game_store.routers.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'monitoring.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'game_store.urls'
 
+# Per-request SQL instrumentation (Server-Timing header + structured log line)
+# Fraction of requests instrumented; 0 disables, 1 instruments every request
+SQL_INSTRUMENTATION_SAMPLE_RATE = float(os.environ.get('SQL_INSTRUMENTATION_SAMPLE_RATE', '0.05'))
+# Flag any statement template executed more than this many times in one request
+SQL_REPEATED_QUERY_THRESHOLD = int(os.environ.get('SQL_REPEATED_QUERY_THRESHOLD', '5'))
+
+# Request profiling: staff can send an X-Profile header; others are sampled at this rate
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', '0'))
+PROFILER_DIR = os.environ.get('PROFILER_DIR', BASE_DIR / 'profiles')
+PROFILER_MAX_FILES = int(os.environ.get('PROFILER_MAX_FILES', '200'))
+
+# Application metrics at /monitoring/metrics/. Set METRICS_MULTIPROC_DIR to a
+# directory shared by all gunicorn workers so their counters are aggregated.
+# Staff can always read them; scrapers need METRICS_TOKEN (sent as
+# "Authorization: Bearer <token>") or an address in METRICS_ALLOWED_IPS.
+# Behind a reverse proxy on the same host every request comes from
+# 127.0.0.1, so only list addresses the proxy can't forward from.
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Cache shared by the worker processes. Namespace versions (see
+# store.invalidation), the page cache and the cached stock settings are
+# invalidated by the process that wrote, so with several processes they must
+# live in a shared backend, e.g. CACHE_BACKEND
+# django.core.cache.backends.redis.RedisCache with CACHE_LOCATION
+# redis://host:6379/0. The default local-memory cache is per process: the
+# system check rejects it when WEB_CONCURRENCY, gunicorn's worker count, is
+# above 1.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+# Anonymous full-page cache for store, list_category and product_info, in
+# seconds; 0 disables it. Entries are also dropped on any catalog change.
+PAGE_CACHE_TIMEOUT = int(os.environ.get('PAGE_CACHE_TIMEOUT', '600'))
+
+# Processes generating ProductImage renditions after upload; 0 generates them
+# inline in the saving request instead.
+RENDITION_WORKERS = int(os.environ.get('RENDITION_WORKERS', '2'))
+
+# Route live_search and the cart JSON endpoints to their async views, so an
+# ASGI worker serves them from its event loop rather than a thread each.
+# asgi.py turns this on; WSGI deployments keep the sync views.
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', 'False') == 'True'
+
+# Longest a worker's in-memory search suggestion index goes without checking
+# for product changes, in seconds. Catalog changes trigger a check sooner.
+SUGGEST_MAX_AGE = int(os.environ.get('SUGGEST_MAX_AGE', '60'))
+
+# The monitoring loggers report slow requests and queries at INFO; under
+# `manage.py test` that would print between the dots, so there they only
+# pass warnings unless MONITORING_LOG_LEVEL asks for more.
+TESTING = sys.argv[1:2] == ['test']
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'monitoring': {
+            'handlers': ['console'],
+            'level': os.environ.get('MONITORING_LOG_LEVEL', 'WARNING' if TESTING else 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -196,4 +278,37 @@ DATABASES = {
         #'PORT': os.environ.get('PORT'),
         'PORT': '5432',
     }
-}
\ No newline at end of file
+}
+
+# Database connections. Each thread keeps its connection for CONN_MAX_AGE
+# seconds (0 closes it after every request) and, with CONN_HEALTH_CHECKS,
+# checks a reused one still works before its first query in a request.
+# Setting DB_POOL_SIZE instead shares up to that many connections among a
+# process's threads, handed back after every request; a request waits up to
+# DB_POOL_TIMEOUT seconds for one when all are in use. See game_store.db_pool;
+# checkouts, opens and waits are exported as db_pool_* metrics.
+# Under ASGI every request runs on a new thread, so asgi.py forces
+# CONN_MAX_AGE to 0: ASGI deployments should set DB_POOL_SIZE instead.
+DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('CONN_MAX_AGE', '60'))
+DATABASES['default']['CONN_HEALTH_CHECKS'] = os.environ.get('CONN_HEALTH_CHECKS', 'True') == 'True'
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '0'))
+if DB_POOL_SIZE:
+    DATABASES['default'].update({
+        'ENGINE': 'game_store.db_pool.' + DATABASES['default']['ENGINE'].rpartition('.')[2],
+        'CONN_MAX_AGE': 0,
+        'POOL': {'SIZE': DB_POOL_SIZE, 'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', '10'))},
+    })
+
+# Read replicas: comma-separated hosts (or, with the sqlite3 ENGINE, database
+# files) copying the default database. Requests read from one of them until
+# they write; a browser that wrote then stays on the primary for
+# REPLICA_PIN_SECONDS, which should cover the replication lag. See
+# game_store.routers.
+REPLICA_DATABASES = []
+for number, location in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(',')), 1):
+    location_key = 'NAME' if DATABASES['default']['ENGINE'].endswith('sqlite3') else 'HOST'
+    DATABASES[f'replica{number}'] = dict(DATABASES['default'], **{location_key: location.strip()},
+                                         TEST={'MIRROR': 'default'})
+    REPLICA_DATABASES.append(f'replica{number}')
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', '10'))
+DATABASE_ROUTERS = ['game_store.routers.ReplicaRouter']
@@ -27,6 +27,7 @@ urlpatterns = [
     path('account/', include('account.urls')),
     path('payment/', include('payment.urls')),
     path('inventory/', include('inventory.urls')),
+    path('monitoring/', include('monitoring.urls')),
 ]
 
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
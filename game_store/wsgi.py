@@ -14,3 +14,11 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'game_store.settings')
 
 application = get_wsgi_application()
+
+# Load the catalog snapshot and search suggestion index before the first
+# request needs them
+from store.snapshot import warm_catalog_snapshot  # noqa: E402
+from store.suggest import warm_suggestion_index  # noqa: E402
+
+warm_catalog_snapshot()
+warm_suggestion_index()
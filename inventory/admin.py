@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import InventoryTransaction, InventoryAlert, StockSetting
+from .models import InventoryTransaction, InventoryAlert, StockSetting, LedgerArchiveRun, InventoryLedgerSummary, ReorderRecommendation, ProductClassification
 
 @admin.register(InventoryTransaction)
 class InventoryTransactionAdmin(admin.ModelAdmin):
@@ -52,3 +52,34 @@ class StockSettingAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         # Don't allow deletion of settings
         return False
+
+
+@admin.register(LedgerArchiveRun)
+class LedgerArchiveRunAdmin(admin.ModelAdmin):
+    list_display = ['cutoff', 'status', 'rows_archived', 'chunks_written', 'started_at', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['cutoff', 'status', 'output_dir', 'last_archived_id', 'chunks_written',
+                       'rows_archived', 'started_at', 'finished_at']
+
+@admin.register(InventoryLedgerSummary)
+class InventoryLedgerSummaryAdmin(admin.ModelAdmin):
+    list_display = ['product', 'archive_run', 'transaction_count', 'net_quantity', 'first_transaction_at', 'last_transaction_at']
+    search_fields = ['product__title']
+    list_select_related = ['product', 'archive_run']
+    list_per_page = 20
+
+@admin.register(ReorderRecommendation)
+class ReorderRecommendationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'daily_velocity', 'forecast_daily', 'safety_stock', 'reorder_point', 'computed_at']
+    search_fields = ['product__title']
+    list_select_related = ['product']
+    readonly_fields = ['daily_velocity', 'forecast_daily', 'demand_std', 'safety_stock', 'reorder_point', 'computed_at']
+    list_per_page = 20
+
+@admin.register(ProductClassification)
+class ProductClassificationAdmin(admin.ModelAdmin):
+    list_display = ['product', 'tier', 'revenue', 'revenue_share', 'units_sold', 'velocity', 'updated_at']
+    list_filter = ['tier']
+    search_fields = ['product__title']
+    list_select_related = ['product']
+    list_per_page = 20
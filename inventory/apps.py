@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        # Connect the live dashboard event publishers
+        from . import events  # noqa: F401
+        from store.invalidation import connect_model_signals
+
+        # Bump the cache namespaces of StockSetting / InventoryAlert on changes
+        connect_model_signals(self.get_models())
@@ -0,0 +1,192 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import InventoryTransaction, InventoryLedgerSummary, LedgerArchiveRun
+
+EXPORT_FIELDS = [
+    'id', 'product_id', 'transaction_type', 'quantity', 'reason', 'notes',
+    'previous_stock', 'new_stock', 'user_id', 'order_item_id', 'created_at',
+]
+
+def start_or_resume_run(retention_days, output_dir):
+    """
+    Return the unfinished archive run, or start a new one
+
+    An interrupted run keeps its original cutoff so that resuming it archives
+    exactly the rows the first attempt would have archived.
+    """
+    run = LedgerArchiveRun.objects.filter(status='RUNNING').order_by('started_at').first()
+    if run:
+        return run, True
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    run = LedgerArchiveRun.objects.create(cutoff=cutoff, output_dir=str(output_dir))
+    run.output_dir = os.path.join(str(output_dir), f'run-{run.pk:05d}')
+    run.save(update_fields=['output_dir'])
+    return run, False
+
+def _fsync_directory(path):
+    """Persist a rename into the directory that holds it"""
+    fd = os.open(os.path.dirname(path), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _write_chunk(path, rows):
+    """Write rows as gzipped JSON lines, durably and atomically, and return the sha256 of the file"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as compressed:
+            with io.TextIOWrapper(compressed, encoding='utf-8') as handle:
+                for row in rows:
+                    row = dict(row, created_at=row['created_at'].isoformat())
+                    handle.write(json.dumps(row, separators=(',', ':')) + '\n')
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    digest = hashlib.sha256()
+    with open(tmp_path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 20), b''):
+            digest.update(block)
+    os.replace(tmp_path, path)
+    _fsync_directory(path)
+    return digest.hexdigest()
+
+def _manifest_path(run):
+    return os.path.join(run.output_dir, 'manifest.json')
+
+def load_manifest(run):
+    """
+    Return the run's manifest, as of the last committed chunk
+
+    Each entry is written just before its chunk's database transaction
+    commits, so after a crash in between the manifest can list one chunk the
+    database rolled back; that entry is dropped here and the chunk is
+    written again under the same name.
+    """
+    path = _manifest_path(run)
+    if os.path.exists(path):
+        with open(path) as handle:
+            manifest = json.load(handle)
+        manifest['chunks'] = manifest['chunks'][:run.chunks_written]
+        return manifest
+    return {
+        'run_id': run.pk,
+        'cutoff': run.cutoff.isoformat(),
+        'fields': EXPORT_FIELDS,
+        'chunks': [],
+    }
+
+def _save_manifest(run, manifest):
+    manifest['rows_archived'] = run.rows_archived
+    manifest['status'] = run.status
+    tmp_path = _manifest_path(run) + '.tmp'
+    with open(tmp_path, 'w') as handle:
+        json.dump(manifest, handle, indent=2)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, _manifest_path(run))
+    _fsync_directory(_manifest_path(run))
+
+def _merge_summaries(run, rows):
+    """Fold a batch of exported rows into the run's per-product summaries"""
+    totals = {}
+    for row in rows:
+        summary = totals.setdefault(row['product_id'], {
+            'transaction_count': 0, 'net_quantity': 0, 'quantity_in': 0, 'quantity_out': 0,
+            'first_transaction_at': row['created_at'], 'last_transaction_at': row['created_at'],
+        })
+        summary['transaction_count'] += 1
+        summary['net_quantity'] += row['quantity']
+        if row['quantity'] >= 0:
+            summary['quantity_in'] += row['quantity']
+        else:
+            summary['quantity_out'] += -row['quantity']
+        summary['first_transaction_at'] = min(summary['first_transaction_at'], row['created_at'])
+        summary['last_transaction_at'] = max(summary['last_transaction_at'], row['created_at'])
+
+    existing = {
+        summary.product_id: summary
+        for summary in InventoryLedgerSummary.objects.filter(archive_run=run, product_id__in=totals.keys())
+    }
+    to_create = []
+    for product_id, total in totals.items():
+        summary = existing.get(product_id)
+        if summary is None:
+            to_create.append(InventoryLedgerSummary(product_id=product_id, archive_run=run, **total))
+            continue
+        summary.transaction_count += total['transaction_count']
+        summary.net_quantity += total['net_quantity']
+        summary.quantity_in += total['quantity_in']
+        summary.quantity_out += total['quantity_out']
+        summary.first_transaction_at = min(summary.first_transaction_at, total['first_transaction_at'])
+        summary.last_transaction_at = max(summary.last_transaction_at, total['last_transaction_at'])
+
+    InventoryLedgerSummary.objects.bulk_create(to_create)
+    InventoryLedgerSummary.objects.bulk_update(
+        existing.values(),
+        ['transaction_count', 'net_quantity', 'quantity_in', 'quantity_out',
+         'first_transaction_at', 'last_transaction_at'],
+    )
+
+def archive_batch(run, manifest, batch_size):
+    """
+    Export, summarise and delete the next batch of archivable transactions
+
+    The chunk file is written before the database transaction and its
+    manifest entry just before the commit; if the process dies in between,
+    the same rows are selected again on resume and the chunk is simply
+    rewritten under the same name.
+
+    Returns:
+        Number of rows archived (0 once the run has nothing left to do)
+    """
+    rows = list(
+        InventoryTransaction.objects
+        .filter(created_at__lt=run.cutoff, id__gt=run.last_archived_id)
+        .order_by('id')
+        .values(*EXPORT_FIELDS)[:batch_size]
+    )
+    if not rows:
+        return 0
+
+    first_id, last_id = rows[0]['id'], rows[-1]['id']
+    filename = f'chunk-{run.chunks_written:06d}.jsonl.gz'
+    sha256 = _write_chunk(os.path.join(run.output_dir, filename), rows)
+
+    with transaction.atomic():
+        _merge_summaries(run, rows)
+        deleted, _ = InventoryTransaction.objects.filter(
+            id__gte=first_id, id__lte=last_id, created_at__lt=run.cutoff
+        ).delete()
+        if deleted != len(rows):
+            raise RuntimeError(f"Expected to delete {len(rows)} transactions, deleted {deleted}")
+
+        run.last_archived_id = last_id
+        run.chunks_written += 1
+        run.rows_archived += len(rows)
+        run.save(update_fields=['last_archived_id', 'chunks_written', 'rows_archived'])
+
+        manifest['chunks'].append({
+            'file': filename,
+            'rows': len(rows),
+            'first_id': first_id,
+            'last_id': last_id,
+            'sha256': sha256,
+        })
+        _save_manifest(run, manifest)
+    return len(rows)
+
+def finish_run(run, manifest):
+    run.status = 'COMPLETED'
+    run.finished_at = timezone.now()
+    run.save(update_fields=['status', 'finished_at'])
+    _save_manifest(run, manifest)
@@ -0,0 +1,155 @@
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import InventoryTransaction, ProductClassification, ClassificationState
+from store.models import Product
+from monitoring.metrics import record_cache_lookup
+
+TIER_A_SHARE = 0.80
+TIER_B_SHARE = 0.95
+SUMMARY_CACHE_KEY = 'inventory:abc_summary'
+# Orders are stamped when their row is inserted, before checkout commits, so
+# only orders older than this are folded in: a slow checkout can't commit
+# behind the watermark. It must exceed the longest checkout transaction.
+SETTLE_DELAY = timedelta(minutes=5)
+
+def get_classification_state():
+    state, created = ClassificationState.objects.get_or_create(pk=1)
+    return state
+
+def assign_tiers(revenue, a_share=TIER_A_SHARE, b_share=TIER_B_SHARE):
+    """
+    Vectorised ABC assignment from a revenue array
+
+    A product belongs to the tier its revenue *starts* in, so the product that
+    crosses the A threshold is still an A product.
+
+    Returns:
+        Tuple of (tiers, cumulative_share) arrays aligned with revenue
+    """
+    tiers = np.full(len(revenue), 'C', dtype='<U1')
+    cumulative_share = np.zeros(len(revenue))
+    total = revenue.sum()
+    if total <= 0:
+        return tiers, cumulative_share
+
+    order = np.argsort(-revenue, kind='stable')
+    cumulative = np.cumsum(revenue[order]) / total
+    # Shifted rather than cumulative - share, which can land just under a threshold
+    preceding = np.concatenate(([0.0], cumulative[:-1]))
+
+    ranked_tiers = np.where(preceding < a_share, 'A', np.where(preceding < b_share, 'B', 'C'))
+    ranked_tiers[revenue[order] <= 0] = 'C'
+    tiers[order] = ranked_tiers
+    cumulative_share[order] = cumulative
+    return tiers, cumulative_share
+
+def refresh_classification(full=False, velocity_days=30, settle_delay=SETTLE_DELAY):
+    """
+    Bring ProductClassification up to date
+
+    Revenue is cumulative, so only order items from orders placed since the
+    stored watermark are aggregated, up to settle_delay ago; the watermark
+    then moves to that cutoff. Velocity is a rolling window and is
+    re-aggregated from the ledger each time (one grouped query over an
+    indexed range). Tiers are then reassigned for the whole catalog in one
+    vectorised pass.
+
+    Returns:
+        Number of new order items folded in
+    """
+    from payment.models import OrderItem
+
+    now = timezone.now()
+    cutoff = now - settle_delay
+    with transaction.atomic():
+        state = ClassificationState.objects.select_for_update().get(pk=get_classification_state().pk)
+        full = full or state.settled_until is None
+
+        new_items = OrderItem.objects.filter(product__isnull=False, order__date_ordered__lt=cutoff)
+        if not full:
+            new_items = new_items.filter(order__date_ordered__gte=state.settled_until)
+        rows = (
+            new_items.order_by()
+            .values_list('product_id')
+            .annotate(revenue=Sum(F('price') * F('quantity')), units=Sum('quantity'), items=Count('id'))
+        )
+        increments = {}
+        item_count = 0
+        for product_id, revenue, units, items in rows:
+            increments[product_id] = (revenue or Decimal('0'), units or 0)
+            item_count += items
+
+        velocity = dict(
+            InventoryTransaction.objects
+            .filter(transaction_type='SALE', created_at__gte=now - timedelta(days=velocity_days))
+            .order_by()
+            .values_list('product_id')
+            .annotate(units=Sum('quantity'))
+        )
+
+        existing = {} if full else {
+            product_id: (revenue, units)
+            for product_id, revenue, units in ProductClassification.objects.values_list('product_id', 'revenue', 'units_sold')
+        }
+
+        product_ids = list(Product.objects.order_by('id').values_list('id', flat=True))
+        revenue, units = [], []
+        for product_id in product_ids:
+            base_revenue, base_units = existing.get(product_id, (Decimal('0'), 0))
+            new_revenue, new_units = increments.get(product_id, (Decimal('0'), 0))
+            revenue.append(base_revenue + new_revenue)
+            units.append(base_units + new_units)
+
+        tiers, shares = assign_tiers(np.array([float(value) for value in revenue], dtype=np.float64))
+
+        ProductClassification.objects.bulk_create(
+            [
+                ProductClassification(
+                    product_id=product_id,
+                    revenue=revenue[i],
+                    units_sold=units[i],
+                    velocity=-(velocity.get(product_id) or 0) / velocity_days,
+                    revenue_share=float(shares[i]),
+                    tier=str(tiers[i]),
+                    updated_at=now,
+                )
+                for i, product_id in enumerate(product_ids)
+            ],
+            batch_size=2000,
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['revenue', 'units_sold', 'velocity', 'revenue_share', 'tier', 'updated_at'],
+        )
+
+        if full or cutoff > state.settled_until:
+            state.settled_until = cutoff
+        state.refreshed_at = now
+        state.save()
+
+    cache.delete(SUMMARY_CACHE_KEY)
+    return item_count
+
+def get_tier_summary():
+    """
+    Product count and revenue per tier, cached until the next refresh
+
+    Returns:
+        List of dictionaries with tier, products and revenue keys
+    """
+    summary = cache.get(SUMMARY_CACHE_KEY)
+    record_cache_lookup('abc_summary', summary is not None)
+    if summary is None:
+        summary = list(
+            ProductClassification.objects.order_by('tier')
+            .values('tier')
+            .annotate(products=Count('id'), revenue=Sum('revenue'))
+        )
+        cache.set(SUMMARY_CACHE_KEY, summary, None)
+    return summary
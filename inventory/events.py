@@ -0,0 +1,259 @@
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import InventoryTransaction, InventoryAlert
+
+# Seconds between DB polls that pick up events committed by other workers
+POLL_INTERVAL = getattr(settings, 'INVENTORY_EVENTS_POLL_INTERVAL', 2.0)
+# Seconds between keep-alive comments so proxies don't drop idle streams
+HEARTBEAT_INTERVAL = getattr(settings, 'INVENTORY_EVENTS_HEARTBEAT', 15.0)
+# Rows are stamped before their transaction commits, so a missing id below
+# one already seen may still commit. Once the row above the gap is older
+# than this many seconds, the gap is taken to be a rollback or a delete.
+# It must exceed the longest stock adjustment transaction.
+SETTLE_INTERVAL = getattr(settings, 'INVENTORY_EVENTS_SETTLE', 30.0)
+
+class Broadcaster:
+    """
+    In-process fan-out of inventory events to connected streams
+
+    Publishers may run on any thread (sync views run in a thread pool under
+    ASGI), so each subscriber queue is fed through its own event loop.
+    """
+
+    def __init__(self, max_queue=1000):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        subscriber = (asyncio.get_running_loop(), queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def has_subscribers(self):
+        return bool(self._subscribers)
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down
+                self.unsubscribe((loop, queue))
+
+    @staticmethod
+    def _offer(queue, event):
+        # A slow client drops pushes; the DB poll picks the rows up again
+        if not queue.full():
+            queue.put_nowait(event)
+
+broadcaster = Broadcaster()
+
+def serialize_transaction(tx):
+    return {
+        'id': tx.id,
+        'product_id': tx.product_id,
+        'product': tx.product.title,
+        'transaction_type': tx.transaction_type,
+        'transaction_type_display': tx.get_transaction_type_display(),
+        'quantity': tx.quantity,
+        'new_stock': tx.new_stock,
+        'created_at': tx.created_at.isoformat(),
+    }
+
+def serialize_alert(alert):
+    return {
+        'id': alert.id,
+        'product_id': alert.product_id,
+        'product': alert.product.title,
+        'alert_type': alert.alert_type,
+        'alert_type_display': alert.get_alert_type_display(),
+        'message': alert.message,
+        'created_at': alert.created_at.isoformat(),
+    }
+
+# Serializing reads the product, so it is skipped while no stream in this
+# process is listening (always, under WSGI)
+@receiver(post_save, sender=InventoryTransaction)
+def publish_transaction(sender, instance, created, **kwargs):
+    if created and broadcaster.has_subscribers():
+        event = ('transaction', serialize_transaction(instance))
+        transaction.on_commit(lambda: broadcaster.publish(event))
+
+@receiver(post_save, sender=InventoryAlert)
+def publish_alert(sender, instance, created, **kwargs):
+    if created and broadcaster.has_subscribers():
+        event = ('alert', serialize_alert(instance))
+        transaction.on_commit(lambda: broadcaster.publish(event))
+
+def parse_cursor(value):
+    """Parse a 'transaction_id:alert_id' Last-Event-ID into a cursor dict"""
+    try:
+        transaction_id, alert_id = (int(part) for part in value.split(':'))
+    except (AttributeError, ValueError):
+        return None
+    return {'transaction': transaction_id, 'alert': alert_id}
+
+def current_cursor():
+    return {
+        'transaction': InventoryTransaction.objects.aggregate(high=Max('id'))['high'] or 0,
+        'alert': InventoryAlert.objects.aggregate(high=Max('id'))['high'] or 0,
+    }
+
+def poll_events(cursor, exclude=None, limit=100):
+    """
+    Rows committed after the cursor, oldest first, as (kind, payload) events
+
+    exclude maps each kind to ids above the cursor that were already sent,
+    so rows stuck above a gap are not read back on every poll.
+    """
+    exclude = exclude or {}
+    transactions = (
+        InventoryTransaction.objects.select_related('product')
+        .filter(id__gt=cursor['transaction']).exclude(id__in=exclude.get('transaction', ()))
+        .order_by('id')[:limit]
+    )
+    alerts = (
+        InventoryAlert.objects.select_related('product')
+        .filter(id__gt=cursor['alert']).exclude(id__in=exclude.get('alert', ()))
+        .order_by('id')[:limit]
+    )
+    return (
+        [('transaction', serialize_transaction(tx)) for tx in transactions]
+        + [('alert', serialize_alert(alert)) for alert in alerts]
+    )
+
+class EventStream:
+    """
+    Server-sent event stream for one client
+
+    Pushed events arrive from the in-process broadcaster. A periodic DB poll
+    fills in anything committed by other worker processes or by bulk writes
+    that bypass signals. Ids sent above the cursor are remembered, so
+    nothing is sent twice.
+
+    The per-kind cursor only advances over ids without gaps: a lower id can
+    commit after a higher one. A gap is passed once the row above it has
+    settled (see SETTLE_INTERVAL). Each message's id, which a reconnecting
+    browser resumes from, is that cursor, so everything up to it has been
+    sent. Events above a gap may be sent again after a reconnect; the
+    dashboard ignores ids it has already shown.
+    """
+
+    def __init__(self, cursor):
+        self.cursor = dict(cursor)
+        # Ids sent above the cursor, with the stamp of their row
+        self.sent = {'transaction': {}, 'alert': {}}
+
+    @property
+    def event_id(self):
+        return f"{self.cursor['transaction']}:{self.cursor['alert']}"
+
+    def preamble(self):
+        # An id without data is not dispatched but still becomes the
+        # Last-Event-ID the browser resumes from after a reconnect
+        return f"retry: {int(max(POLL_INTERVAL, 1) * 1000)}\nid: {self.event_id}\n\n"
+
+    def format(self, kind, payload):
+        return f"id: {self.event_id}\nevent: {kind}\ndata: {json.dumps(payload)}\n\n"
+
+    def accept_pushed(self, kind, payload):
+        if payload['id'] <= self.cursor[kind] or payload['id'] in self.sent[kind]:
+            return None
+        self.sent[kind][payload['id']] = payload.get('created_at')
+        return self.format(kind, payload)
+
+    def accept_polled(self, events, polled_at=None):
+        """
+        Messages for the polled events not sent yet, then advance the cursor
+
+        polled_at is when the poll started: a gap still there after it is
+        only passed if the row above it was stamped SETTLE_INTERVAL earlier.
+        """
+        settled_before = (polled_at or timezone.now()) - timedelta(seconds=SETTLE_INTERVAL)
+        messages = []
+        for kind, payload in events:
+            if payload['id'] > self.cursor[kind] and payload['id'] not in self.sent[kind]:
+                self.sent[kind][payload['id']] = payload.get('created_at')
+                self.advance(kind, settled_before)
+                messages.append(self.format(kind, payload))
+        for kind in self.sent:
+            self.advance(kind, settled_before)
+        return messages
+
+    def advance(self, kind, settled_before):
+        cursor = self.cursor[kind]
+        sent = self.sent[kind]
+        for event_id in sorted(sent):
+            stamp = sent[event_id]
+            if event_id != cursor + 1 and (stamp is None or datetime.fromisoformat(stamp) >= settled_before):
+                break
+            cursor = event_id
+        self.cursor[kind] = cursor
+        self.sent[kind] = {event_id: stamp for event_id, stamp in sent.items() if event_id > cursor}
+
+    def poll(self):
+        polled_at = timezone.now()
+        sent = {kind: list(ids) for kind, ids in self.sent.items()}
+        return self.accept_polled(poll_events(self.cursor, sent), polled_at)
+
+    async def stream(self):
+        subscriber = broadcaster.subscribe()
+        loop = asyncio.get_running_loop()
+        next_poll = loop.time() + POLL_INTERVAL if POLL_INTERVAL else float('inf')
+        next_heartbeat = loop.time() + HEARTBEAT_INTERVAL
+        try:
+            yield self.preamble()
+            for message in await sync_to_async(self.poll)():
+                yield message
+
+            while True:
+                timeout = min(next_poll, next_heartbeat) - loop.time()
+                try:
+                    kind, payload = await asyncio.wait_for(subscriber[1].get(), max(timeout, 0))
+                except asyncio.TimeoutError:
+                    pass
+                else:
+                    message = self.accept_pushed(kind, payload)
+                    if message:
+                        yield message
+                    continue
+
+                now = loop.time()
+                if now >= next_poll:
+                    for message in await sync_to_async(self.poll)():
+                        yield message
+                    next_poll = now + POLL_INTERVAL
+                if now >= next_heartbeat:
+                    yield ": keep-alive\n\n"
+                    next_heartbeat = now + HEARTBEAT_INTERVAL
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    def stream_once(self):
+        """
+        Single poll for WSGI deployments, where an endless response would pin a
+        worker; the browser's EventSource reconnects after the retry interval.
+        """
+        yield self.preamble()
+        for message in self.poll():
+            yield message
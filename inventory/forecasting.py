@@ -0,0 +1,153 @@
+import math
+from datetime import datetime, time, timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import InventoryTransaction, ReorderRecommendation
+from store.models import Product
+
+def load_daily_sales(start_date, days):
+    """
+    Load SALE history as daily buckets with a single grouped query
+
+    Returns:
+        Tuple of (product_ids, day_offsets, units) NumPy arrays, one entry per
+        product/day pair that had sales
+    """
+    start = timezone.make_aware(datetime.combine(start_date, time.min))
+    rows = (
+        InventoryTransaction.objects
+        .filter(transaction_type='SALE', created_at__gte=start)
+        .annotate(day=TruncDate('created_at'))
+        .values_list('product_id', 'day')
+        .annotate(units=Sum('quantity'))
+        .order_by('product_id', 'day')
+    )
+    product_ids, offsets, units = [], [], []
+    for product_id, day, quantity in rows.iterator(chunk_size=20000):
+        offset = (day - start_date).days
+        if 0 <= offset < days:
+            product_ids.append(product_id)
+            offsets.append(offset)
+            # Sales are recorded as negative stock movements
+            units.append(-quantity)
+
+    return (
+        np.asarray(product_ids, dtype=np.int64),
+        np.asarray(offsets, dtype=np.int64),
+        np.asarray(units, dtype=np.float64),
+    )
+
+def smoothing_weights(days, alpha):
+    """
+    Weights that turn a daily series into its simple exponential smoothing level
+
+    level_T = sum(w_t * x_t), with the first observation seeding the level, so
+    a whole block of products is forecast with one matrix-vector product.
+    """
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return weights
+
+def compute_forecasts(catalog_ids, sales, days, alpha=0.3, window=28, lead_time=7,
+                      service_level=0.95, block_size=8192):
+    """
+    Vectorised velocity, forecast, safety stock and reorder point per product
+
+    Args:
+        catalog_ids: Sorted array of every product id to forecast
+        sales: Output of load_daily_sales
+        days: Number of daily buckets in the history
+        block_size: Products per dense demand matrix, bounding peak memory
+
+    Returns:
+        Dictionary of arrays aligned with catalog_ids
+    """
+    sale_products, sale_offsets, sale_units = sales
+
+    # Dense id -> row lookup; a gather is far cheaper than searching per sale
+    lookup = np.full(int(max(catalog_ids[-1], sale_products.max(initial=0))) + 1, -1, dtype=np.int64)
+    lookup[catalog_ids] = np.arange(len(catalog_ids))
+    rows = lookup[sale_products]
+    known = rows >= 0
+    rows, sale_offsets, sale_units = rows[known], sale_offsets[known], sale_units[known]
+
+    # load_daily_sales returns rows ordered by product; only sort if fed otherwise
+    if len(rows) and np.any(rows[1:] < rows[:-1]):
+        order = np.argsort(rows, kind='stable')
+        rows, sale_offsets, sale_units = rows[order], sale_offsets[order], sale_units[order]
+
+    weights = smoothing_weights(days, alpha)
+    window = min(window, days)
+    z = NormalDist().inv_cdf(service_level)
+
+    velocity = np.zeros(len(catalog_ids))
+    forecast = np.zeros(len(catalog_ids))
+    deviation = np.zeros(len(catalog_ids))
+
+    for start in range(0, len(catalog_ids), block_size):
+        stop = min(start + block_size, len(catalog_ids))
+        lo, hi = np.searchsorted(rows, [start, stop])
+        flat = (rows[lo:hi] - start) * days + sale_offsets[lo:hi]
+        demand = np.bincount(flat, weights=sale_units[lo:hi], minlength=(stop - start) * days)
+        demand = demand.reshape(stop - start, days)
+
+        recent = demand[:, -window:]
+        velocity[start:stop] = recent.mean(axis=1)
+        deviation[start:stop] = recent.std(axis=1)
+        forecast[start:stop] = demand @ weights
+
+    safety_stock = np.ceil(z * deviation * math.sqrt(lead_time))
+    reorder_point = np.ceil(forecast * lead_time + safety_stock)
+
+    return {
+        'daily_velocity': velocity,
+        'forecast_daily': forecast,
+        'demand_std': deviation,
+        'safety_stock': safety_stock.astype(np.int64),
+        'reorder_point': reorder_point.astype(np.int64),
+    }
+
+def save_recommendations(catalog_ids, results, batch_size=2000):
+    """Upsert one ReorderRecommendation per product"""
+    computed_at = timezone.now()
+    fields = ['daily_velocity', 'forecast_daily', 'demand_std', 'safety_stock', 'reorder_point']
+    columns = [results[field].tolist() for field in fields]
+
+    with transaction.atomic():
+        for start in range(0, len(catalog_ids), batch_size):
+            stop = start + batch_size
+            ReorderRecommendation.objects.bulk_create(
+                [
+                    ReorderRecommendation(
+                        product_id=product_id, computed_at=computed_at,
+                        **{field: column[i] for field, column in zip(fields, columns)}
+                    )
+                    for i, product_id in enumerate(catalog_ids[start:stop].tolist(), start=start)
+                ],
+                update_conflicts=True,
+                unique_fields=['product'],
+                update_fields=fields + ['computed_at'],
+            )
+
+def refresh_reorder_recommendations(days=730, **options):
+    """
+    Recompute demand forecasts for the whole catalog
+
+    Returns:
+        Number of products forecast
+    """
+    start_date = timezone.localdate() - timedelta(days=days - 1)
+    catalog_ids = np.fromiter(Product.objects.order_by('id').values_list('id', flat=True), dtype=np.int64)
+    if not len(catalog_ids):
+        return 0
+
+    sales = load_daily_sales(start_date, days)
+    results = compute_forecasts(catalog_ids, sales, days, **options)
+    save_recommendations(catalog_ids, results)
+    return len(catalog_ids)
@@ -0,0 +1,71 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.archive import start_or_resume_run, load_manifest, archive_batch, finish_run
+from inventory.reconcile import find_discrepancies
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll inventory transactions older than the retention window into per-product "
+        "summaries, exporting the detailed rows to gzipped chunks before deleting them. "
+        "An interrupted run is resumed automatically."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=730,
+                            help="Keep this many days of detailed ledger rows (default: 730)")
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help="Rows exported, summarised and deleted per chunk (default: 5000)")
+        parser.add_argument('--output-dir', default=os.path.join(settings.BASE_DIR, 'archive', 'inventory_ledger'),
+                            help="Directory that receives the chunk files and manifest")
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many chunks; run again to resume")
+        parser.add_argument('--strict', action='store_true',
+                            help="Fail if any product's stock disagrees with its ledger balance")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+
+        run, resumed = start_or_resume_run(options['days'], options['output_dir'])
+        os.makedirs(run.output_dir, exist_ok=True)
+        manifest = load_manifest(run)
+
+        if resumed:
+            self.stdout.write(f"Resuming archive run {run.pk} at transaction id {run.last_archived_id}")
+        else:
+            self.stdout.write(f"Started archive run {run.pk} for transactions before {run.cutoff:%Y-%m-%d %H:%M}")
+
+        batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            archived = archive_batch(run, manifest, options['batch_size'])
+            if not archived:
+                finish_run(run, manifest)
+                break
+            batches += 1
+            self.stdout.write(f"  chunk {run.chunks_written - 1}: {archived} rows (total {run.rows_archived})")
+
+        if run.status != 'COMPLETED':
+            self.stdout.write(self.style.WARNING(
+                f"Stopped after {batches} chunks; run the command again to resume run {run.pk}"
+            ))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {run.rows_archived} transactions into {run.output_dir}"
+        ))
+
+        discrepancies = find_discrepancies()
+        if not discrepancies:
+            self.stdout.write(self.style.SUCCESS("Ledger summaries reconcile with product stock"))
+            return
+
+        for product_id, stock, balance in discrepancies[:20]:
+            self.stdout.write(f"  product {product_id}: stock {stock}, ledger {balance}")
+        message = f"{len(discrepancies)} products have stock that does not match the ledger"
+        if options['strict']:
+            raise CommandError(message)
+        self.stdout.write(self.style.WARNING(message))
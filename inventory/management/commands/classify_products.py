@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from inventory.classification import refresh_classification, get_tier_summary
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh the ABC revenue classification, folding in only new order items unless --full is given. "
+        "Run it on a schedule (e.g. cron); the ABC report only reads what it stores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Recompute revenue from every order item instead of the new ones")
+        parser.add_argument('--velocity-days', type=int, default=30,
+                            help="Window for units-per-day velocity (default: 30)")
+
+    def handle(self, *args, **options):
+        items = refresh_classification(full=options['full'], velocity_days=options['velocity_days'])
+        self.stdout.write(f"Folded in {items} order items")
+        for row in get_tier_summary():
+            self.stdout.write(f"  {row['tier']}: {row['products']} products, ${row['revenue']}")
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.forecasting import refresh_reorder_recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast daily demand from SALE history and store safety stock and "
+        "reorder points for every product."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=730,
+                            help="Days of sales history to load (default: 730)")
+        parser.add_argument('--alpha', type=float, default=0.3,
+                            help="Exponential smoothing factor between 0 and 1 (default: 0.3)")
+        parser.add_argument('--window', type=int, default=28,
+                            help="Recent days used for velocity and demand variability (default: 28)")
+        parser.add_argument('--lead-time', type=int, default=7,
+                            help="Supplier lead time in days (default: 7)")
+        parser.add_argument('--service-level', type=float, default=0.95,
+                            help="Target probability of not stocking out during lead time (default: 0.95)")
+
+    def handle(self, *args, **options):
+        if not 0 < options['alpha'] <= 1:
+            raise CommandError("--alpha must be in (0, 1]")
+        if not 0.5 <= options['service_level'] < 1:
+            raise CommandError("--service-level must be in [0.5, 1)")
+        if options['days'] < 1 or options['window'] < 1:
+            raise CommandError("--days and --window must be positive")
+
+        started = time.perf_counter()
+        count = refresh_reorder_recommendations(
+            days=options['days'],
+            alpha=options['alpha'],
+            window=options['window'],
+            lead_time=options['lead_time'],
+            service_level=options['service_level'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"Forecast {count} products in {elapsed:.2f}s"))
@@ -0,0 +1,69 @@
+import csv
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.reconcile import find_discrepancies, create_corrections
+from store.models import Product
+
+
+class Command(BaseCommand):
+    help = (
+        "Check that every product's stock equals the net of its inventory ledger. "
+        "Product id ranges are aggregated in parallel, one grouped query per range."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help="Worker processes, each with its own DB connection (default: CPU count)")
+        parser.add_argument('--range-size', type=int, default=10000,
+                            help="Product ids per aggregate query (default: 10000)")
+        parser.add_argument('--output', help="Write the discrepancy report to this CSV file")
+        parser.add_argument('--fix', action='store_true',
+                            help="Create CORRECTION ledger entries for every discrepancy")
+
+    def handle(self, *args, **options):
+        if options['range_size'] < 1:
+            raise CommandError("--range-size must be positive")
+
+        started = time.perf_counter()
+        discrepancies = find_discrepancies(options['range_size'], options['workers'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(f"Reconciled stock in {elapsed:.2f}s using {options['workers']} workers")
+        if not discrepancies:
+            self.stdout.write(self.style.SUCCESS("All products match their ledger"))
+            return
+
+        discrepancies.sort()
+        titles = dict(
+            Product.objects.filter(id__in=[row[0] for row in discrepancies]).values_list('id', 'title')
+        )
+
+        if options['output']:
+            with open(options['output'], 'w', newline='') as handle:
+                writer = csv.writer(handle)
+                writer.writerow(['Product ID', 'Product', 'Stock', 'Ledger Balance', 'Difference'])
+                for product_id, stock, balance in discrepancies:
+                    writer.writerow([product_id, titles.get(product_id, ''), stock, balance, stock - balance])
+            self.stdout.write(f"Report written to {options['output']}")
+        else:
+            for product_id, stock, balance in discrepancies[:50]:
+                self.stdout.write(
+                    f"  {product_id:>8} {titles.get(product_id, '')[:40]:<40} "
+                    f"stock {stock:>7} ledger {balance:>7} diff {stock - balance:>+7}"
+                )
+            if len(discrepancies) > 50:
+                self.stdout.write(f"  ... and {len(discrepancies) - 50} more (use --output for the full report)")
+
+        self.stdout.write(self.style.WARNING(f"{len(discrepancies)} products disagree with the ledger"))
+
+        if options['fix']:
+            created = create_corrections(
+                discrepancies, notes=f"Stock reconciliation {timezone.now():%Y-%m-%d %H:%M}"
+            )
+            self.stdout.write(self.style.SUCCESS(f"Created {created} correction entries"))
+            if created < len(discrepancies):
+                self.stdout.write(f"{len(discrepancies) - created} products matched their ledger by the time they were locked")
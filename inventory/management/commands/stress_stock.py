@@ -0,0 +1,81 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.stress import OPERATIONS, cleanup_products, prepare_products, run_stress
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress adjust_stock, bulk_stock_update and the order pipeline from concurrent "
+        "workers, each with its own DB connection, then check Product.stock against the ledger."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 4,
+                            help="Concurrent workers (default: CPU count)")
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--operations', type=int, default=200, help="Operations per worker (default: 200)")
+        parser.add_argument('--products', type=int, default=20, help="Products to create for the run (default: 20)")
+        parser.add_argument('--hot-products', type=int, default=1,
+                            help="Products that receive the contended share of operations (default: 1)")
+        parser.add_argument('--hot-fraction', type=float, default=0.5,
+                            help="Share of operations aimed at the hot products (default: 0.5)")
+        parser.add_argument('--mix', default='adjust=6,bulk=2,order=2',
+                            help="Operation weights (default: adjust=6,bulk=2,order=2)")
+        parser.add_argument('--initial-stock', type=int, default=100000)
+        parser.add_argument('--max-retries', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help="Keep the stress products and orders afterwards")
+
+    def handle(self, *args, **options):
+        mix = {}
+        for part in options['mix'].split(','):
+            name, _, weight = part.partition('=')
+            if name not in OPERATIONS or not weight.isdigit():
+                raise CommandError(f"Invalid --mix entry '{part}', expected e.g. adjust=6,bulk=2,order=2")
+            mix[name] = int(weight)
+        if not 0 < options['hot_products'] <= options['products']:
+            raise CommandError("--hot-products must be between 1 and --products")
+
+        cleanup_products()
+        product_ids = prepare_products(options['products'], options['initial_stock'])
+        try:
+            report = run_stress(
+                product_ids,
+                workers=options['workers'],
+                operations=options['operations'],
+                mode=options['mode'],
+                hot_products=options['hot_products'],
+                hot_fraction=options['hot_fraction'],
+                mix=mix,
+                max_retries=options['max_retries'],
+                seed=options['seed'],
+            )
+        finally:
+            if not options['keep']:
+                cleanup_products()
+
+        self.stdout.write(
+            f"{report['workers']} {report['mode']} workers, {report['elapsed']:.2f}s, "
+            f"{report['throughput']:.1f} ops/s, p99 {report['p99_ms']:.1f} ms"
+        )
+        for name, stats in report['operations'].items():
+            self.stdout.write(
+                f"  {name:<8}{stats['count']:>8} ops   p50 {stats['p50_ms']:>8.2f} ms   p99 {stats['p99_ms']:>8.2f} ms"
+            )
+        self.stdout.write(
+            f"completed {report['completed']}, rejected {report['rejected']}, failed {report['failed']}, "
+            f"retries {report['retries']}, deadlocks {report['deadlocks']}"
+        )
+        for error in report['errors']:
+            self.stdout.write(self.style.WARNING(f"  {error}"))
+
+        if report['discrepancies'] or report['negative_stock']:
+            for product_id, stock, balance in report['discrepancies']:
+                self.stdout.write(self.style.ERROR(f"  product {product_id}: stock {stock}, ledger {balance}"))
+            raise CommandError(
+                f"Invariant violated: {len(report['discrepancies'])} ledger mismatches, "
+                f"{report['negative_stock']} products below zero"
+            )
+        self.stdout.write(self.style.SUCCESS("Invariant holds: every product's stock matches its ledger"))
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        ('store', '0003_alter_productimage_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerArchiveRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateTimeField(help_text='Transactions created before this moment are archived')),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed')], default='RUNNING', max_length=20)),
+                ('output_dir', models.CharField(help_text='Directory holding the exported chunks and manifest', max_length=500)),
+                ('last_archived_id', models.BigIntegerField(default=0, help_text='Highest transaction id already exported and deleted')),
+                ('chunks_written', models.IntegerField(default=0)),
+                ('rows_archived', models.BigIntegerField(default=0)),
+                ('started_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Ledger Archive Run',
+                'verbose_name_plural': 'Ledger Archive Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventoryLedgerSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('net_quantity', models.IntegerField(default=0, help_text='Sum of the archived transaction quantities')),
+                ('quantity_in', models.IntegerField(default=0)),
+                ('quantity_out', models.IntegerField(default=0)),
+                ('first_transaction_at', models.DateTimeField()),
+                ('last_transaction_at', models.DateTimeField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_summaries', to='store.product')),
+                ('archive_run', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='summaries', to='inventory.ledgerarchiverun')),
+            ],
+            options={
+                'verbose_name': 'Ledger Summary',
+                'verbose_name_plural': 'Ledger Summaries',
+                'unique_together': {('product', 'archive_run')},
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_ledger_archive'),
+        ('payment', '0001_initial'),
+        ('store', '0003_alter_productimage_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReorderRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('daily_velocity', models.FloatField(default=0, help_text='Average units sold per day over the recent window')),
+                ('forecast_daily', models.FloatField(default=0, help_text='Exponentially smoothed daily demand forecast')),
+                ('demand_std', models.FloatField(default=0, help_text='Standard deviation of daily demand over the recent window')),
+                ('safety_stock', models.IntegerField(default=0)),
+                ('reorder_point', models.IntegerField(default=0)),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Reorder Recommendation',
+                'verbose_name_plural': 'Reorder Recommendations',
+                'ordering': ['-forecast_daily'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='inventorytransaction',
+            index=models.Index(fields=['transaction_type', 'created_at'], name='inventory_tx_type_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='reorderrecommendation',
+            name='product',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reorder_recommendation', to='store.product'),
+        ),
+    ]
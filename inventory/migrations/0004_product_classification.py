@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-19 00:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_reorder_recommendation'),
+        ('store', '0003_alter_productimage_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassificationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_item_id', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Classification State',
+                'verbose_name_plural': 'Classification State',
+            },
+        ),
+        migrations.CreateModel(
+            name='ProductClassification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, help_text='Lifetime order item revenue', max_digits=14)),
+                ('units_sold', models.BigIntegerField(default=0)),
+                ('velocity', models.FloatField(default=0, help_text='Units sold per day over the recent window')),
+                ('revenue_share', models.FloatField(default=0, help_text='Cumulative revenue share up to and including this product')),
+                ('tier', models.CharField(choices=[('A', 'A - top revenue'), ('B', 'B - middle revenue'), ('C', 'C - long tail')], db_index=True, default='C', max_length=1)),
+                ('updated_at', models.DateTimeField()),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='classification', to='store.product')),
+            ],
+            options={
+                'verbose_name': 'Product Classification',
+                'verbose_name_plural': 'Product Classifications',
+                'ordering': ['-revenue'],
+            },
+        ),
+    ]
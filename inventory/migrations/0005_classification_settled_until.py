@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_product_classification'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='classificationstate',
+            name='last_order_item_id',
+        ),
+        migrations.AddField(
+            model_name='classificationstate',
+            name='settled_until',
+            field=models.DateTimeField(blank=True, help_text='Orders placed before this are folded in', null=True),
+        ),
+    ]
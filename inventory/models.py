@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from store.models import Product
+from store.invalidation import INVENTORY, STOCK_SETTINGS, InvalidatingManager
 from django.core.exceptions import ValidationError
 
 class InventoryTransaction(models.Model):
@@ -46,6 +47,9 @@ class InventoryTransaction(models.Model):
         verbose_name = 'Inventory Transaction'
         verbose_name_plural = 'Inventory Transactions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['transaction_type', 'created_at'], name='inventory_tx_type_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.title} - {self.get_transaction_type_display()} - {self.quantity}"
@@ -72,6 +76,9 @@ class InventoryAlert(models.Model):
     resolved_at = models.DateTimeField(null=True, blank=True)
     resolved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
 
+    cache_namespaces = (INVENTORY,)
+    objects = InvalidatingManager()
+
     class Meta:
         verbose_name = 'Inventory Alert'
         verbose_name_plural = 'Inventory Alerts'
@@ -85,7 +92,10 @@ class StockSetting(models.Model):
     low_stock_threshold = models.IntegerField(default=10, help_text="Global low stock warning threshold")
     allow_negative_stock = models.BooleanField(default=False, help_text="Allow products to go into negative stock")
     auto_adjust_on_sale = models.BooleanField(default=True, help_text="Automatically adjust stock when orders are completed")
-    
+
+    cache_namespaces = (INVENTORY, STOCK_SETTINGS)
+    objects = InvalidatingManager()
+
     class Meta:
         verbose_name = 'Stock Setting'
         verbose_name_plural = 'Stock Settings'
@@ -97,4 +107,105 @@ class StockSetting(models.Model):
         # Ensure only one settings record exists
         if not self.pk and StockSetting.objects.exists():
             raise ValidationError('Only one StockSetting instance is allowed')
-        return super().save(*args, **kwargs)
\ No newline at end of file
+        return super().save(*args, **kwargs)
+
+class LedgerArchiveRun(models.Model):
+    """A (possibly interrupted) archival pass over old inventory transactions"""
+    STATUS_CHOICES = [
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+    ]
+
+    cutoff = models.DateTimeField(help_text="Transactions created before this moment are archived")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='RUNNING')
+    output_dir = models.CharField(max_length=500, help_text="Directory holding the exported chunks and manifest")
+    last_archived_id = models.BigIntegerField(default=0, help_text="Highest transaction id already exported and deleted")
+    chunks_written = models.IntegerField(default=0)
+    rows_archived = models.BigIntegerField(default=0)
+    started_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Ledger Archive Run'
+        verbose_name_plural = 'Ledger Archive Runs'
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Archive before {self.cutoff:%Y-%m-%d} - {self.get_status_display()}"
+
+class InventoryLedgerSummary(models.Model):
+    """Per-product rollup of inventory transactions removed by an archive run"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='ledger_summaries')
+    archive_run = models.ForeignKey(LedgerArchiveRun, on_delete=models.PROTECT, related_name='summaries')
+    transaction_count = models.IntegerField(default=0)
+    net_quantity = models.IntegerField(default=0, help_text="Sum of the archived transaction quantities")
+    quantity_in = models.IntegerField(default=0)
+    quantity_out = models.IntegerField(default=0)
+    first_transaction_at = models.DateTimeField()
+    last_transaction_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Ledger Summary'
+        verbose_name_plural = 'Ledger Summaries'
+        unique_together = ['product', 'archive_run']
+
+    def __str__(self):
+        return f"{self.product.title} - {self.net_quantity} ({self.transaction_count} transactions)"
+
+class ReorderRecommendation(models.Model):
+    """Demand forecast and reorder point for a product, refreshed by forecast_demand"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='reorder_recommendation')
+    daily_velocity = models.FloatField(default=0, help_text="Average units sold per day over the recent window")
+    forecast_daily = models.FloatField(default=0, help_text="Exponentially smoothed daily demand forecast")
+    demand_std = models.FloatField(default=0, help_text="Standard deviation of daily demand over the recent window")
+    safety_stock = models.IntegerField(default=0)
+    reorder_point = models.IntegerField(default=0)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Reorder Recommendation'
+        verbose_name_plural = 'Reorder Recommendations'
+        ordering = ['-forecast_daily']
+
+    def __str__(self):
+        return f"{self.product.title} - reorder at {self.reorder_point}"
+
+    @property
+    def needs_reorder(self):
+        return self.reorder_point > 0 and self.product.stock <= self.reorder_point
+
+class ProductClassification(models.Model):
+    """ABC tier of a product by its share of total revenue"""
+    TIER_CHOICES = [
+        ('A', 'A - top revenue'),
+        ('B', 'B - middle revenue'),
+        ('C', 'C - long tail'),
+    ]
+
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='classification')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, help_text="Lifetime order item revenue")
+    units_sold = models.BigIntegerField(default=0)
+    velocity = models.FloatField(default=0, help_text="Units sold per day over the recent window")
+    revenue_share = models.FloatField(default=0, help_text="Cumulative revenue share up to and including this product")
+    tier = models.CharField(max_length=1, choices=TIER_CHOICES, default='C', db_index=True)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'Product Classification'
+        verbose_name_plural = 'Product Classifications'
+        ordering = ['-revenue']
+
+    def __str__(self):
+        return f"{self.product.title} - {self.tier}"
+
+class ClassificationState(models.Model):
+    """Watermark that lets the ABC report fold in only new order items"""
+    settled_until = models.DateTimeField(null=True, blank=True, help_text="Orders placed before this are folded in")
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Classification State'
+        verbose_name_plural = 'Classification State'
+
+    def __str__(self):
+        return f"Classified up to orders placed at {self.settled_until}"
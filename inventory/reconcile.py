@@ -0,0 +1,99 @@
+from django.db import transaction
+from django.db.models import Max, Min
+
+from .models import InventoryTransaction
+from .utils import get_ledger_balances
+from game_store.routers import use_primary
+from store.models import Product
+from store.renditions import process_pool
+
+def partition_product_ids(range_size):
+    """
+    Split the product id space into contiguous (low, high) ranges
+
+    Ranges are based on ids rather than row counts so that building them costs
+    a single MIN/MAX query; gaps in the id sequence only make some ranges lighter.
+    """
+    bounds = Product.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    return [
+        (low, min(low + range_size - 1, bounds['high']))
+        for low in range(bounds['low'], bounds['high'] + 1, range_size)
+    ]
+
+def reconcile_range(id_range):
+    """
+    Compare stock with the ledger balance for every product in an id range
+
+    Returns:
+        List of (product_id, stock, ledger_balance) tuples that disagree
+    """
+    balances = get_ledger_balances(id_range)
+    stocks = Product.objects.filter(id__range=id_range).values_list('id', 'stock')
+    return [
+        (product_id, stock, balances.get(product_id, 0))
+        for product_id, stock in stocks
+        if stock != balances.get(product_id, 0)
+    ]
+
+def find_discrepancies(range_size=10000, workers=1):
+    """
+    Reconcile all products, fanning the id ranges out over a process pool
+
+    The pool is the shared spawn-based one (see store.renditions.process_pool),
+    so each worker sets Django up and opens its own database connection
+    rather than inheriting the parent's.
+    """
+    ranges = partition_product_ids(range_size)
+    if workers <= 1 or len(ranges) <= 1:
+        results = map(reconcile_range, ranges)
+        return [row for rows in results for row in rows]
+
+    with process_pool(workers) as pool:
+        results = pool.map(reconcile_range, ranges)
+        return [row for rows in results for row in rows]
+
+@use_primary()
+def create_corrections(discrepancies, user=None, notes="Stock reconciliation", batch_size=1000):
+    """
+    Record ledger entries that bring each ledger balance up to the current stock
+
+    Stock itself is left untouched: the drift already happened outside the
+    ledger (e.g. an admin list edit), so the correction documents it. The
+    discrepancies were found without locks, and a sale since may have moved
+    stock and ledger together. So only their product ids are used: each batch
+    is locked the way adjust_stock locks it, stock and ledger balance are
+    read again under the lock, from the primary, and the corrections are
+    computed from those reads alone.
+
+    Returns:
+        Number of correction transactions created
+    """
+    product_ids = sorted({product_id for product_id, stock, balance in discrepancies})
+    created = 0
+    for start in range(0, len(product_ids), batch_size):
+        batch = product_ids[start:start + batch_size]
+        with transaction.atomic():
+            # Locked in id order, so two reconciliations can't deadlock
+            stocks = list(
+                Product.objects.select_for_update().filter(id__in=batch).order_by('id').values_list('id', 'stock')
+            )
+            balances = get_ledger_balances(batch)
+            corrections = [
+                InventoryTransaction(
+                    product_id=product_id,
+                    transaction_type='ADJUSTMENT',
+                    reason='CORRECTION',
+                    quantity=stock - balances.get(product_id, 0),
+                    previous_stock=balances.get(product_id, 0),
+                    new_stock=stock,
+                    notes=notes,
+                    user=user,
+                )
+                for product_id, stock in stocks
+                if stock != balances.get(product_id, 0)
+            ]
+            InventoryTransaction.objects.bulk_create(corrections)
+        created += len(corrections)
+    return created
@@ -0,0 +1,196 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.db import OperationalError, connection, transaction
+
+from .reconcile import find_discrepancies
+from .utils import adjust_stock, bulk_stock_update, process_order_stock_adjustment
+from monitoring.benchmarks import percentile
+from store.models import Category, Product
+from store.renditions import process_pool
+
+STRESS_PREFIX = 'stress'
+OPERATIONS = ('adjust', 'bulk', 'order')
+
+def prepare_products(count, initial_stock):
+    """
+    Create the products the stress run hammers, each with an INITIAL ledger entry
+
+    Returns:
+        List of product ids
+    """
+    category, created = Category.objects.get_or_create(slug=f'{STRESS_PREFIX}-category', defaults={'name': 'Stress'})
+    product_ids = []
+    for index in range(count):
+        product = Product.objects.create(
+            category=category, title=f'Stress product {index + 1}', slug=f'{STRESS_PREFIX}-product-{index + 1}',
+            price=Decimal('10.00'), stock=0,
+        )
+        adjust_stock(product, initial_stock, 'IN', 'INITIAL', notes='Stress test initial stock')
+        product_ids.append(product.id)
+    return product_ids
+
+def cleanup_products():
+    """Delete the orders, products and (by cascade) ledger rows a stress run created"""
+    from payment.models import Order
+
+    Order.objects.filter(email__endswith=f'@{STRESS_PREFIX}.example').delete()
+    Category.objects.filter(slug=f'{STRESS_PREFIX}-category').delete()
+
+def _with_retries(operation, stats, max_retries):
+    for attempt in range(max_retries + 1):
+        try:
+            return operation()
+        except OperationalError as e:
+            message = str(e).lower()
+            if 'deadlock' in message:
+                stats['deadlocks'] += 1
+            elif 'lock' not in message and 'serializ' not in message:
+                raise
+            if attempt == max_retries:
+                raise
+            stats['retries'] += 1
+            # Back off with jitter so colliding workers don't retry in lockstep
+            time.sleep(random.uniform(0, 0.002 * 2 ** attempt))
+
+def _place_order(product_ids, rng):
+    """Create an order the way complete_order does, then adjust stock the way payment_success does"""
+    from payment.models import Order, OrderItem
+
+    with transaction.atomic():
+        order = Order.objects.create(
+            full_name='Stress Shopper', email=f'shopper@{STRESS_PREFIX}.example',
+            shipping_address='1 Stress Street', amount_paid=Decimal('0'),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, quantity=rng.randint(1, 2), price=Decimal('10.00'))
+            for product_id in rng.sample(product_ids, min(len(product_ids), rng.randint(1, 3)))
+        ])
+    process_order_stock_adjustment(order)
+
+def run_worker(plan):
+    """
+    Run one worker's share of operations against its own database connection
+
+    Returns:
+        Dictionary of per-operation latencies and outcome counters
+    """
+    rng = random.Random(plan['seed'])
+    hot, cold = plan['hot_ids'], plan['cold_ids']
+    operations, weights = zip(*plan['mix'].items())
+    stats = {
+        'latencies': {name: [] for name in OPERATIONS},
+        'completed': 0, 'rejected': 0, 'failed': 0, 'retries': 0, 'deadlocks': 0, 'errors': [],
+    }
+
+    def pick(size=1):
+        pool = hot if hot and (not cold or rng.random() < plan['hot_fraction']) else cold
+        return rng.sample(pool, min(size, len(pool)))
+
+    try:
+        for _ in range(plan['operations']):
+            name = rng.choices(operations, weights)[0]
+            if name == 'adjust':
+                product_id = pick()[0]
+                quantity = rng.choice([-2, -1, 1, 2, 3])
+                operation = lambda: adjust_stock(
+                    Product(pk=product_id), quantity, 'ADJUSTMENT', 'MANUAL', notes='stress',
+                )
+            elif name == 'bulk':
+                rows = [{'product_id': product_id, 'quantity': rng.choice([-1, 1, 2])} for product_id in pick(3)]
+                operation = lambda: bulk_stock_update(rows)
+            else:
+                product_ids = pick(3)
+                operation = lambda: _place_order(product_ids, rng)
+
+            started = time.perf_counter()
+            try:
+                result = _with_retries(operation, stats, plan['max_retries'])
+                stats['completed'] += 1
+                if name == 'bulk':
+                    # bulk_stock_update swallows per-row errors, lock timeouts included
+                    for error in result['errors']:
+                        if error['error'].startswith('Insufficient stock'):
+                            stats['rejected'] += 1
+                        else:
+                            stats['failed'] += 1
+                            if len(stats['errors']) < 5:
+                                stats['errors'].append(f"bulk row: {error['error']}")
+            except ValueError:
+                stats['rejected'] += 1
+            except Exception as e:
+                stats['failed'] += 1
+                if len(stats['errors']) < 5:
+                    stats['errors'].append(f'{name}: {e}')
+            stats['latencies'][name].append(time.perf_counter() - started)
+    finally:
+        connection.close()
+    return stats
+
+def run_stress(product_ids, workers=8, operations=200, mode='thread', hot_products=1, hot_fraction=0.5,
+               mix=None, max_retries=10, seed=0):
+    """
+    Hammer adjust_stock, bulk_stock_update and the order pipeline concurrently
+
+    Each worker (thread or process) gets its own database connection. A
+    fraction of operations targets a small hot set of products to force
+    row-lock contention; the rest spread over the remaining products.
+    Lock timeouts and deadlocks are retried with jittered backoff and
+    counted. Finishes with the ledger invariant check.
+
+    Returns:
+        Dictionary with throughput, latency percentiles, outcome counts and discrepancies
+    """
+    mix = mix or {'adjust': 6, 'bulk': 2, 'order': 2}
+    plans = [
+        {
+            'seed': seed * 1000 + index,
+            'hot_ids': product_ids[:hot_products],
+            'cold_ids': product_ids[hot_products:],
+            'hot_fraction': hot_fraction,
+            'mix': mix,
+            'operations': operations,
+            'max_retries': max_retries,
+        }
+        for index in range(workers)
+    ]
+
+    if mode == 'process':
+        executor = process_pool(workers)
+    else:
+        executor = ThreadPoolExecutor(max_workers=workers)
+    started = time.perf_counter()
+    with executor:
+        results = list(executor.map(run_worker, plans))
+    elapsed = time.perf_counter() - started
+
+    report = {
+        'workers': workers, 'mode': mode, 'elapsed': elapsed,
+        'completed': 0, 'rejected': 0, 'failed': 0, 'retries': 0, 'deadlocks': 0, 'errors': [],
+        'operations': {},
+    }
+    latencies = {name: [] for name in OPERATIONS}
+    for stats in results:
+        for key in ('completed', 'rejected', 'failed', 'retries', 'deadlocks'):
+            report[key] += stats[key]
+        report['errors'].extend(error for error in stats['errors'] if error not in report['errors'])
+        for name, values in stats['latencies'].items():
+            latencies[name].extend(values)
+
+    for name, values in latencies.items():
+        if values:
+            report['operations'][name] = {
+                'count': len(values),
+                'p50_ms': percentile(values, 50) * 1000,
+                'p99_ms': percentile(values, 99) * 1000,
+            }
+    all_latencies = [value for values in latencies.values() for value in values]
+    report['throughput'] = len(all_latencies) / elapsed if elapsed else 0
+    report['p99_ms'] = percentile(all_latencies, 99) * 1000
+
+    touched = set(product_ids)
+    report['discrepancies'] = [row for row in find_discrepancies() if row[0] in touched]
+    report['negative_stock'] = Product.objects.filter(id__in=product_ids, stock__lt=0).count()
+    return report
@@ -1,3 +1,536 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import OperationalError
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from game_store.routers import PIN_COOKIE, ReplicaPinningMiddleware, ReplicaRouter, use_primary
+from monitoring.testing import QueryBudgetTestCase
+from payment.models import Order, OrderItem
+from store.models import Category, Product
+from . import archive
+from .classification import assign_tiers, get_tier_summary, refresh_classification
+from .context_processors import inventory_context
+from .events import EventStream, broadcaster, current_cursor
+from .forecasting import compute_forecasts, refresh_reorder_recommendations, smoothing_weights
+from .models import (
+    InventoryAlert, InventoryLedgerSummary, InventoryTransaction, ProductClassification, ReorderRecommendation,
+)
+from .reconcile import create_corrections, find_discrepancies
+from .stress import _with_retries, cleanup_products, prepare_products, run_stress
+from .utils import adjust_stock, get_ledger_balances
+
+class InventoryQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.staff)
+
+    def test_inventory_dashboard(self):
+        self.assertQueryBudget(9, lambda: self.client.get(reverse('inventory_dashboard')))
+
+    def test_inventory_events(self):
+        def poll():
+            response = self.client.get(reverse('inventory_events'), {'cursor': '0:0'})
+            b''.join(response.streaming_content)
+            return response
+
+        self.assertQueryBudget(4, poll)
+
+    def test_inventory_transactions(self):
+        self.assertQueryBudget(5, lambda: self.client.get(reverse('inventory_transactions')))
+
+    def test_stock_adjustment(self):
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('stock_adjustment')))
+
+    def test_stock_adjustment_post(self):
+        data = {'product': self.product.id, 'transaction_type': 'IN', 'quantity': 1, 'reason': 'PURCHASE', 'notes': ''}
+        self.assertQueryBudget(11, lambda: self.client.post(reverse('stock_adjustment'), data), status=302)
+
+    def test_quick_stock_adjustment(self):
+        data = {'product_id': self.product.id, 'quantity': 1, 'action': 'add', 'reason': 'PURCHASE'}
+        self.assertQueryBudget(10, lambda: self.client.post(reverse('quick_stock_adjustment'), data))
+
+    def test_bulk_stock_adjustment(self):
+        self.assertQueryBudget(2, lambda: self.client.get(reverse('bulk_stock_adjustment')))
+
+    def test_bulk_stock_adjustment_upload(self):
+        rows = f'product_slug,quantity,transaction_type,reason,notes\n{self.product.slug},1,IN,PURCHASE,budget\n'
+
+        def upload():
+            csv_file = SimpleUploadedFile('adjust.csv', rows.encode('utf-8'), content_type='text/csv')
+            return self.client.post(reverse('bulk_stock_adjustment'), {'csv_file': csv_file})
+
+        self.assertQueryBudget(12, upload, status=302)
+
+    def test_stock_alerts(self):
+        self.assertQueryBudget(4, lambda: self.client.get(reverse('stock_alerts')))
+
+    def test_resolve_alert(self):
+        url = reverse('resolve_alert', args=[self.alert.id])
+        self.assertQueryBudget(4, lambda: self.client.post(url))
+
+    def test_stock_settings(self):
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('stock_settings')))
+
+    def test_stock_report(self):
+        self.assertQueryBudget(5, lambda: self.client.get(reverse('stock_report')))
+
+    def test_stock_report_csv(self):
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('stock_report'), {'export': 'csv'}))
+
+    def test_abc_report(self):
+        # As the scheduled classify_products run leaves it
+        refresh_classification(full=True)
+        self.assertQueryBudget(5, lambda: self.client.get(reverse('abc_report')))
+
+    def test_abc_report_csv(self):
+        refresh_classification(full=True)
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('abc_report'), {'export': 'csv'}))
+
+    def test_abc_report_never_refreshes(self):
+        response = self.client.get(reverse('abc_report'))
+        self.assertContains(response, 'Last refreshed: never')
+        self.assertFalse(ProductClassification.objects.exists())
+
+    def test_inventory_context_processor(self):
+        request = RequestFactory().get('/')
+        request.user = self.staff
+        self.assertQueryBudget(0, lambda: inventory_context(request), status=None)
+
+    def test_inventory_summary_invalidated_by_stock_changes(self):
+        request = RequestFactory().get('/')
+        request.user = self.staff
+        out_of_stock = inventory_context(request)['inventory_summary']['out_of_stock_count']
+        with self.assertNumQueries(0):
+            inventory_context(request)
+
+        # Retires the product's low stock alert with update(), adds an out of stock one
+        adjust_stock(self.product, -self.product.stock, 'OUT', 'DAMAGED')
+        context = inventory_context(request)
+        self.assertEqual(context['inventory_summary']['out_of_stock_count'], out_of_stock + 1)
+        self.assertEqual(context['inventory_alerts_count'], InventoryAlert.objects.filter(is_active=True).count())
+        self.assertFalse(InventoryAlert.objects.filter(pk=self.alert.pk, is_active=True).exists())
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRoutingTests(TestCase):
+    # Routing is checked with QuerySet.db, which asks the router without
+    # querying: the test database has no replica1 connection to query
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Consoles', slug='consoles')
+        cls.product = Product.objects.create(category=category, title='Console', slug='console', price=100, stock=5)
+        cls.alert = InventoryAlert.objects.create(
+            product=cls.product, alert_type='LOW_STOCK', message='Low stock', threshold=10,
+        )
+
+    def route(self, request, view):
+        """Run view behind ReplicaPinningMiddleware; returns (what view returned, response)"""
+        seen = []
+
+        def get_response(request):
+            seen.append(view(request))
+            return HttpResponse()
+
+        response = ReplicaPinningMiddleware(get_response)(request)
+        return seen[0], response
+
+    def test_reads_replica_until_the_request_writes(self):
+        def view(request):
+            before = InventoryAlert.objects.all().db
+            InventoryAlert.objects.filter(pk=self.alert.pk).update(message='Restocked soon')
+            return before, InventoryAlert.objects.all().db
+
+        (before, after), response = self.route(RequestFactory().get('/'), view)
+        self.assertEqual((before, after), ('replica1', 'default'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # No write, no cookie
+        db, response = self.route(RequestFactory().get('/'), lambda request: Product.objects.all().db)
+        self.assertEqual(db, 'replica1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_pinned_requests_read_primary(self):
+        factory = RequestFactory()
+        fresh = factory.get('/')
+        fresh.COOKIES[PIN_COOKIE] = str(int(time.time()) + 10)
+        expired = factory.get('/')
+        expired.COOKIES[PIN_COOKIE] = str(int(time.time()) - 1)
+
+        def read(request):
+            return Product.objects.all().db
+
+        self.assertEqual(self.route(fresh, read)[0], 'default')
+        self.assertEqual(self.route(expired, read)[0], 'replica1')
+        self.assertEqual(self.route(factory.post('/'), read)[0], 'default')
+        # Outside a request, e.g. management commands
+        self.assertEqual(read(None), 'default')
+
+    def test_stock_adjustment_stays_on_primary(self):
+        def view(request):
+            with use_primary():
+                forced = Product.objects.all().db
+            # Would fail on any read sent to replica1
+            adjust_stock(self.product, 1, 'IN', 'PURCHASE')
+            return forced
+
+        forced, response = self.route(RequestFactory().get('/'), view)
+        self.assertEqual(forced, 'default')
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_migrations_only_on_primary(self):
+        router = ReplicaRouter()
+        self.assertTrue(router.allow_migrate('default', 'store'))
+        self.assertFalse(router.allow_migrate('replica1', 'store'))
+
+class ReconcileTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Consoles', slug='consoles')
+        cls.products = [
+            Product.objects.create(category=category, title=f'Console {number}', slug=f'console-{number}', price=100)
+            for number in range(3)
+        ]
+        for product in cls.products:
+            adjust_stock(product, 10, 'IN', 'INITIAL')
+
+    def drift(self, product, stock):
+        # As an admin list edit would, outside the ledger
+        Product.objects.filter(pk=product.pk).update(stock=stock)
+
+    def test_discrepancies_found_in_every_range(self):
+        self.drift(self.products[0], 7)
+        self.drift(self.products[2], 12)
+        expected = [(self.products[0].pk, 7, 10), (self.products[2].pk, 12, 10)]
+        self.assertEqual(sorted(find_discrepancies(range_size=1)), expected)
+        self.assertEqual(sorted(find_discrepancies(range_size=100)), expected)
+
+    def test_ranges_fan_out_over_the_shared_pool(self):
+        pools = []
+
+        class InlinePool:
+            # Stands in for the spawned workers, which can't see the test database
+            def __init__(self, workers):
+                pools.append(workers)
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *exc_info):
+                return False
+
+            def map(self, function, items):
+                return map(function, items)
+
+        self.drift(self.products[1], 3)
+        with mock.patch('inventory.reconcile.process_pool', InlinePool):
+            discrepancies = find_discrepancies(range_size=1, workers=2)
+        self.assertEqual(pools, [2])
+        self.assertEqual(discrepancies, [(self.products[1].pk, 3, 10)])
+
+    def test_fix_brings_the_ledger_to_stock(self):
+        self.drift(self.products[1], 4)
+        output = io.StringIO()
+        call_command('reconcile_stock', '--workers', '1', '--fix', stdout=output)
+        self.assertIn('Created 1 correction entries', output.getvalue())
+
+        correction = InventoryTransaction.objects.get(reason='CORRECTION')
+        self.assertEqual((correction.product_id, correction.quantity), (self.products[1].pk, -6))
+        self.assertEqual(get_ledger_balances([self.products[1].pk]), {self.products[1].pk: 4})
+        self.assertEqual(find_discrepancies(), [])
+
+    def test_products_that_caught_up_not_corrected(self):
+        self.drift(self.products[0], 7)
+        discrepancies = find_discrepancies()
+        # The ledger is brought in line before the fix runs
+        InventoryTransaction.objects.create(
+            product=self.products[0], transaction_type='ADJUSTMENT', reason='MANUAL', quantity=-3,
+            previous_stock=10, new_stock=7,
+        )
+        self.assertEqual(create_corrections(discrepancies), 0)
+        self.assertFalse(InventoryTransaction.objects.filter(reason='CORRECTION').exists())
+
+class EventStreamTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('events_staff', 'staff@events.example', 'events-password', is_staff=True)
+        category = Category.objects.create(name='Consoles', slug='consoles')
+        cls.product = Product.objects.create(category=category, title='Console', slug='console', price=100)
+
+    def record(self, count):
+        return [adjust_stock(self.product, 1, 'IN', 'PURCHASE').id for _ in range(count)]
+
+    def payload(self, transaction_id):
+        return {'id': transaction_id}
+
+    def transactions(self, messages):
+        return [
+            json.loads(message.split('data: ')[1])['id']
+            for message in messages if 'event: transaction\n' in message
+        ]
+
+    def test_push_ahead_of_the_poll_keeps_the_resume_id(self):
+        stream = EventStream({'transaction': 5, 'alert': 0})
+        self.assertIn('id: 5:0\n', stream.accept_pushed('transaction', self.payload(8)))
+
+        messages = stream.accept_polled([('transaction', self.payload(i)) for i in (6, 7, 8)])
+        self.assertEqual(len(messages), 2)
+        self.assertEqual(stream.event_id, '8:0')
+        self.assertIsNone(stream.accept_pushed('transaction', self.payload(8)))
+
+    def test_rows_committing_below_a_sent_id_are_not_lost(self):
+        stream = EventStream(current_cursor())
+        first, second, third = self.record(3)
+        # second's transaction commits only after the first poll has run
+        late = InventoryTransaction.objects.get(id=second)
+        InventoryTransaction.objects.filter(id=second).delete()
+        self.assertEqual(len(self.transactions(stream.poll())), 2)
+        self.assertEqual(stream.cursor['transaction'], first)
+
+        InventoryTransaction.objects.bulk_create([late])
+        self.assertEqual(self.transactions(stream.poll()), [second])
+        self.assertEqual(stream.cursor['transaction'], third)
+
+    def test_settled_gap_is_passed(self):
+        stream = EventStream({'transaction': 5, 'alert': 0})
+        stamped = timezone.now() - timedelta(minutes=5)
+        stream.accept_polled([('transaction', {'id': 8, 'created_at': stamped.isoformat()})])
+        self.assertEqual(stream.event_id, '8:0')
+
+    def test_resume_sends_rows_after_the_last_event_id(self):
+        first, *rest = self.record(3)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('inventory_events'), HTTP_LAST_EVENT_ID=f'{first}:0')
+        body = b''.join(response.streaming_content).decode()
+
+        sent = [
+            json.loads(message.split('data: ')[1])['id'] for message in body.split('\n\n')
+            if 'event: transaction' in message
+        ]
+        self.assertEqual(sent, rest)
+        self.assertIn(f'id: {rest[-1]}:0\n', body)
+
+    def test_no_serialization_without_subscribers(self):
+        self.assertFalse(broadcaster.has_subscribers())
+        with mock.patch('inventory.events.serialize_transaction') as serialize:
+            self.record(1)
+        serialize.assert_not_called()
+
+class ArchiveLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Consoles', slug='consoles')
+        cls.product = Product.objects.create(category=category, title='Console', slug='console', price=100)
+        cls.ids = [adjust_stock(cls.product, quantity, 'IN', 'PURCHASE').id for quantity in (5, 4, 3, 2, 1)]
+        InventoryTransaction.objects.filter(id__in=cls.ids[:3]).update(created_at=timezone.now() - timedelta(days=1000))
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output_dir = directory.name
+
+    def archive(self):
+        call_command('archive_ledger', '--batch-size', '2', '--output-dir', self.output_dir, stdout=io.StringIO())
+        run_dir, = os.listdir(self.output_dir)
+        with open(os.path.join(self.output_dir, run_dir, 'manifest.json')) as handle:
+            return os.path.join(self.output_dir, run_dir), json.load(handle)
+
+    def read_chunks(self, run_dir, manifest):
+        ids = []
+        for chunk in manifest['chunks']:
+            path = os.path.join(run_dir, chunk['file'])
+            with open(path, 'rb') as handle:
+                self.assertEqual(hashlib.sha256(handle.read()).hexdigest(), chunk['sha256'])
+            with gzip.open(path, 'rt') as handle:
+                ids.extend(json.loads(line)['id'] for line in handle)
+        return ids
+
+    def test_round_trip(self):
+        run_dir, manifest = self.archive()
+
+        self.assertEqual(manifest['status'], 'COMPLETED')
+        self.assertEqual(self.read_chunks(run_dir, manifest), self.ids[:3])
+        self.assertEqual(list(InventoryTransaction.objects.order_by('id').values_list('id', flat=True)), self.ids[3:])
+        summary = InventoryLedgerSummary.objects.get(product=self.product)
+        self.assertEqual((summary.transaction_count, summary.net_quantity), (3, 12))
+        self.assertEqual(get_ledger_balances([self.product.pk]), {self.product.pk: 15})
+
+    def test_resume_after_a_crash_before_commit(self):
+        save_manifest = archive._save_manifest
+
+        def crash_after_writing(run, manifest):
+            save_manifest(run, manifest)
+            if len(manifest['chunks']) == 2:
+                raise OSError("Killed before the commit")
+
+        with mock.patch('inventory.archive._save_manifest', crash_after_writing):
+            with self.assertRaises(OSError):
+                self.archive()
+        self.assertTrue(InventoryTransaction.objects.filter(id=self.ids[2]).exists())
+
+        run_dir, manifest = self.archive()
+        self.assertEqual([chunk['file'] for chunk in manifest['chunks']], ['chunk-000000.jsonl.gz', 'chunk-000001.jsonl.gz'])
+        self.assertEqual(self.read_chunks(run_dir, manifest), self.ids[:3])
+        self.assertEqual(get_ledger_balances([self.product.pk]), {self.product.pk: 15})
+
+class ForecastTests(SimpleTestCase):
+
+    def sales(self, series):
+        """load_daily_sales-shaped arrays from {product_id: daily units}"""
+        product_ids, offsets, units = [], [], []
+        for product_id, daily in sorted(series.items()):
+            for offset, quantity in enumerate(daily):
+                if quantity:
+                    product_ids.append(product_id)
+                    offsets.append(offset)
+                    units.append(quantity)
+        return np.array(product_ids, dtype=np.int64), np.array(offsets, dtype=np.int64), np.array(units, dtype=np.float64)
+
+    def test_weights_match_recursive_smoothing(self):
+        series = [3, 0, 5, 2, 2, 8, 1]
+        level = series[0]
+        for value in series[1:]:
+            level = 0.3 * value + 0.7 * level
+        weights = smoothing_weights(len(series), 0.3)
+        self.assertAlmostEqual(weights.sum(), 1)
+        self.assertAlmostEqual(float(weights @ np.array(series)), level)
+
+    def test_steady_and_varying_demand(self):
+        results = compute_forecasts(
+            np.array([1, 2, 3]), self.sales({2: [4] * 10, 3: [0, 2] * 5, 99: [7] * 10}), days=10,
+        )
+        steady, varying = 1, 2
+        self.assertEqual(results['reorder_point'][0], 0)
+        self.assertAlmostEqual(results['forecast_daily'][steady], 4)
+        self.assertEqual((results['safety_stock'][steady], results['reorder_point'][steady]), (0, 28))
+        self.assertAlmostEqual(results['daily_velocity'][varying], 1)
+        self.assertAlmostEqual(results['demand_std'][varying], 1)
+        # z(95%) * std * sqrt(lead time) = 1.645 * 1 * 2.646
+        self.assertEqual(results['safety_stock'][varying], 5)
+        self.assertEqual(results['reorder_point'][varying], math.ceil(results['forecast_daily'][varying] * 7 + 5))
+
+    def test_blocks_do_not_change_the_result(self):
+        sales = self.sales({1: [1, 0, 3], 4: [0, 2, 2], 5: [6, 0, 0]})
+        whole = compute_forecasts(np.array([1, 2, 4, 5]), sales, days=3)
+        blocked = compute_forecasts(np.array([1, 2, 4, 5]), sales, days=3, block_size=1)
+        for field, values in whole.items():
+            np.testing.assert_allclose(blocked[field], values)
+
+class ReorderRecommendationTests(TestCase):
+
+    def test_refresh_from_the_ledger(self):
+        category = Category.objects.create(name='Consoles', slug='consoles')
+        sold, idle = (
+            Product.objects.create(category=category, title=title, slug=title.lower(), price=100, stock=50)
+            for title in ('Sold', 'Idle')
+        )
+        adjust_stock(sold, -14, 'SALE', 'SALE')
+
+        self.assertEqual(refresh_reorder_recommendations(window=28), 2)
+        recommendation = ReorderRecommendation.objects.get(product=sold)
+        self.assertAlmostEqual(recommendation.daily_velocity, 0.5)
+        self.assertGreater(recommendation.reorder_point, 0)
+        self.assertEqual(ReorderRecommendation.objects.get(product=idle).reorder_point, 0)
+
+class ClassificationTests(TestCase):
+
+    def test_tier_is_where_revenue_starts(self):
+        tiers, shares = assign_tiers(np.array([5.0, 50.0, 0.0, 15.0, 30.0]))
+        # Ranked 50, 30, 15, 5: preceding shares 0, .5, .8, .95
+        self.assertEqual(tiers.tolist(), ['C', 'A', 'C', 'B', 'A'])
+        np.testing.assert_allclose(shares, [1.0, 0.5, 1.0, 0.95, 0.8])
+
+    def test_no_revenue_is_all_c(self):
+        tiers, shares = assign_tiers(np.zeros(3))
+        self.assertEqual(tiers.tolist(), ['C', 'C', 'C'])
+        self.assertEqual(shares.tolist(), [0, 0, 0])
+
+    def sell(self, product, quantity, placed=None):
+        order = Order.objects.create(full_name='Shopper', email='shopper@example.com', shipping_address='1 Street', amount_paid=0)
+        if placed is not None:
+            Order.objects.filter(pk=order.pk).update(date_ordered=placed)
+        OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+
+    def create_products(self):
+        category = Category.objects.create(name='Consoles', slug='consoles')
+        return [
+            Product.objects.create(category=category, title=f'Console {number}', slug=f'console-{number}', price=10)
+            for number in range(4)
+        ]
+
+    def test_incremental_refresh_matches_full(self):
+        products = self.create_products()
+
+        def snapshot():
+            return sorted(ProductClassification.objects.values_list('product_id', 'revenue', 'units_sold', 'tier'))
+
+        for product, quantity in zip(products, (9, 5, 1)):
+            self.sell(product, quantity)
+        self.assertEqual(refresh_classification(full=True, settle_delay=timedelta(0)), 3)
+        self.sell(products[2], 8)
+        self.sell(products[3], 2)
+        self.assertEqual(refresh_classification(settle_delay=timedelta(0)), 2)
+        incremental = snapshot()
+        refresh_classification(full=True, settle_delay=timedelta(0))
+        self.assertEqual(incremental, snapshot())
+        self.assertEqual(sum(row['products'] for row in get_tier_summary()), len(products))
+
+    def test_orders_committing_late_are_folded_in(self):
+        products = self.create_products()
+        refresh_classification(full=True)
+        # Stamped a minute ago by a checkout that only committed after the refresh
+        self.sell(products[0], 3, placed=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(refresh_classification(), 0)
+        self.assertEqual(refresh_classification(settle_delay=timedelta(0)), 1)
+        self.assertEqual(ProductClassification.objects.get(product=products[0]).units_sold, 3)
+
+class StressTests(TransactionTestCase):
+
+    def test_retries_counted_and_other_errors_raised(self):
+        stats = {'retries': 0, 'deadlocks': 0}
+        failures = [OperationalError('deadlock detected'), OperationalError('database is locked')]
+
+        def operation():
+            if failures:
+                raise failures.pop(0)
+            return 'done'
+
+        self.assertEqual(_with_retries(operation, stats, max_retries=3), 'done')
+        self.assertEqual(stats, {'retries': 2, 'deadlocks': 1})
+        with self.assertRaises(OperationalError):
+            _with_retries(lambda: (_ for _ in ()).throw(OperationalError('no such table')), stats, max_retries=3)
+        self.assertEqual(stats['retries'], 2)
+
+    def test_concurrent_run_keeps_the_ledger(self):
+        product_ids = prepare_products(4, 1000)
+        report = run_stress(product_ids, workers=2, operations=15, hot_products=1, seed=1)
+
+        self.assertEqual(sum(operation['count'] for operation in report['operations'].values()), 30)
+        self.assertEqual(set(report['operations']), {'adjust', 'bulk', 'order'})
+        # The shared-cache SQLite test database can refuse a contended row
+        # outright; whatever failed must have been lock contention, and must
+        # have left stock and ledger agreeing
+        self.assertTrue(all('locked' in error for error in report['errors']), report['errors'])
+        self.assertEqual((report['discrepancies'], report['negative_stock']), ([], 0))
+
+        cleanup_products()
+        self.assertFalse(Product.objects.filter(id__in=product_ids).exists())
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     # Dashboard
     path('', views.inventory_dashboard, name='inventory_dashboard'),
+    path('events/', views.inventory_events, name='inventory_events'),
     
     # Transactions
     path('transactions/', views.inventory_transactions, name='inventory_transactions'),
@@ -22,4 +23,5 @@ urlpatterns = [
     
     # Reports
     path('report/', views.stock_report, name='stock_report'),
+    path('report/abc/', views.abc_report, name='abc_report'),
 ]
\ No newline at end of file
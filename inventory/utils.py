@@ -1,20 +1,28 @@
 from django.db import transaction
 from django.utils import timezone
 from django.db.models import Sum, F
-from .models import InventoryTransaction, InventoryAlert, StockSetting
+from .models import InventoryTransaction, InventoryAlert, StockSetting, InventoryLedgerSummary
+from game_store.routers import use_primary
+from store.facets import record_locked_facet_values
 from store.models import Product
+from store.invalidation import INVENTORY, STOCK_SETTINGS, get_or_compute
+from monitoring.metrics import STOCK_ADJUSTMENTS, INVENTORY_ALERTS
 
 def get_stock_settings():
-    """Get or create stock settings"""
-    settings, created = StockSetting.objects.get_or_create(
-        defaults={
-            'low_stock_threshold': 10,
-            'allow_negative_stock': False,
-            'auto_adjust_on_sale': True
-        }
-    )
-    return settings
+    """Get or create stock settings, cached until StockSetting is next written"""
+    def load():
+        settings, created = StockSetting.objects.get_or_create(
+            defaults={
+                'low_stock_threshold': 10,
+                'allow_negative_stock': False,
+                'auto_adjust_on_sale': True
+            }
+        )
+        return settings
 
+    return get_or_compute(STOCK_SETTINGS, 'settings', load)
+
+@use_primary()
 def adjust_stock(product, quantity, transaction_type, reason, notes="", user=None, order_item=None):
     """
     Adjust product stock and create inventory transaction record
@@ -39,6 +47,7 @@ def adjust_stock(product, quantity, transaction_type, reason, notes="", user=Non
     with transaction.atomic():
         # Lock the product row to prevent race conditions
         product = Product.objects.select_for_update().get(pk=product.pk)
+        record_locked_facet_values(product)
         
         previous_stock = product.stock
         new_stock = previous_stock + quantity
@@ -67,6 +76,8 @@ def adjust_stock(product, quantity, transaction_type, reason, notes="", user=Non
         # Check for alerts
         create_inventory_alert(product, new_stock)
         
+        transaction.on_commit(lambda: STOCK_ADJUSTMENTS.inc(transaction_type=transaction_type))
+        
         return inventory_transaction
 
 def create_inventory_alert(product, current_stock):
@@ -104,7 +115,9 @@ def create_inventory_alert(product, current_stock):
             message=message,
             threshold=threshold
         )
+        transaction.on_commit(lambda: INVENTORY_ALERTS.inc(alert_type=alert_type))
 
+@use_primary()
 def process_order_stock_adjustment(order):
     """
     Process stock adjustments for a completed order
@@ -120,7 +133,7 @@ def process_order_stock_adjustment(order):
     # Import here to avoid circular imports
     from payment.models import OrderItem
     
-    order_items = OrderItem.objects.filter(order=order)
+    order_items = OrderItem.objects.filter(order=order).select_related('product')
     
     for item in order_items:
         try:
@@ -228,9 +241,15 @@ def get_inventory_summary():
     """
     Get inventory summary statistics
     
+    Cached under the inventory namespace, which every write to products,
+    alerts and stock settings bumps.
+    
     Returns:
         Dictionary with inventory statistics
     """
+    return get_or_compute(INVENTORY, 'summary', _compute_inventory_summary)
+
+def _compute_inventory_summary():
     settings = get_stock_settings()
     
     total_products = Product.objects.count()
@@ -251,4 +270,33 @@ def get_inventory_summary():
         'out_of_stock_count': out_of_stock_count,
         'negative_stock_count': negative_stock_count,
         'active_alerts': active_alerts,
-    }
\ No newline at end of file
+    }
+
+def get_ledger_balances(product_ids=None):
+    """
+    Net ledger quantity per product, including archived summaries
+    
+    Args:
+        product_ids: Optional iterable of product ids (or a (low, high) id range tuple)
+    
+    Returns:
+        Dictionary mapping product id to the net quantity recorded in the ledger
+    """
+    transactions = InventoryTransaction.objects.all()
+    summaries = InventoryLedgerSummary.objects.all()
+    
+    if isinstance(product_ids, tuple):
+        low, high = product_ids
+        transactions = transactions.filter(product_id__gte=low, product_id__lte=high)
+        summaries = summaries.filter(product_id__gte=low, product_id__lte=high)
+    elif product_ids is not None:
+        transactions = transactions.filter(product_id__in=product_ids)
+        summaries = summaries.filter(product_id__in=product_ids)
+    
+    balances = {}
+    for product_id, net in transactions.order_by().values_list('product_id').annotate(net=Sum('quantity')):
+        balances[product_id] = net or 0
+    for product_id, net in summaries.order_by().values_list('product_id').annotate(net=Sum('net_quantity')):
+        balances[product_id] = balances.get(product_id, 0) + (net or 0)
+    
+    return balances
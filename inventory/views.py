@@ -1,7 +1,9 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from django.db import transaction
 from django.db.models import Q, Sum, F
 from django.core.paginator import Paginator
@@ -11,10 +13,12 @@ from django.utils import timezone
 import csv
 import json
 
-from .models import InventoryTransaction, InventoryAlert, StockSetting
+from .models import InventoryTransaction, InventoryAlert, StockSetting, ReorderRecommendation, ProductClassification, ClassificationState
 from .forms import StockAdjustmentForm, BulkStockAdjustmentForm, QuickStockForm, StockSettingsForm, StockFilterForm
 from store.models import Product
 from .utils import adjust_stock, create_inventory_alert, get_stock_settings
+from .classification import get_tier_summary
+from .events import EventStream, parse_cursor, current_cursor
 
 def is_staff(user):
     """Check if user is staff"""
@@ -36,6 +40,11 @@ def inventory_dashboard(request):
     # Active alerts
     alerts = InventoryAlert.objects.filter(is_active=True).select_related('product')[:10]
     
+    # Products at or below their forecast reorder point
+    reorder_recommendations = ReorderRecommendation.objects.filter(
+        reorder_point__gt=0, product__stock__lte=F('reorder_point')
+    ).select_related('product').order_by('-forecast_daily')[:10]
+    
     context = {
         'total_products': total_products,
         'low_stock_products': low_stock_products,
@@ -43,10 +52,30 @@ def inventory_dashboard(request):
         'active_alerts': active_alerts,
         'recent_transactions': recent_transactions,
         'alerts': alerts,
+        'reorder_recommendations': reorder_recommendations,
     }
     
     return render(request, 'inventory/dashboard.html', context)
 
+@login_required
+@user_passes_test(is_staff)
+async def inventory_events(request):
+    """Server-sent event stream of new inventory transactions and alerts"""
+    cursor = parse_cursor(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+    if cursor is None:
+        cursor = await sync_to_async(current_cursor)()
+    
+    stream = EventStream(cursor)
+    if isinstance(request, ASGIRequest):
+        events = stream.stream()
+    else:
+        events = stream.stream_once()
+    
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 @user_passes_test(is_staff)
 def inventory_transactions(request):
@@ -339,3 +368,52 @@ def stock_report(request):
     }
     
     return render(request, 'inventory/stock_report.html', context)
+
+@login_required
+@user_passes_test(is_staff)
+def abc_report(request):
+    """
+    ABC classification of products by revenue contribution
+
+    Only reads what the classify_products command last stored; the
+    refresh runs from a scheduled job, not on page views.
+    """
+    classifications = ProductClassification.objects.select_related('product').order_by('-revenue')
+    
+    tier = request.GET.get('tier')
+    if tier in ('A', 'B', 'C'):
+        classifications = classifications.filter(tier=tier)
+    
+    # Export to CSV if requested
+    if request.GET.get('export') == 'csv':
+        response = HttpResponse(content_type='text/csv')
+        response['Content-Disposition'] = 'attachment; filename="abc_report.csv"'
+        
+        writer = csv.writer(response)
+        writer.writerow(['Product', 'Tier', 'Revenue', 'Cumulative Share', 'Units Sold', 'Units/Day', 'Current Stock'])
+        
+        for row in classifications.iterator(chunk_size=2000):
+            writer.writerow([
+                row.product.title,
+                row.tier,
+                row.revenue,
+                f'{row.revenue_share:.4f}',
+                row.units_sold,
+                f'{row.velocity:.2f}',
+                row.product.stock,
+            ])
+        
+        return response
+    
+    paginator = Paginator(classifications, 50)
+    page_number = request.GET.get('page')
+    classifications = paginator.get_page(page_number)
+    
+    context = {
+        'classifications': classifications,
+        'tier_summary': get_tier_summary(),
+        'selected_tier': tier,
+        'refreshed_at': ClassificationState.objects.values_list('refreshed_at', flat=True).first(),
+    }
+    
+    return render(request, 'inventory/abc_report.html', context)
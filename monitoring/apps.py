@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class MonitoringConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'monitoring'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .instrumentation import install_query_observer
+
+        # Lets the request middleware count queries in sync and async views alike
+        connection_created.connect(install_query_observer, dispatch_uid='monitoring.install_query_observer')
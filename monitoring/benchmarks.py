@@ -0,0 +1,189 @@
+import json
+import math
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+import django
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connections
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from .middleware import QueryCounter
+
+LATENCY_METRICS = ('p50_ms', 'p95_ms', 'p99_ms')
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+class BenchmarkRunner:
+    """
+    Time a callable over a number of rounds, in the style of pytest-benchmark
+
+    Every measured round records wall time and the number of SQL statements
+    sent to any database. Peak Python memory comes from one extra round under
+    tracemalloc, kept out of the timed rounds because tracing slows them down
+    several times over. Warmup rounds are run first and discarded so template
+    loading and first-hit caches don't skew the numbers.
+    """
+
+    def __init__(self, rounds=20, warmup=2):
+        self.rounds = rounds
+        self.warmup = warmup
+        self.results = {}
+
+    def bench(self, name, func):
+        for _ in range(self.warmup):
+            func()
+
+        timings = []
+        queries = []
+        for _ in range(self.rounds):
+            counter = QueryCounter()
+            with _count_queries(counter):
+                started = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - started)
+            queries.append(counter.count)
+
+        tracemalloc.start()
+        try:
+            func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        result = {
+            'rounds': self.rounds,
+            'min_ms': min(timings) * 1000,
+            'mean_ms': sum(timings) / len(timings) * 1000,
+            'p50_ms': percentile(timings, 50) * 1000,
+            'p95_ms': percentile(timings, 95) * 1000,
+            'p99_ms': percentile(timings, 99) * 1000,
+            'max_ms': max(timings) * 1000,
+            'queries': max(queries),
+            'peak_memory_kb': peak / 1024,
+        }
+        self.results[name] = result
+        return result
+
+def _count_queries(counter):
+    stack = ExitStack()
+    for alias in connections:
+        stack.enter_context(connections[alias].execute_wrapper(counter))
+    return stack
+
+def _check(response, expected=200):
+    if response.status_code != expected:
+        raise AssertionError(f"{response.request['PATH_INFO']} returned {response.status_code}, expected {expected}")
+    return response
+
+def build_scenarios(prefix='seed'):
+    """
+    The storefront, cart, checkout and inventory hot paths to benchmark
+
+    Expects a seeded dataset (see store.seeding.seed_store). Creates the staff
+    user the inventory views need.
+
+    Returns:
+        List of (name, callable) pairs
+    """
+    from store.models import Category, Product
+
+    product = Product.objects.filter(slug__startswith=f'{prefix}-').order_by('id').first()
+    category = Category.objects.filter(slug__startswith=f'{prefix}-').order_by('id').first()
+    if product is None or category is None:
+        raise ValueError(f"No seeded products found for prefix '{prefix}'")
+    search_term = product.title.split()[1]
+
+    staff, created = User.objects.get_or_create(
+        username=f'{prefix}_benchmark_staff', defaults={'is_staff': True, 'email': f'staff@{prefix}.example'},
+    )
+    shopper = Client()
+    staff_client = Client()
+    staff_client.force_login(staff)
+
+    cart_payload = {'action': 'post', 'product_id': product.id, 'product_quantity': 1}
+    order_payload = {
+        'action': 'post', 'name': 'Benchmark Shopper', 'email': f'bench@{prefix}.example',
+        'address1': '1 Bench Street', 'address2': '', 'city': 'Benchville', 'state': 'BS', 'zipcode': '00000',
+    }
+    bulk_csv = f'product_slug,quantity,transaction_type,reason,notes\n{product.slug},1,IN,PURCHASE,benchmark\n'
+
+    def cart_flow():
+        _check(shopper.post(reverse('cart_add'), cart_payload))
+        _check(shopper.get(reverse('cart_summary')))
+
+    def checkout():
+        _check(shopper.post(reverse('cart_add'), cart_payload))
+        _check(shopper.post(reverse('complete_order'), order_payload))
+
+    def bulk_adjustment():
+        upload = SimpleUploadedFile('adjust.csv', bulk_csv.encode('utf-8'), content_type='text/csv')
+        _check(staff_client.post(reverse('bulk_stock_adjustment'), {'csv_file': upload}), 302)
+
+    return [
+        ('store', lambda: _check(shopper.get(reverse('store')))),
+        ('list_category', lambda: _check(shopper.get(reverse('list_category', args=[category.slug])))),
+        ('product_info', lambda: _check(shopper.get(reverse('product_info', args=[product.slug])))),
+        ('live_search', lambda: _check(shopper.get(
+            reverse('live_search'), {'q': search_term}, headers={'x-requested-with': 'XMLHttpRequest'},
+        ))),
+        ('cart_add_summary', cart_flow),
+        ('complete_order', checkout),
+        ('inventory_dashboard', lambda: _check(staff_client.get(reverse('inventory_dashboard')))),
+        ('stock_report_csv', lambda: _check(staff_client.get(reverse('stock_report'), {'export': 'csv'}))),
+        ('bulk_stock_adjustment', bulk_adjustment),
+    ]
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Regressions of results against a baseline
+
+    A latency percentile or peak memory regresses when it grows by more than
+    threshold (0.2 = 20%); query counts are deterministic, so any increase
+    counts.
+
+    Returns:
+        List of dictionaries with benchmark, metric, baseline and current keys
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in LATENCY_METRICS + ('peak_memory_kb',):
+            if metric in previous and current[metric] > previous[metric] * (1 + threshold):
+                regressions.append({'benchmark': name, 'metric': metric,
+                                    'baseline': previous[metric], 'current': current[metric]})
+        if 'queries' in previous and current['queries'] > previous['queries']:
+            regressions.append({'benchmark': name, 'metric': 'queries',
+                                'baseline': previous['queries'], 'current': current['queries']})
+    return regressions
+
+def write_results(path, results, **metadata):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    document = {
+        'created_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connections['default'].vendor,
+        **metadata,
+        'benchmarks': results,
+    }
+    with open(path, 'w') as handle:
+        json.dump(document, handle, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path) as handle:
+        return json.load(handle)['benchmarks']
@@ -0,0 +1,101 @@
+import re
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache, partial
+
+_PLACEHOLDER_LIST = re.compile(r'%s(?:\s*,\s*%s)+')
+_NUMBER = re.compile(r'\b\d+\b')
+_QUOTED = re.compile(r"'(?:[^']|'')*'")
+_WHITESPACE = re.compile(r'\s+')
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """
+    Reduce a statement to its template
+
+    Django already passes parameters separately, so this only has to fold
+    variable-length IN lists, inline literals (LIMIT/OFFSET) and whitespace.
+    """
+    sql = _QUOTED.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('%s, ...', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+# Execute wrappers watching the current request's queries. Held in a
+# ContextVar, not installed with connection.execute_wrapper(): async views
+# query from sync_to_async's thread, whose connections a wrapper installed
+# by the request's own thread wouldn't see.
+_observers = ContextVar('query_observers', default=())
+
+def _observe(execute, sql, params, many, context):
+    for observer in _observers.get():
+        execute = partial(observer, execute)
+    return execute(sql, params, many, context)
+
+def install_query_observer(sender, connection, **kwargs):
+    """connection_created receiver: pass every connection's queries to observe_queries() blocks"""
+    if _observe not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks pushing and popping their own stay on top
+        connection.execute_wrappers.insert(0, _observe)
+
+@contextmanager
+def observe_queries(observer):
+    """Call observer, an execute wrapper, for every query run in this context"""
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _observers.reset(token)
+
+class QueryRecorder:
+    """
+    Execute wrapper that tallies query count, DB time and repeated templates
+
+    Install it with ``recorder.capture()`` around the code to measure; it
+    sees queries on every connection, including those async views run from
+    other threads.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.templates = defaultdict(lambda: [0, 0.0])
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            entry = self.templates[sql]
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def capture(self):
+        return observe_queries(self)
+
+    def repeated(self, threshold):
+        """
+        Statement templates executed more than threshold times, worst first
+
+        Raw statements are grouped by exact text while recording (cheap) and
+        only fingerprinted here, once per distinct statement.
+        """
+        totals = defaultdict(lambda: [0, 0.0])
+        for sql, (count, duration) in self.templates.items():
+            entry = totals[fingerprint(sql)]
+            entry[0] += count
+            entry[1] += duration
+        return sorted(
+            (
+                {'fingerprint': template, 'count': count, 'duration_ms': round(duration * 1000, 2)}
+                for template, (count, duration) in totals.items()
+                if count > threshold
+            ),
+            key=lambda item: item['count'],
+            reverse=True,
+        )
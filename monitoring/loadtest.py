@@ -0,0 +1,286 @@
+import io
+import random
+import secrets
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from game_store.db_pool import PooledDatabaseWrapperMixin, close_pool, pool_stats
+from .benchmarks import percentile
+
+LOADTEST_EMAIL_DOMAIN = 'loadtest.example'
+
+# Settings profiles to compare. DATABASE entries are applied to the default
+# database's settings rather than through override_settings (see settings_profile).
+PROFILES = {
+    'baseline': {},
+    'cached_db_sessions': {'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db'},
+    'signed_cookie_sessions': {'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies'},
+    'locmem_cache': {'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}},
+    'dummy_cache': {'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}},
+    'new_connections': {'DATABASE': {'CONN_MAX_AGE': 0}},
+    'persistent_connections': {'DATABASE': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True}},
+    # Fewer connections than the default 8 threads, as in a threaded worker
+    'pooled_connections': {'DATABASE': {'POOL': {'SIZE': 4, 'TIMEOUT': 10}}},
+}
+
+DEFAULT_MIX = {'browse': 5, 'search': 3, 'cart': 2, 'checkout': 1}
+
+class VirtualUser:
+    """
+    Drive a WSGI application directly, keeping cookies like a browser would
+
+    The CSRF cookie is preset and echoed in the X-CSRFToken header, the same
+    way the storefront's AJAX calls send it, so POSTs pass CsrfViewMiddleware.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.cookies = SimpleCookie()
+        self.cookies['csrftoken'] = secrets.token_hex(16)
+
+    def request(self, method, path, data=None, headers=None):
+        body = urlencode(data or {}).encode('utf-8') if method == 'POST' else b''
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': urlencode(data or {}) if method == 'GET' else '',
+            'SERVER_NAME': 'loadtest',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'HTTP_HOST': 'loadtest',
+            'HTTP_COOKIE': '; '.join(f'{key}={morsel.value}' for key, morsel in self.cookies.items()),
+            'HTTP_X_CSRFTOKEN': self.cookies['csrftoken'].value,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        for name, value in (headers or {}).items():
+            environ['HTTP_' + name.upper().replace('-', '_')] = value
+
+        captured = {}
+
+        def start_response(status, response_headers, exc_info=None):
+            captured['status'] = int(status.split(' ', 1)[0])
+            captured['headers'] = response_headers
+
+        result = self.application(environ, start_response)
+        try:
+            for chunk in result:
+                pass
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+        for name, value in captured['headers']:
+            if name.lower() == 'set-cookie':
+                self.cookies.load(value)
+        return captured['status']
+
+def build_scenarios(catalog):
+    """
+    Weighted user journeys: browse, search, add to cart, and full checkout
+
+    Each scenario is a function taking a VirtualUser and a Random and
+    yielding (label, method, path, data, headers) steps.
+    """
+    ajax = {'X-Requested-With': 'XMLHttpRequest'}
+
+    def browse(user, rng):
+        yield 'store', 'GET', reverse('store'), None, None
+        yield 'list_category', 'GET', reverse('list_category', args=[rng.choice(catalog['categories'])]), None, None
+        yield 'product_info', 'GET', reverse('product_info', args=[rng.choice(catalog['products'])[1]]), None, None
+
+    def search(user, rng):
+        for length in (2, 4):
+            term = rng.choice(catalog['terms'])[:length]
+            yield 'live_search', 'GET', reverse('live_search'), {'q': term}, ajax
+
+    def cart(user, rng):
+        product_id, slug = rng.choice(catalog['products'])
+        yield 'product_info', 'GET', reverse('product_info', args=[slug]), None, None
+        yield 'cart_add', 'POST', reverse('cart_add'), {
+            'action': 'post', 'product_id': product_id, 'product_quantity': rng.randint(1, 3),
+        }, ajax
+        yield 'cart_summary', 'GET', reverse('cart_summary'), None, None
+
+    def checkout(user, rng):
+        yield from cart(user, rng)
+        yield 'checkout', 'GET', reverse('checkout'), None, None
+        yield 'complete_order', 'POST', reverse('complete_order'), {
+            'action': 'post', 'name': 'Load Test', 'email': f'shopper@{LOADTEST_EMAIL_DOMAIN}',
+            'address1': '1 Load Street', 'address2': '', 'city': 'Loadville', 'state': 'LT', 'zipcode': '00000',
+        }, ajax
+
+    return {'browse': browse, 'search': search, 'cart': cart, 'checkout': checkout}
+
+def load_catalog(limit=500):
+    """Product ids/slugs, category slugs and search terms to draw requests from"""
+    from store.models import Category, Product
+
+    products = list(Product.objects.filter(available=True).order_by('?').values_list('id', 'slug')[:limit])
+    categories = list(Category.objects.values_list('slug', flat=True)[:limit])
+    if not products or not categories:
+        raise ValueError("The catalog is empty; seed it first with manage.py seed_store")
+    terms = [word for title in Product.objects.values_list('title', flat=True)[:limit] for word in title.split()]
+    return {'products': products, 'categories': categories, 'terms': terms}
+
+@contextmanager
+def settings_profile(overrides):
+    """
+    Apply a settings profile for the length of a run
+
+    Connection settings live in the per-database settings dict that
+    connection wrappers read when they are created, so DATABASE entries are
+    set on the shared dict and existing connections are closed to pick them
+    up; the load threads create their own. A POOL entry also switches to the
+    pooled backend, which requires CONN_MAX_AGE 0.
+    """
+    overrides = dict(overrides)
+    changes = dict(overrides.pop('DATABASE', {}))
+    database = connections.settings['default']
+    if 'POOL' in changes:
+        changes.update(ENGINE='game_store.db_pool.' + database['ENGINE'].rpartition('.')[2], CONN_MAX_AGE=0)
+    missing = object()
+    previous = {key: database.get(key, missing) for key in changes}
+    database.update(changes)
+    connections.close_all()
+    try:
+        with override_settings(**overrides):
+            yield
+    finally:
+        for key, value in previous.items():
+            if value is missing:
+                del database[key]
+            else:
+                database[key] = value
+        connections.close_all()
+        if 'POOL' in changes:
+            close_pool('default')
+
+def run_load(catalog, threads=8, duration=10.0, warmup=2.0, mix=None, seed=0):
+    """
+    Replay the scenario mix from a pool of threads against a fresh WSGIHandler
+
+    The handler is the same object game_store.wsgi builds, created inside the
+    active settings profile so middleware picks up its session engine. Each
+    thread is one virtual user at a time, starting a new user (new cookies)
+    for every journey. Requests finishing during warmup are not recorded.
+
+    Returns:
+        Dictionary with throughput, latency percentiles, error rate, database
+        connections opened per request, the pool's counters when pooled and a
+        per-step breakdown
+    """
+    application = WSGIHandler()
+    scenarios = build_scenarios(catalog)
+    mix = mix or DEFAULT_MIX
+    names, weights = zip(*mix.items())
+
+    lock = threading.Lock()
+    records = []
+    statuses = Counter()
+    errors = []
+    opened = [0]
+    started = time.perf_counter()
+    measure_from = started + warmup
+    stop_at = measure_from + duration
+
+    def count_connection(sender, connection, **kwargs):
+        # Pooled wrappers send this for every checkout; their opens are counted by the pool
+        if not isinstance(connection, PooledDatabaseWrapperMixin) and measure_from <= time.perf_counter() < stop_at:
+            with lock:
+                opened[0] += 1
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        local = []
+        try:
+            while time.perf_counter() < stop_at:
+                user = VirtualUser(application)
+                for label, method, path, data, headers in scenarios[rng.choices(names, weights)[0]](user, rng):
+                    request_started = time.perf_counter()
+                    try:
+                        status = user.request(method, path, data, headers)
+                    except Exception as e:
+                        status = 0
+                        with lock:
+                            if len(errors) < 10:
+                                errors.append(f'{label}: {e!r}')
+                    finished = time.perf_counter()
+                    if finished >= measure_from and finished < stop_at:
+                        local.append((label, finished - request_started, status))
+                    if status == 0 or status >= 400:
+                        break
+        finally:
+            connections.close_all()
+            with lock:
+                records.extend(local)
+
+    connection_created.connect(count_connection)
+    try:
+        pool = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+        for thread in pool:
+            thread.start()
+        time.sleep(max(0, measure_from - time.perf_counter()))
+        before = pool_stats().get('default')
+        for thread in pool:
+            thread.join()
+        after = pool_stats().get('default')
+    finally:
+        connection_created.disconnect(count_connection)
+    pool_counts = None
+    if after:
+        pool_counts = {key: after[key] - (before or {}).get(key, 0) for key in ('checkouts', 'opens', 'waits')}
+        opened[0] = pool_counts['opens']
+
+    by_label = defaultdict(list)
+    failed = 0
+    for label, latency, status in records:
+        by_label[label].append(latency)
+        statuses[status] += 1
+        if status == 0 or status >= 400:
+            failed += 1
+
+    latencies = [latency for label, latency, status in records]
+    return {
+        'threads': threads,
+        'duration': duration,
+        'requests': len(records),
+        'throughput': len(records) / duration if duration else 0,
+        'error_rate': failed / len(records) if records else 0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p90_ms': percentile(latencies, 90) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies, default=0) * 1000,
+        'connects_per_request': opened[0] / len(records) if records else 0,
+        'pool': pool_counts,
+        'statuses': dict(statuses),
+        'errors': errors,
+        'steps': {
+            label: {'count': len(values), 'p50_ms': percentile(values, 50) * 1000, 'p99_ms': percentile(values, 99) * 1000}
+            for label, values in sorted(by_label.items())
+        },
+    }
+
+def cleanup_orders():
+    """Delete the orders load-test checkouts created"""
+    from payment.models import Order
+
+    return Order.objects.filter(email__endswith=f'@{LOADTEST_EMAIL_DOMAIN}').delete()[0]
@@ -0,0 +1,107 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from monitoring.benchmarks import BenchmarkRunner, build_scenarios, compare, load_results, write_results
+from monitoring.testing import media_storage
+from store.seeding import seed_store
+
+BENCHMARK_DIR = os.path.join(settings.BASE_DIR, 'benchmarks')
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the storefront, cart, checkout and inventory hot paths against a freshly "
+        "seeded test database, write latency percentiles, query counts and peak memory to "
+        "JSON and compare them with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rounds', type=int, default=20, help="Measured rounds per benchmark (default: 20)")
+        parser.add_argument('--warmup', type=int, default=2, help="Discarded warmup rounds (default: 2)")
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--ledger-rows', type=int, default=20000)
+        parser.add_argument('--only', nargs='+', metavar='NAME', help="Run only these benchmarks")
+        parser.add_argument('--output', default=os.path.join(BENCHMARK_DIR, 'latest.json'),
+                            help="Results file (default: benchmarks/latest.json)")
+        parser.add_argument('--baseline', default=os.path.join(BENCHMARK_DIR, 'baseline.json'),
+                            help="Baseline to compare against, if it exists (default: benchmarks/baseline.json)")
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help="Allowed latency / memory growth over the baseline (default: 0.2 = 20%%)")
+        parser.add_argument('--save-baseline', action='store_true',
+                            help="Also write the results as the new baseline")
+        parser.add_argument('--keepdb', action='store_true', help="Reuse the test database between runs")
+
+    def handle(self, *args, **options):
+        if options['rounds'] < 1:
+            raise CommandError("--rounds must be positive")
+
+        setup_test_environment(debug=False)
+        connection = connections['default']
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        # Seeded images go to a scratch directory, kept next to the results
+        # only while the database that references them is kept too
+        media = os.path.join(BENCHMARK_DIR, 'media') if options['keepdb'] else None
+        try:
+            # Sampled instrumentation would land on random rounds and skew the percentiles
+            with media_storage(media), override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0, PROFILER_SAMPLE_RATE=0):
+                results = self.run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        write_results(options['output'], results, rounds=options['rounds'], products=options['products'],
+                      orders=options['orders'], ledger_rows=options['ledger_rows'])
+        self.stdout.write(f"Results written to {options['output']}")
+        if options['save_baseline']:
+            write_results(options['baseline'], results, rounds=options['rounds'], products=options['products'],
+                          orders=options['orders'], ledger_rows=options['ledger_rows'])
+            self.stdout.write(f"Baseline written to {options['baseline']}")
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write("No baseline to compare against; rerun with --save-baseline to create one")
+            return
+
+        regressions = compare(results, load_results(options['baseline']), options['threshold'])
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline"))
+            return
+        for regression in regressions:
+            self.stdout.write(self.style.ERROR(
+                f"{regression['benchmark']}: {regression['metric']} "
+                f"{regression['baseline']:.2f} -> {regression['current']:.2f}"
+            ))
+        raise CommandError(f"{len(regressions)} regressions over the {options['threshold']:.0%} threshold")
+
+    def run(self, options):
+        if not (options['keepdb'] and self._seeded()):
+            seed_store(products=options['products'], orders=options['orders'],
+                       ledger_rows=options['ledger_rows'], prefix='bench')
+
+        scenarios = build_scenarios(prefix='bench')
+        if options['only']:
+            unknown = set(options['only']) - {name for name, func in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+            scenarios = [(name, func) for name, func in scenarios if name in options['only']]
+
+        runner = BenchmarkRunner(rounds=options['rounds'], warmup=options['warmup'])
+        self.stdout.write(f"{'benchmark':<24}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'peak KB':>10}")
+        for name, func in scenarios:
+            result = runner.bench(name, func)
+            self.stdout.write(
+                f"{name:<24}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['queries']:>9}{result['peak_memory_kb']:>10.0f}"
+            )
+        return runner.results
+
+    def _seeded(self):
+        from store.models import Product
+
+        return Product.objects.filter(slug__startswith='bench-').exists()
@@ -0,0 +1,82 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from monitoring.loadtest import DEFAULT_MIX, PROFILES, cleanup_orders, load_catalog, run_load, settings_profile
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay a weighted browse/search/cart/checkout mix against the WSGI application "
+        "in-process from a pool of threads, and compare settings profiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help="Concurrent virtual users (default: 8)")
+        parser.add_argument('--duration', type=float, default=10.0, help="Measured seconds per profile (default: 10)")
+        parser.add_argument('--warmup', type=float, default=2.0, help="Unmeasured seconds first (default: 2)")
+        parser.add_argument('--mix', default=','.join(f'{name}={weight}' for name, weight in DEFAULT_MIX.items()),
+                            help="Scenario weights (default: browse=5,search=3,cart=2,checkout=1)")
+        parser.add_argument('--profile', action='append', choices=sorted(PROFILES), dest='profiles',
+                            help="Settings profile to run; repeat to compare (default: baseline)")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Also write the full results as JSON to this file")
+        parser.add_argument('--keep-orders', action='store_true',
+                            help="Keep the orders the checkout scenario creates")
+
+    def handle(self, *args, **options):
+        mix = {}
+        for part in options['mix'].split(','):
+            name, _, weight = part.partition('=')
+            if name not in DEFAULT_MIX or not weight.isdigit():
+                raise CommandError(f"Invalid --mix entry '{part}', expected e.g. browse=5,search=3,cart=2,checkout=1")
+            mix[name] = int(weight)
+        if options['threads'] < 1 or options['duration'] <= 0:
+            raise CommandError("--threads and --duration must be positive")
+
+        try:
+            catalog = load_catalog()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        results = {}
+        try:
+            for name in options['profiles'] or ['baseline']:
+                self.stdout.write(f"Running '{name}' with {options['threads']} threads for {options['duration']:.0f}s")
+                with settings_profile(PROFILES[name]):
+                    results[name] = run_load(
+                        catalog, threads=options['threads'], duration=options['duration'],
+                        warmup=options['warmup'], mix=mix, seed=options['seed'],
+                    )
+                for error in results[name]['errors']:
+                    self.stdout.write(self.style.WARNING(f"  {error}"))
+        finally:
+            if not options['keep_orders']:
+                cleanup_orders()
+
+        self.stdout.write(
+            f"\n{'profile':<24}{'req/s':>9}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}{'errors':>8}"
+            f"{'conn/req':>10}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<24}{result['throughput']:>9.1f}{result['p50_ms']:>9.1f}{result['p90_ms']:>9.1f}"
+                f"{result['p99_ms']:>9.1f}{result['max_ms']:>9.1f}{result['error_rate']:>8.1%}"
+                f"{result['connects_per_request']:>10.3f}"
+            )
+        for name, result in results.items():
+            if result['pool']:
+                self.stdout.write(
+                    f"Pool ({name}): {result['pool']['checkouts']} checkouts, {result['pool']['opens']} opens, "
+                    f"{result['pool']['waits']} waits"
+                )
+
+        last = results[name]
+        self.stdout.write(f"\nPer step ({name}):")
+        for label, step in last['steps'].items():
+            self.stdout.write(f"  {label:<16}{step['count']:>8}   p50 {step['p50_ms']:>8.1f} ms   p99 {step['p99_ms']:>8.1f} ms")
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(results, handle, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
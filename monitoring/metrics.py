@@ -0,0 +1,330 @@
+import fcntl
+import glob
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_INITIAL_FILE_SIZE = 1 << 16
+_HEADER = struct.Struct('<I4x')
+_KEY_LENGTH = struct.Struct('<I')
+_VALUE = struct.Struct('<d')
+_PROCESS_FILE = re.compile(r'^metrics_(?P<pid>\d+)\.db$')
+# Totals of the worker processes that have exited
+DEAD_PROCESSES_FILE = 'metrics_dead.db'
+
+def _padded(length):
+    # key length prefix + key, padded so the value that follows is 8-byte aligned
+    return (_KEY_LENGTH.size + length + 7) & ~7
+
+def read_mmap_file(path):
+    """Yield (key, value) pairs from a metrics file written by MmapValueStore"""
+    with open(path, 'rb') as handle:
+        data = handle.read()
+    if len(data) < _HEADER.size:
+        return
+    used = _HEADER.unpack_from(data, 0)[0]
+    position = _HEADER.size
+    while position < used:
+        length = _KEY_LENGTH.unpack_from(data, position)[0]
+        key = data[position + _KEY_LENGTH.size:position + _KEY_LENGTH.size + length].decode('utf-8')
+        position += _padded(length)
+        yield key, _VALUE.unpack_from(data, position)[0]
+        position += _VALUE.size
+
+class MmapValueStore:
+    """
+    Per-process metric values in an mmap'd file under a shared directory
+
+    Each process only ever writes its own file, so no cross-process locking is
+    needed; the exposition endpoint sums every file in the directory. A forked
+    worker notices its new pid on the next write and starts its own file, and
+    first folds the files of exited workers into one (see collect_dead_processes).
+    """
+
+    def __init__(self, directory, filename=None):
+        self.directory = directory
+        self.filename = filename
+        self.pid = None
+
+    def _open(self):
+        self.pid = os.getpid()
+        os.makedirs(self.directory, exist_ok=True)
+        if self.filename is None:
+            collect_dead_processes(self.directory)
+        self.path = os.path.join(self.directory, self.filename or f'metrics_{self.pid}.db')
+        self.file = open(self.path, 'a+b')
+        if os.fstat(self.file.fileno()).st_size < _INITIAL_FILE_SIZE:
+            self.file.truncate(_INITIAL_FILE_SIZE)
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.positions = {}
+        self.used = _HEADER.unpack_from(self.map, 0)[0] or _HEADER.size
+        _HEADER.pack_into(self.map, 0, self.used)
+        position = _HEADER.size
+        while position < self.used:
+            length = _KEY_LENGTH.unpack_from(self.map, position)[0]
+            key = self.map[position + _KEY_LENGTH.size:position + _KEY_LENGTH.size + length].decode('utf-8')
+            position += _padded(length)
+            self.positions[key] = position
+            position += _VALUE.size
+
+    def _position(self, key):
+        if self.pid != os.getpid():
+            self._open()
+        position = self.positions.get(key)
+        if position is not None:
+            return position
+
+        encoded = key.encode('utf-8')
+        needed = self.used + _padded(len(encoded)) + _VALUE.size
+        if needed > len(self.map):
+            size = len(self.map)
+            while size < needed:
+                size *= 2
+            self.map.close()
+            self.file.truncate(size)
+            self.map = mmap.mmap(self.file.fileno(), 0)
+
+        _KEY_LENGTH.pack_into(self.map, self.used, len(encoded))
+        self.map[self.used + _KEY_LENGTH.size:self.used + _KEY_LENGTH.size + len(encoded)] = encoded
+        position = self.used + _padded(len(encoded))
+        _VALUE.pack_into(self.map, position, 0.0)
+        self.used = position + _VALUE.size
+        _HEADER.pack_into(self.map, 0, self.used)
+        self.positions[key] = position
+        return position
+
+    def add(self, key, amount):
+        position = self._position(key)
+        current = _VALUE.unpack_from(self.map, position)[0]
+        _VALUE.pack_into(self.map, position, current + amount)
+
+    def items(self):
+        totals = defaultdict(float)
+        for path in glob.glob(os.path.join(self.directory, 'metrics_*.db')):
+            try:
+                for key, value in read_mmap_file(path):
+                    totals[key] += value
+            except FileNotFoundError:
+                # Folded into the dead processes' file meanwhile
+                pass
+        return totals.items()
+
+    def close(self):
+        if self.pid is not None:
+            self.map.close()
+            self.file.close()
+            self.pid = None
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def collect_dead_processes(directory):
+    """
+    Fold the files of exited worker processes into DEAD_PROCESSES_FILE
+
+    Otherwise every worker restart leaves a file behind for good. Their
+    values are kept rather than dropped, so the counters summed from the
+    directory never go backwards. Runs under an exclusive lock, so two
+    workers starting together don't fold the same file twice.
+
+    Returns:
+        Number of files folded
+    """
+    folded = 0
+    with open(os.path.join(directory, 'metrics.lock'), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        dead = MmapValueStore(directory, DEAD_PROCESSES_FILE)
+        try:
+            for entry in os.scandir(directory):
+                match = _PROCESS_FILE.match(entry.name)
+                if not match or _process_alive(int(match['pid'])):
+                    continue
+                for key, value in read_mmap_file(entry.path):
+                    dead.add(key, value)
+                os.remove(entry.path)
+                folded += 1
+        finally:
+            dead.close()
+    return folded
+
+class MemoryValueStore:
+    """Metric values for a single process"""
+
+    def __init__(self):
+        self.values = defaultdict(float)
+
+    def add(self, key, amount):
+        self.values[key] += amount
+
+    def items(self):
+        return list(self.values.items())
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def _labels(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return [(name, str(labels[name])) for name in self.labelnames]
+
+    def _add(self, sample, labels, amount):
+        self.registry.add(json.dumps([self.name, sample, labels]), amount)
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self._add('_total', self._labels(labels), amount)
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        labels = self._labels(labels)
+        # Stored per bucket (not cumulative) so one observation is one write
+        for bound in self.buckets:
+            if value <= bound:
+                self._add('_bucket', labels + [('le', _format_value(bound))], 1)
+                break
+        self._add('_sum', labels, value)
+        self._add('_count', labels, 1)
+
+class Registry:
+    """Process-wide collection of metrics with Prometheus text exposition"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            directory = getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+            self._store = MmapValueStore(directory) if directory else MemoryValueStore()
+        return self._store
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def add(self, key, amount):
+        with self.lock:
+            self.store.add(key, amount)
+
+    def collect(self):
+        """Render every metric in the Prometheus text format (version 0.0.4)"""
+        with self.lock:
+            samples = defaultdict(list)
+            for key, value in self.store.items():
+                name, sample, labels = json.loads(key)
+                samples[name].append((sample, labels, value))
+
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            family = f'{name}_total' if metric.kind == 'counter' else name
+            lines.append(f'# HELP {family} {metric.documentation}')
+            lines.append(f'# TYPE {family} {metric.kind}')
+            rows = samples.get(name, [])
+            if metric.kind == 'histogram':
+                lines.extend(self._histogram_lines(metric, rows))
+            else:
+                for sample, labels, value in sorted(rows):
+                    lines.append(f'{name}{sample}{_format_labels(labels)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _histogram_lines(metric, rows):
+        series = defaultdict(lambda: {'buckets': defaultdict(float), 'sum': 0.0, 'count': 0.0})
+        for sample, labels, value in rows:
+            if sample == '_bucket':
+                key = tuple(tuple(label) for label in labels[:-1])
+                series[key]['buckets'][labels[-1][1]] += value
+            else:
+                series[tuple(tuple(label) for label in labels)][sample[1:]] += value
+
+        lines = []
+        for labels, data in sorted(series.items()):
+            cumulative = 0.0
+            for bound in metric.buckets:
+                le = _format_value(bound)
+                cumulative += data['buckets'].get(le, 0.0)
+                lines.append(f'{metric.name}_bucket{_format_labels(list(labels) + [("le", le)])} {_format_value(cumulative)}')
+            lines.append(f'{metric.name}_sum{_format_labels(labels)} {_format_value(data["sum"])}')
+            lines.append(f'{metric.name}_count{_format_labels(labels)} {_format_value(data["count"])}')
+        return lines
+
+registry = Registry()
+
+REQUEST_LATENCY = Histogram(
+    registry, 'http_request_duration_seconds', 'Request latency by URL name', ['view', 'method'],
+)
+REQUESTS = Counter(
+    registry, 'http_requests', 'Requests by URL name and status', ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    registry, 'db_queries_per_request', 'Database queries issued per request', ['view'],
+    buckets=(1, 2, 5, 10, 20, 50, 100, 250),
+)
+CACHE_LOOKUPS = Counter(
+    registry, 'cache_lookups', 'Cache lookups by cache name and result (hit or miss)', ['cache', 'result'],
+)
+ORDERS_CREATED = Counter(
+    registry, 'orders_created', 'Orders created by complete_order', ['customer'],
+)
+STOCK_ADJUSTMENTS = Counter(
+    registry, 'stock_adjustments', 'Committed stock adjustments by transaction type', ['transaction_type'],
+)
+INVENTORY_ALERTS = Counter(
+    registry, 'inventory_alerts', 'Inventory alerts raised by alert type', ['alert_type'],
+)
+DB_POOL_CHECKOUTS = Counter(
+    registry, 'db_pool_checkouts', 'Connections checked out of the pool (see game_store.db_pool)', ['database'],
+)
+DB_POOL_OPENS = Counter(
+    registry, 'db_pool_opens', 'Pool checkouts that had to open a new connection', ['database'],
+)
+DB_POOL_WAITS = Counter(
+    registry, 'db_pool_waits', 'Pool checkouts that waited for a connection to be returned', ['database'],
+)
+
+def record_cache_lookup(cache_name, hit):
+    CACHE_LOOKUPS.inc(cache=cache_name, result='hit' if hit else 'miss')
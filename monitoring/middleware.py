@@ -0,0 +1,130 @@
+import json
+import logging
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from .instrumentation import QueryRecorder, observe_queries
+from .metrics import REQUEST_LATENCY, REQUESTS, DB_QUERIES
+
+logger = logging.getLogger('monitoring.sql')
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.url_name if match and match.url_name else request.path
+
+class QueryInstrumentationMiddleware:
+    """
+    Record query count, DB time and repeated statements for sampled requests
+
+    Results are exposed as a ``Server-Timing`` header and a structured log
+    line; any statement template executed more than
+    ``SQL_REPEATED_QUERY_THRESHOLD`` times in one request (the usual N+1
+    signature) is logged as a warning.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'SQL_INSTRUMENTATION_SAMPLE_RATE', 0.0)
+        self.threshold = getattr(settings, 'SQL_REPEATED_QUERY_THRESHOLD', 5)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def sampled(self):
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.capture():
+            response = self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with recorder.capture():
+            response = await self.get_response(request)
+        return self.report(request, response, recorder, time.perf_counter() - started)
+
+    def report(self, request, response, recorder, total):
+        request.sql_recorder = recorder
+        response['Server-Timing'] = (
+            f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries", '
+            f'app;dur={total * 1000:.2f}'
+        )
+
+        repeated = recorder.repeated(self.threshold)
+        record = {
+            'view': _view_name(request),
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(recorder.duration * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'repeated': repeated,
+        }
+        if repeated:
+            logger.warning('Repeated queries detected %s', json.dumps(record), extra={'sql_stats': record})
+        else:
+            logger.info('%s', json.dumps(record), extra={'sql_stats': record})
+        return response
+
+class QueryCounter:
+    """Minimal execute wrapper: count statements, nothing else"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+class MetricsMiddleware:
+    """Record latency, status and query count for every request, labelled by URL name"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        started = time.perf_counter()
+        # Every connection, replicas included
+        with observe_queries(counter):
+            response = self.get_response(request)
+        self.record(request, response, counter, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with observe_queries(counter):
+            response = await self.get_response(request)
+        self.record(request, response, counter, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, counter, duration):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        REQUEST_LATENCY.observe(duration, view=view, method=request.method)
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        DB_QUERIES.observe(counter.count, view=view)
@@ -0,0 +1,162 @@
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PROFILE_SUFFIX = '.pstats'
+_UNSAFE = re.compile(r'[^A-Za-z0-9_]+')
+_FILENAME = re.compile(r'^(?P<timestamp>\d+)-(?P<view>[A-Za-z0-9_]+)-(?P<duration>\d+)ms\.pstats$')
+
+# Held while a request is profiled: since Python 3.12 only one profiler can
+# be active per process, so overlapping requests go unprofiled
+_profiling = threading.Lock()
+
+def get_profile_dir():
+    return str(getattr(settings, 'PROFILER_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+def save_profile(profile, view_name, duration):
+    """
+    Dump a profile and rotate the directory down to PROFILER_MAX_FILES
+
+    The view name and duration are encoded in the file name so listing the
+    captured profiles never has to open them.
+    """
+    profile_dir = get_profile_dir()
+    os.makedirs(profile_dir, exist_ok=True)
+    view = _UNSAFE.sub('_', view_name).strip('_') or 'unknown'
+    filename = f'{int(time.time() * 1000)}-{view}-{int(duration * 1000)}ms{PROFILE_SUFFIX}'
+    profile.dump_stats(os.path.join(profile_dir, filename))
+
+    max_files = getattr(settings, 'PROFILER_MAX_FILES', 200)
+    entries = sorted(
+        (entry for entry in os.scandir(profile_dir) if entry.name.endswith(PROFILE_SUFFIX)),
+        key=lambda entry: entry.name,
+    )
+    for entry in entries[:max(len(entries) - max_files, 0)]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+    return filename
+
+def list_profiles():
+    """
+    Captured profiles grouped by view name, slowest first
+
+    Returns:
+        Dictionary mapping view name to a list of profile dictionaries
+    """
+    profile_dir = get_profile_dir()
+    if not os.path.isdir(profile_dir):
+        return {}
+
+    by_view = defaultdict(list)
+    for entry in os.scandir(profile_dir):
+        match = _FILENAME.match(entry.name)
+        if match:
+            by_view[match['view']].append({
+                'name': entry.name,
+                'captured': datetime.fromtimestamp(int(match['timestamp']) / 1000, tz=timezone.utc),
+                'duration_ms': int(match['duration']),
+            })
+    for profiles in by_view.values():
+        profiles.sort(key=lambda profile: profile['duration_ms'], reverse=True)
+    return dict(sorted(by_view.items(), key=lambda item: item[1][0]['duration_ms'], reverse=True))
+
+def render_profile(name, sort='cumulative', limit=60):
+    """Text report for one captured profile, or None if it doesn't exist"""
+    if not _FILENAME.match(name):
+        return None
+    path = os.path.join(get_profile_dir(), name)
+    if not os.path.exists(path):
+        return None
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return output.getvalue()
+
+class ProfilingMiddleware:
+    """
+    Profile a request with cProfile and keep the stats on local disk
+
+    A request is profiled when a staff user sends the ``X-Profile`` header,
+    or at random with probability ``PROFILER_SAMPLE_RATE`` (0 by default).
+    Must sit after AuthenticationMiddleware so the staff check can run.
+    Under ASGI the profile covers everything the event loop ran meanwhile,
+    other requests included. Only one request per process is profiled at a
+    time; others arriving meanwhile are served unprofiled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PROFILER_SAMPLE_RATE', 0.0)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def should_profile(self, request, user=None):
+        if 'X-Profile' in request.headers:
+            user = user or getattr(request, 'user', None)
+            return bool(user and user.is_staff)
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = self.start(request)
+        if profile is None:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(profile)
+        return self.save(request, response, profile, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        # The lazy request.user would query from the event loop; auser() doesn't
+        user = await request.auser() if 'X-Profile' in request.headers else None
+        profile = self.start(request, user)
+        if profile is None:
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(profile)
+        return self.save(request, response, profile, time.perf_counter() - started)
+
+    def start(self, request, user=None):
+        """A running profile for this request, or None if it isn't profiled"""
+        if not self.should_profile(request, user) or not _profiling.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) is active
+            _profiling.release()
+            return None
+        return profile
+
+    def stop(self, profile):
+        profile.disable()
+        _profiling.release()
+
+    def save(self, request, response, profile, duration):
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.url_name if match and match.url_name else request.path
+        response['X-Profile-Id'] = save_profile(profile, view_name, duration)
+        return response
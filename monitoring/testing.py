@@ -0,0 +1,138 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from store.seeding import seed_store
+
+SMALL_DATASET = {'categories': 2, 'products': 6, 'users': 3, 'orders': 8, 'ledger_rows': 30, 'images': 2}
+LARGE_DATASET = {'categories': 3, 'products': 40, 'users': 6, 'orders': 60, 'ledger_rows': 300, 'images': 2}
+
+@contextmanager
+def media_storage(location=None):
+    """
+    Point the default storage at a local directory
+
+    Seeded placeholder images and their renditions then stay out of the
+    configured media storage (S3 in production). Without a location a
+    temporary directory is used and removed afterwards.
+    """
+    directory = location or tempfile.mkdtemp()
+    storages = dict(settings.STORAGES, default={
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {'location': directory},
+    })
+    try:
+        with override_settings(STORAGES=storages, MEDIA_ROOT=directory):
+            yield directory
+    finally:
+        if location is None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+class QueryBudgetTestCase(TestCase):
+    """
+    Base class for per-view query budget tests
+
+    Each test seeds a small dataset, measures a request, grows the dataset
+    and measures it again. The count must stay within the budget *and* must
+    not change with the row count, which is what an N+1 regression looks
+    like. Grown rows are folded onto the fixtures the tests request (the
+    small category, the customer, the alerts list) so list pages really do
+    get longer.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media = media_storage()
+        cls._media.__enter__()
+        cls._settings_override = override_settings(
+            SQL_INSTRUMENTATION_SAMPLE_RATE=0, PROFILER_SAMPLE_RATE=0,
+            # Budgets are for rendering; a page cache hit would hide an N+1
+            PAGE_CACHE_TIMEOUT=0,
+            # A test mirror is a separate connection that can't see the test's
+            # uncommitted rows, so everything is read from the primary
+            REPLICA_DATABASES=[],
+        )
+        cls._settings_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._settings_override.disable()
+        cls._media.__exit__(None, None, None)
+
+    @classmethod
+    def setUpTestData(cls):
+        from inventory.models import InventoryAlert, StockSetting
+        from payment.models import OrderItem
+        from store.models import Category, Product
+
+        seed_store(prefix='small', **SMALL_DATASET)
+        # As a running store has; created lazily it would bump the inventory
+        # namespace in the middle of the first measured request
+        StockSetting.objects.create()
+        cls.category = Category.objects.filter(slug__startswith='small-').order_by('id').first()
+        cls.product = Product.objects.filter(category=cls.category).order_by('id').first()
+        cls.staff = User.objects.create_user('budget_staff', 'staff@budget.example', 'budget-password', is_staff=True)
+        cls.customer = User.objects.create_user('budget_customer', 'customer@budget.example', 'budget-password')
+        OrderItem.objects.filter(order__email__endswith='@small.example').update(user=cls.customer)
+        cls.alert = InventoryAlert.objects.create(
+            product=cls.product, alert_type='LOW_STOCK', message='Low stock', threshold=10,
+        )
+
+    def setUp(self):
+        # Each test's rows are rolled back without a namespace bump, so cached
+        # values must not outlive the test; clearing the versions also makes
+        # the per-process snapshots reload
+        cache.clear()
+
+    def grow_dataset(self):
+        from inventory.classification import refresh_classification
+        from inventory.models import InventoryAlert
+        from payment.models import Order, OrderItem
+        from store.models import Product
+
+        seed_store(prefix='large', seed=7, **LARGE_DATASET)
+        large_products = Product.objects.filter(slug__startswith='large-')
+        InventoryAlert.objects.bulk_create([
+            InventoryAlert(product=product, alert_type='LOW_STOCK', message='Low stock', threshold=10)
+            for product in large_products
+        ])
+        large_products.update(category=self.category)
+        Order.objects.filter(email__endswith='@large.example').update(user=self.customer)
+        OrderItem.objects.filter(order__email__endswith='@large.example').update(user=self.customer)
+        refresh_classification(full=True)
+
+    def count_queries(self, request):
+        with CaptureQueriesContext(connections['default']) as context:
+            response = request()
+        return len(context.captured_queries), response
+
+    def assertQueryBudget(self, budget, request, status=200):
+        """
+        Assert request() stays within budget queries at both dataset sizes
+
+        request is called once unmeasured at each size first, so one-off work
+        (creating the session, refilling caches the growth invalidated) doesn't
+        count against the budget.
+        Pass status=None when request() doesn't return a response.
+        """
+        request()
+        small, response = self.count_queries(request)
+        if status is not None:
+            self.assertEqual(response.status_code, status)
+        self.grow_dataset()
+        request()
+        large, response = self.count_queries(request)
+        if status is not None:
+            self.assertEqual(response.status_code, status)
+
+        self.assertLessEqual(small, budget, f"{small} queries, budget is {budget}")
+        self.assertEqual(small, large, f"Query count grew from {small} to {large} with the dataset")
@@ -0,0 +1,327 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.db.utils import load_backend
+from django.http import HttpResponse
+from django.conf import settings
+from django.test import (
+    AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings,
+)
+from django.urls import reverse
+
+from game_store.db_pool import ConnectionPool, PoolTimeout, close_pool, pool_stats
+from store.seeding import seed_store
+from .benchmarks import BenchmarkRunner, build_scenarios, compare, load_results, percentile, write_results
+from .instrumentation import QueryRecorder, fingerprint, observe_queries
+from .metrics import DEAD_PROCESSES_FILE, Counter, Histogram, MmapValueStore, Registry, collect_dead_processes
+from .loadtest import VirtualUser, build_scenarios as build_journeys, load_catalog, run_load, settings_profile
+from .middleware import QueryInstrumentationMiddleware
+from .profiling import _profiling, list_profiles
+from .testing import SMALL_DATASET, media_storage
+
+class FakeConnection:
+    def __init__(self, alive=True):
+        self.alive = alive
+        self.closed = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        if not self.alive:
+            raise OSError("server closed the connection")
+
+    def close(self):
+        self.closed = True
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def test_connections_reused(self):
+        pool = ConnectionPool('test', size=2, timeout=1)
+        first = pool.checkout(FakeConnection)
+        pool.checkin(first)
+        self.assertIs(pool.checkout(FakeConnection), first)
+        self.assertEqual(pool.stats(), {'size': 2, 'open': 1, 'idle': 0, 'checkouts': 2, 'opens': 1, 'waits': 0})
+
+    def test_exhausted_pool_waits_for_a_checkin(self):
+        pool = ConnectionPool('test', size=1, timeout=0.05)
+        held = pool.checkout(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.checkout(FakeConnection)
+
+        pool.timeout = 5
+        timer = threading.Timer(0.05, pool.checkin, [held])
+        timer.start()
+        self.assertIs(pool.checkout(FakeConnection), held)
+        timer.join()
+        self.assertEqual(pool.stats()['waits'], 2)
+        self.assertEqual(pool.stats()['opens'], 1)
+
+    def test_dead_idle_connection_replaced(self):
+        pool = ConnectionPool('test', size=1, timeout=1)
+        dead = FakeConnection(alive=False)
+        pool.checkout(lambda: dead)
+        pool.checkin(dead)
+        # Idle long enough to be pinged
+        pool.idle[0] = (dead, pool.idle[0][1] - 60)
+
+        fresh = pool.checkout(FakeConnection)
+        self.assertIsNot(fresh, dead)
+        self.assertTrue(dead.closed)
+        self.assertEqual(pool.stats()['open'], 1)
+
+    def test_pooled_backend(self):
+        directory = tempfile.mkdtemp()
+        settings_dict = dict(
+            connections['default'].settings_dict, ENGINE='game_store.db_pool.sqlite3',
+            NAME=os.path.join(directory, 'pool.db'), CONN_MAX_AGE=0, POOL={'SIZE': 2, 'TIMEOUT': 1},
+        )
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'pool_test')
+        try:
+            for _ in range(3):
+                with wrapper.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                wrapper.close()
+            stats = pool_stats()['pool_test']
+            self.assertEqual((stats['checkouts'], stats['opens'], stats['idle']), (3, 1, 1))
+        finally:
+            close_pool('pool_test')
+            shutil.rmtree(directory)
+
+class AsyncInstrumentationTests(TestCase):
+
+    async def test_queries_from_async_orm_observed(self):
+        # The async ORM runs the query on another thread
+        with observe_queries(QueryRecorder()) as recorder:
+            await User.objects.acount()
+        self.assertEqual(recorder.count, 1)
+
+    async def test_middleware_stays_async(self):
+        async def view(request):
+            await User.objects.acount()
+            return HttpResponse()
+
+        with self.settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1):
+            middleware = QueryInstrumentationMiddleware(view)
+        with self.assertLogs('monitoring.sql'):
+            response = await middleware(AsyncRequestFactory().get('/'))
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+
+class QueryInstrumentationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'shopper{number}') for number in range(3)]
+
+    def test_fingerprint(self):
+        self.assertEqual(
+            fingerprint("SELECT *  FROM t\nWHERE id IN (%s, %s,%s) AND name = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (%s, ...) AND name = ? LIMIT ?",
+        )
+
+    def test_n_plus_one_logged(self):
+        def view(request):
+            # One lookup per user, the N+1 shape
+            for user in User.objects.order_by('id'):
+                User.objects.get(pk=user.pk)
+            return HttpResponse()
+
+        with self.settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1, SQL_REPEATED_QUERY_THRESHOLD=2):
+            middleware = QueryInstrumentationMiddleware(view)
+        with self.assertLogs('monitoring.sql', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/'))
+
+        self.assertIn('desc="4 queries"', response['Server-Timing'])
+        repeated, = logs.records[0].sql_stats['repeated']
+        self.assertEqual(repeated['count'], 3)
+        self.assertIn('WHERE "auth_user"."id" = %s', repeated['fingerprint'])
+
+    def test_distinct_queries_not_flagged(self):
+        def view(request):
+            User.objects.count()
+            list(User.objects.all())
+            return HttpResponse()
+
+        with self.settings(SQL_INSTRUMENTATION_SAMPLE_RATE=1, SQL_REPEATED_QUERY_THRESHOLD=1):
+            middleware = QueryInstrumentationMiddleware(view)
+        with self.assertLogs('monitoring.sql', 'INFO') as logs:
+            middleware(RequestFactory().get('/'))
+        self.assertEqual(logs.records[0].levelname, 'INFO')
+        self.assertEqual(logs.records[0].sql_stats['repeated'], [])
+
+    def test_unsampled_request_untouched(self):
+        with self.settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0):
+            middleware = QueryInstrumentationMiddleware(lambda request: HttpResponse())
+        self.assertNotIn('Server-Timing', middleware(RequestFactory().get('/')))
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        override = override_settings(PROFILER_DIR=self.profile_dir)
+        override.enable()
+        self.addCleanup(override.disable)
+        staff = User.objects.create_user('profiler', password='profiler-password', is_staff=True)
+        self.client.force_login(staff)
+
+    def test_staff_request_profiled(self):
+        response = self.client.get(reverse('profile_list'), headers={'X-Profile': '1'})
+        self.assertEqual(list(list_profiles()), ['profile_list'])
+        self.assertEqual(list_profiles()['profile_list'][0]['name'], response['X-Profile-Id'])
+
+        page = self.client.get(reverse('profile_list'))
+        self.assertContains(page, list_profiles()['profile_list'][0]['captured'].strftime('%Y-%m-%d %H:%M:%S'))
+        report = self.client.get(reverse('profile_detail', args=[response['X-Profile-Id']]))
+        self.assertContains(report, 'function calls')
+
+    def test_customers_not_profiled(self):
+        self.client.force_login(User.objects.create_user('shopper', password='shopper-password'))
+        response = self.client.get(reverse('store'), headers={'X-Profile': '1'})
+        self.assertNotIn('X-Profile-Id', response)
+
+    def test_overlapping_request_served_unprofiled(self):
+        with _profiling:
+            response = self.client.get(reverse('profile_list'), headers={'X-Profile': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile-Id', response)
+        self.assertEqual(list_profiles(), {})
+
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_exposition(self):
+        registry = Registry()
+        requests = Counter(registry, 'requests', 'Requests served', ['status'])
+        latency = Histogram(registry, 'latency_seconds', 'Latency', buckets=(0.1, 1))
+        requests.inc(status=200)
+        requests.inc(2, status=200)
+        latency.observe(0.05)
+        latency.observe(0.5)
+
+        lines = registry.collect().splitlines()
+        self.assertIn('# TYPE requests_total counter', lines)
+        self.assertIn('requests_total{status="200"} 3', lines)
+        self.assertIn('latency_seconds_bucket{le="0.1"} 1', lines)
+        self.assertIn('latency_seconds_bucket{le="1"} 2', lines)
+        self.assertIn('latency_seconds_bucket{le="+Inf"} 2', lines)
+        self.assertIn('latency_seconds_count 2', lines)
+        with self.assertRaises(ValueError):
+            requests.inc(view='store')
+
+    def test_exited_workers_folded_into_one_file(self):
+        # Beyond the largest pid Linux hands out, so never a live process
+        for pid in (4194400, 4194401):
+            store = MmapValueStore(self.directory, f'metrics_{pid}.db')
+            store.add('requests', 2)
+            store.close()
+        live = MmapValueStore(self.directory)
+        live.add('requests', 1)
+        self.addCleanup(live.close)
+
+        self.assertEqual(
+            sorted(os.listdir(self.directory)),
+            sorted([DEAD_PROCESSES_FILE, 'metrics.lock', f'metrics_{os.getpid()}.db']),
+        )
+        self.assertEqual(dict(live.items()), {'requests': 5})
+        self.assertEqual(collect_dead_processes(self.directory), 0)
+
+    def test_endpoint_access(self):
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 403)
+        with self.settings(METRICS_TOKEN='scrape-token'):
+            self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+            self.assertEqual(self.client.get(url, headers={'Authorization': 'Bearer scrape-token'}).status_code, 200)
+        with self.settings(METRICS_ALLOWED_IPS=['10.0.0.5']):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.client.force_login(User.objects.create_user('ops', password='ops-password', is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+class BenchmarkTests(TestCase):
+
+    def test_percentile_is_nearest_rank(self):
+        values = list(range(100, 0, -1))
+        self.assertEqual((percentile(values, 50), percentile(values, 95), percentile(values, 100)), (50, 95, 100))
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_runner_records_queries(self):
+        runner = BenchmarkRunner(rounds=3, warmup=1)
+        result = runner.bench('users', lambda: (User.objects.count(), User.objects.exists()))
+        self.assertEqual((result['rounds'], result['queries']), (3, 2))
+        self.assertLessEqual(result['min_ms'], result['p50_ms'])
+        self.assertLessEqual(result['p50_ms'], result['max_ms'])
+
+    def test_compare_against_a_baseline(self):
+        baseline = {'store': {'p50_ms': 10, 'p95_ms': 20, 'p99_ms': 30, 'peak_memory_kb': 100, 'queries': 5}}
+        current = {
+            'store': {'p50_ms': 11, 'p95_ms': 25, 'p99_ms': 30, 'peak_memory_kb': 100, 'queries': 6},
+            'new_page': {'p50_ms': 1, 'p95_ms': 1, 'p99_ms': 1, 'peak_memory_kb': 1, 'queries': 1},
+        }
+        self.assertEqual(
+            [(item['benchmark'], item['metric']) for item in compare(current, baseline)],
+            [('store', 'p95_ms'), ('store', 'queries')],
+        )
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'nested', 'baseline.json')
+        write_results(path, current, rounds=3)
+        self.assertEqual(load_results(path), current)
+
+    def test_scenarios_run_against_a_seeded_store(self):
+        with media_storage():
+            seed_store(prefix='bench', **SMALL_DATASET)
+            scenarios = build_scenarios(prefix='bench')
+            for name, func in scenarios:
+                with self.subTest(name):
+                    func()
+        self.assertIn('complete_order', dict(scenarios))
+
+@override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0, PROFILER_SAMPLE_RATE=0)
+class LoadTestTests(TransactionTestCase):
+
+    def setUp(self):
+        media = media_storage()
+        media.__enter__()
+        self.addCleanup(media.__exit__, None, None, None)
+        seed_store(prefix='load', **SMALL_DATASET)
+        self.catalog = load_catalog()
+
+    def test_virtual_user_keeps_its_session(self):
+        from django.core.handlers.wsgi import WSGIHandler
+
+        user = VirtualUser(WSGIHandler())
+        journey = build_journeys(self.catalog)['checkout'](user, random.Random(0))
+        statuses = [user.request(method, path, data, headers) for label, method, path, data, headers in journey]
+
+        self.assertEqual(statuses, [200] * 5)
+        self.assertIn('sessionid', user.cookies)
+
+    def test_profile_applied_and_restored(self):
+        database = connections.settings['default']
+        previous = database.get('CONN_MAX_AGE')
+        profile = {'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies', 'DATABASE': {'CONN_MAX_AGE': 60}}
+        with settings_profile(profile):
+            self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.signed_cookies')
+            self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertNotEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.signed_cookies')
+        self.assertEqual(database.get('CONN_MAX_AGE'), previous)
+
+    def test_run_reports_requests(self):
+        # Database sessions would have the threads writing django_session,
+        # which the shared-cache SQLite test database refuses under contention
+        with settings_profile({'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies'}):
+            report = run_load(self.catalog, threads=2, duration=0.5, warmup=0, mix={'browse': 1, 'search': 1})
+
+        self.assertGreater(report['requests'], 0)
+        self.assertEqual((report['error_rate'], report['errors']), (0, []))
+        self.assertEqual(sum(step['count'] for step in report['steps'].values()), report['requests'])
+        self.assertLessEqual(report['p50_ms'], report['max_ms'])
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('metrics/', views.metrics, name='metrics'),
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:name>/', views.profile_detail, name='profile_detail'),
+]
@@ -0,0 +1,48 @@
+import hmac
+
+from django.contrib.admin.views.decorators import staff_member_required
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.shortcuts import render
+
+from .metrics import registry
+from .profiling import list_profiles, render_profile
+
+@staff_member_required
+def profile_list(request):
+    """Captured request profiles, slowest first per view"""
+    context = {
+        'title': 'Request profiles',
+        'profiles_by_view': list_profiles(),
+    }
+    return render(request, 'monitoring/profile_list.html', context)
+
+@staff_member_required
+def profile_detail(request, name):
+    """pstats report for one captured profile"""
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        sort = 'cumulative'
+    report = render_profile(name, sort=sort)
+    if report is None:
+        raise Http404("Profile not found")
+    
+    context = {
+        'title': name,
+        'name': name,
+        'report': report,
+        'sort': sort,
+    }
+    return render(request, 'monitoring/profile_detail.html', context)
+
+def _scraper_allowed(request):
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ())
+
+def metrics(request):
+    """Prometheus text exposition for scrapers with METRICS_TOKEN or on METRICS_ALLOWED_IPS, or staff"""
+    if not _scraper_allowed(request) and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.collect(), content_type='text/plain; version=0.0.4; charset=utf-8')
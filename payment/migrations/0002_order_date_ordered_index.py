@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 03:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payment', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='date_ordered',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -1,3 +1,53 @@
-from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from monitoring.testing import QueryBudgetTestCase
+from store.models import Product
+from .models import Order, OrderItem, ShippingAddress
+
+ORDER_FORM = {
+    'action': 'post', 'name': 'Budget Customer', 'email': 'customer@budget.example',
+    'address1': '1 Budget Street', 'address2': '', 'city': 'Budgetville', 'state': 'BS', 'zipcode': '00000',
+}
+
+class PaymentQueryBudgetTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.customer)
+        self.fill_cart()
+
+    def grow_dataset(self):
+        super().grow_dataset()
+        self.fill_cart()
+
+    def fill_cart(self):
+        """Put every product of the test category in the session cart"""
+        session = self.client.session
+        session['session_key'] = {
+            str(product.id): {'price': str(product.price), 'qty': 1}
+            for product in Product.objects.filter(category=self.category)
+        }
+        session.save()
+
+    def test_checkout(self):
+        ShippingAddress.objects.create(
+            full_name='Budget Customer', email='customer@budget.example', address1='1 Budget Street',
+            address2='', city='Budgetville', user=self.customer,
+        )
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('checkout')))
+
+    def test_checkout_guest(self):
+        self.client.logout()
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('checkout')))
+
+    def test_complete_order(self):
+        self.assertQueryBudget(6, lambda: self.client.post(reverse('complete_order'), ORDER_FORM))
+
+    def test_payment_success(self):
+        order = Order.objects.create(full_name='Budget Customer', email='customer@budget.example',
+                                     shipping_address='1 Budget Street', amount_paid=10, user=self.customer)
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, price=10, user=self.customer)
+        self.assertQueryBudget(18, lambda: self.client.get(reverse('payment_success')))
+
+    def test_payment_fail(self):
+        self.assertQueryBudget(2, lambda: self.client.get(reverse('payment_fail')))
@@ -3,9 +3,11 @@ from . models import ShippingAddress, Order, OrderItem
 from cart.cart import Cart
 from django.http import JsonResponse
 from django.conf import settings
+from game_store.routers import use_primary
 
 # Add this import for inventory management
 from inventory.utils import process_order_stock_adjustment
+from monitoring.metrics import ORDERS_CREATED
 
 
 def checkout(request):
@@ -70,9 +72,11 @@ def complete_order(request):
                 amount_paid=total_cost, user=request.user)
             order_id = order.pk
 
-            for item in cart:
-                OrderItem.objects.create(order_id=order_id, product=item['product'], quantity=item['qty'],
+            OrderItem.objects.bulk_create([
+                OrderItem(order_id=order_id, product_id=item['product'].id, quantity=item['qty'],
                     price=item['price'], user=request.user)
+                for item in cart
+            ])
 
         #  2) Create order -> Guest users without an account
 
@@ -81,9 +85,13 @@ def complete_order(request):
                 amount_paid=total_cost)
             order_id = order.pk
 
-            for item in cart:
-                OrderItem.objects.create(order_id=order_id, product=item['product'], quantity=item['qty'],
+            OrderItem.objects.bulk_create([
+                OrderItem(order_id=order_id, product_id=item['product'].id, quantity=item['qty'],
                 price=item['price'])
+                for item in cart
+            ])
+
+        ORDERS_CREATED.inc(customer='account' if request.user.is_authenticated else 'guest')
 
         order_success = True
         response = JsonResponse({'success':order_success})
@@ -94,8 +102,10 @@ def complete_order(request):
 def payment_success(request):
     if request.user.is_authenticated:
         try:
-            # Get the most recent order for authenticated users
-            recent_order = Order.objects.filter(user=request.user).latest('date_ordered')
+            # Get the most recent order for authenticated users, from the
+            # primary since it was placed moments ago
+            with use_primary():
+                recent_order = Order.objects.filter(user=request.user).latest('date_ordered')
             # Process inventory adjustments for this order
             process_order_stock_adjustment(recent_order)
         except Order.DoesNotExist:
@@ -21,7 +21,7 @@ class ProductImageInline(admin.TabularInline):
         if obj.image:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 100px;" />',
-                obj.image.url
+                obj.get_rendition_url('thumb')
             )
         return "No image"
     image_preview.short_description = "Preview"
@@ -40,11 +40,11 @@ class ProductAdmin(admin.ModelAdmin):
     image_count.short_description = "Images"
     
     def main_image_preview(self, obj):
-        main_image = obj.get_main_image()
+        main_image = obj.get_main_product_image()
         if main_image:
             return format_html(
                 '<img src="{}" style="max-height: 50px; max-width: 50px;" />',
-                main_image.url
+                main_image.get_rendition_url('thumb')
             )
         return "No image"
     main_image_preview.short_description = "Main Image"
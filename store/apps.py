@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class StoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'store'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        from .invalidation import connect_model_signals
+
+        # Bump the cache namespaces of Product / ProductImage / Category on changes
+        connect_model_signals(self.get_models())
@@ -0,0 +1,226 @@
+import datetime
+import hashlib
+import re
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from game_store.routers import use_primary
+from monitoring.metrics import record_cache_lookup
+from .invalidation import (
+    AVAILABILITY, CATALOG, anamespace_modified, anamespace_version, bump_namespaces, namespace_modified,
+    namespace_version,
+)
+
+CART_QTY_PLACEHOLDER = '<!--cart-qty-placeholder-->'
+_CART_QTY = re.compile(r'<!--cart-qty-->.*?<!--/cart-qty-->', re.DOTALL)
+
+def get_catalog_version():
+    """Opaque token that changes whenever the catalog does"""
+    return namespace_version(CATALOG)
+
+def get_catalog_modified():
+    """When the catalog last changed, or first got a version if that was later"""
+    return namespace_modified(CATALOG)
+
+async def aget_catalog_version():
+    return await anamespace_version(CATALOG)
+
+async def aget_catalog_modified():
+    return await anamespace_modified(CATALOG)
+
+def bump_catalog_version():
+    """For catalog writes the models can't see, e.g. rebuilt facet counts or bulk-loaded stock"""
+    bump_namespaces(CATALOG, AVAILABILITY)
+
+def session_cart_quantity(request):
+    """Cart badge count straight from the session, without creating one"""
+    cart = request.session.get('session_key') or {}
+    return sum(item['qty'] for item in cart.values())
+
+def _cacheable_request(request):
+    if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+        return False
+    # Pending flash messages are rendered into the page, so it must not be shared
+    return 'messages' not in request.COOKIES and '_messages' not in request.session
+
+def _page_key(request, version):
+    url = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return f'store:page:{version}:{url}'
+
+def _render_cached(request, content, content_type):
+    quantity = session_cart_quantity(request)
+    return HttpResponse(content.replace(CART_QTY_PLACEHOLDER, str(quantity)), content_type=content_type)
+
+def cache_anonymous_page(view=None, *, namespaces=(CATALOG,)):
+    """
+    Serve anonymous GETs of a catalog page from the cache
+
+    The rendered body is stored per URL and catalog version with the cart
+    badge swapped for a placeholder, which is filled in from the visitor's
+    session on every hit. The CSRF cookie is always set, since the page's
+    scripts read the token from it rather than from the (shared) markup.
+    Product, ProductImage and Category changes bump the catalog version,
+    which orphans every entry at once; pages showing what is in stock also
+    pass namespaces=(CATALOG, AVAILABILITY).
+    """
+    if view is None:
+        return partial(cache_anonymous_page, namespaces=namespaces)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        get_token(request)
+        timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+        if not timeout or not _cacheable_request(request):
+            return view(request, *args, **kwargs)
+
+        key = _page_key(request, ':'.join(namespace_version(namespace) for namespace in namespaces))
+        cached = cache.get(key)
+        record_cache_lookup('page', cached is not None)
+        if cached is not None:
+            response = _render_cached(request, *cached)
+            response['X-Page-Cache'] = 'hit'
+            return response
+
+        # Rendered from the primary, since it is kept until the version moves
+        with use_primary():
+            response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming and not response.cookies:
+            content = _CART_QTY.sub(CART_QTY_PLACEHOLDER, response.content.decode(response.charset))
+            cache.set(key, (content, response['Content-Type']), timeout)
+        response['X-Page-Cache'] = 'miss'
+        return response
+
+    return wrapper
+
+def _viewer_state(request):
+    """
+    The per-visitor parts of a catalog page, for folding into its validators
+
+    Returns:
+        String of user id and cart badge count, or None while flash messages
+        are pending since those show once and must never be answered with a 304
+    """
+    if 'messages' in request.COOKIES or '_messages' in request.session:
+        return None
+    return f'{request.user.pk or 0}:{session_cart_quantity(request)}'
+
+def _weak_etag(*parts):
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+    # Weak: authenticated pages carry a freshly masked CSRF token each render
+    return f'W/"{digest}"'
+
+def get_requested_product(request, product_slug):
+    """
+    The product a detail page is for, fetched once per request
+
+    The validators need its updated timestamp before the view runs; the view
+    reuses the same object, looked up in the catalog snapshot.
+
+    Returns:
+        CatalogProduct, or None if the slug doesn't match one
+    """
+    from .snapshot import get_catalog_snapshot
+
+    if not hasattr(request, '_requested_product'):
+        request._requested_product = get_catalog_snapshot().get_product_by_slug(product_slug)
+    return request._requested_product
+
+def catalog_page_etag(request, *args, **kwargs):
+    """ETag for listing pages: the catalog version plus who is looking"""
+    state = _viewer_state(request)
+    if state is None:
+        return None
+    return _weak_etag(get_catalog_version(), request.get_full_path(), state)
+
+def category_page_etag(request, *args, **kwargs):
+    """catalog_page_etag, for a page whose in-stock filter also depends on availability"""
+    state = _viewer_state(request)
+    if state is None:
+        return None
+    return _weak_etag(get_catalog_version(), namespace_version(AVAILABILITY), request.get_full_path(), state)
+
+def catalog_page_last_modified(request, *args, **kwargs):
+    """
+    Last-Modified for listing pages, offered only to visitors whose view of the
+    page is the shared one (anonymous, empty cart), because If-Modified-Since
+    alone can't tell a changed cart badge apart
+    """
+    if _viewer_state(request) != '0:0':
+        return None
+    return get_catalog_modified()
+
+def category_page_last_modified(request, *args, **kwargs):
+    """catalog_page_last_modified, or the last time a product sold out or came back if later"""
+    if _viewer_state(request) != '0:0':
+        return None
+    return max(get_catalog_modified(), namespace_modified(AVAILABILITY))
+
+def product_page_etag(request, product_slug):
+    """ETag for a product page: its own updated timestamp, the catalog version and the visitor"""
+    product = get_requested_product(request, product_slug)
+    state = _viewer_state(request)
+    if product is None or state is None:
+        return None
+    return _weak_etag(get_catalog_version(), product.pk, product.updated.isoformat(), state)
+
+def product_page_last_modified(request, product_slug):
+    """Product.updated, or the last catalog change if later (category renames, new images)"""
+    product = get_requested_product(request, product_slug)
+    if product is None or _viewer_state(request) != '0:0':
+        return None
+    return max(product.updated, get_catalog_modified())
+
+def acondition(etag_func=None, last_modified_func=None):
+    """
+    django.views.decorators.http.condition for async views, with awaited validators
+
+    condition() calls its validators synchronously even around an async
+    view, which would put their cache reads on the event loop.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            last_modified = None
+            if last_modified_func:
+                if modified := await last_modified_func(request, *args, **kwargs):
+                    if not timezone.is_aware(modified):
+                        modified = timezone.make_aware(modified, datetime.timezone.utc)
+                    last_modified = int(modified.timestamp())
+            etag = await etag_func(request, *args, **kwargs) if etag_func else None
+            etag = quote_etag(etag) if etag is not None else None
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if last_modified and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(last_modified)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+def _live_search_etag(request, version):
+    return _weak_etag(version, request.GET.get('q', '').strip(), request.headers.get('x-requested-with', ''))
+
+def live_search_etag(request):
+    """Search results depend only on the query and the catalog"""
+    return _live_search_etag(request, get_catalog_version())
+
+def live_search_last_modified(request):
+    return get_catalog_modified()
+
+async def alive_search_etag(request):
+    return _live_search_etag(request, await aget_catalog_version())
+
+async def alive_search_last_modified(request):
+    return await aget_catalog_modified()
@@ -0,0 +1,351 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .cache import bump_catalog_version
+from .facets import rebuild_facet_counts
+from .invalidation import deferred_invalidation
+from .models import Category, Product, ProductImage
+from .renditions import process_pool, store_image, try_generate_renditions
+from .seeding import LedgerWriter
+
+# Columns an upsert overwrites on products that already exist. Stock is not
+# among them: it only moves through the ledger, so the file's stock is the
+# starting stock of new products.
+UPDATE_FIELDS = ['category', 'title', 'brand', 'description', 'price', 'available', 'updated']
+
+class MalformedRow:
+    """Stands in for a line read_rows couldn't decode, so parse_row reports it as a row error"""
+    __slots__ = ('error',)
+
+    def __init__(self, error):
+        self.error = error
+
+def read_rows(path, format=None):
+    """
+    Stream catalog rows from a CSV or JSON Lines file
+
+    CSV has a header row and keeps a product's images in one column separated
+    by '|'; in JSONL "images" is a list. One row is held in memory at a time.
+    A JSONL line that isn't valid JSON is yielded as a MalformedRow, so it
+    fails on its own like any other bad row rather than ending the import
+    after earlier batches have committed.
+
+    Yields:
+        (line number, dictionary or MalformedRow) pairs
+    """
+    format = format or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+    with open(path, newline='', encoding='utf-8') as handle:
+        if format == 'csv':
+            reader = csv.DictReader(handle)
+            for row in reader:
+                row['images'] = [image for image in (row.get('images') or '').split('|') if image]
+                yield reader.line_num, row
+        else:
+            for number, line in enumerate(handle, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    row = MalformedRow(f"invalid JSON: {e.msg}")
+                yield number, row
+
+def parse_row(row):
+    """
+    Validate one catalog row and normalise its values
+
+    Returns:
+        Dictionary with category_name, category_slug, slug, title, brand,
+        description, price, stock, available and images
+
+    Raises:
+        ValueError: If the row is malformed, or a required value is missing or malformed
+    """
+    if isinstance(row, MalformedRow):
+        raise ValueError(row.error)
+    if not isinstance(row, dict):
+        raise ValueError("row is not a JSON object")
+    title = (row.get('title') or '').strip()
+    category_name = (row.get('category') or '').strip()
+    if not title:
+        raise ValueError("title is required")
+    if not category_name:
+        raise ValueError("category is required")
+    try:
+        price = Decimal(str(row.get('price', '')).strip()).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(f"invalid price {row.get('price')!r}")
+    if not 0 <= price < 100000:
+        raise ValueError(f"price {price} out of range")
+    try:
+        stock = int(row.get('stock') or 0)
+    except (TypeError, ValueError):
+        raise ValueError(f"invalid stock {row.get('stock')!r}")
+    if stock < 0:
+        raise ValueError("stock can't be negative")
+    available = row.get('available', True)
+    if isinstance(available, str):
+        available = available.strip().lower() not in ('0', 'false', 'no', 'n', '')
+
+    slug = (row.get('slug') or '').strip() or slugify(title)
+    category_slug = (row.get('category_slug') or '').strip() or slugify(category_name)
+    if not slug or not category_slug:
+        raise ValueError("title and category must produce non-empty slugs")
+    # Checked here because one overlong value would fail the whole batch's upsert
+    for field, value, limit in (('title', title, 200), ('slug', slug, 250), ('category', category_name, 100)):
+        if len(value) > limit:
+            raise ValueError(f"{field} is longer than {limit} characters")
+
+    return {
+        'category_name': category_name,
+        'category_slug': category_slug,
+        'slug': slug,
+        'title': title,
+        'brand': (row.get('brand') or '').strip() or 'un-branded',
+        'description': row.get('description') or '',
+        'price': price,
+        'stock': stock,
+        'available': bool(available),
+        'images': list(row.get('images') or []),
+    }
+
+class CatalogImport:
+    """
+    Batched upsert of a product catalog, with images processed in a pool
+
+    Each batch upserts its categories and products with one bulk_create
+    (update_conflicts on slug) apiece, writes INITIAL ledger rows for new
+    products' starting stock through the raw LedgerWriter, then attaches
+    images. Image files are submitted to the pool before the batch's database
+    work starts so hashing and rendering overlap it; each distinct file is
+    processed once per import however many products share it. A worker that
+    dies (e.g. killed for memory on a huge image) breaks the pool; its work
+    is retried once in a fresh pool and recorded as an image error if that
+    dies too, so the rest of the import carries on.
+    """
+
+    def __init__(self, batch_size=2000, workers=4, image_root='', log=None):
+        self.batch_size = batch_size
+        self.image_root = image_root
+        self.log = log or (lambda message: None)
+        self.workers = workers
+        self.pool = process_pool(workers) if workers > 1 else None
+        self.category_ids = {}
+        self.images = {}
+        self.image_results = {}
+        self.renditions = {}
+        self.renders = {}
+        self.report = {
+            'rows': 0, 'errors': [], 'categories': 0, 'products_created': 0, 'products_updated': 0,
+            'ledger_rows': 0, 'images': 0, 'image_files': 0, 'image_errors': [], 'elapsed': 0,
+        }
+
+    def run(self, rows):
+        """
+        Import (line number, row) pairs, e.g. from read_rows
+
+        Every batch's writes bump the catalog version; they are held back and
+        sent once when the import ends, so workers reload their snapshots once
+        rather than per batch.
+
+        Returns:
+            Report dictionary with counts, row errors and rows per second
+        """
+        started = time.perf_counter()
+        with deferred_invalidation():
+            try:
+                batch = []
+                for number, row in rows:
+                    self.report['rows'] += 1
+                    try:
+                        batch.append(parse_row(row))
+                    except ValueError as e:
+                        self.report['errors'].append((number, str(e)))
+                        continue
+                    if len(batch) >= self.batch_size:
+                        self.import_batch(batch)
+                        batch = []
+                if batch:
+                    self.import_batch(batch)
+
+                self.finish_renditions()
+            finally:
+                if self.pool is not None:
+                    self.pool.shutdown()
+                # bulk_create sends no signals; committed batches must still
+                # reach the facet counts, which cached pages are built from too
+                rebuild_facet_counts()
+                bump_catalog_version()
+
+        elapsed = time.perf_counter() - started
+        self.report['elapsed'] = elapsed
+        self.report['rows_per_second'] = self.report['rows'] / elapsed if elapsed else 0
+        return self.report
+
+    def submit(self, function, argument):
+        if self.pool is None:
+            future = Future()
+            future.set_result(function(argument))
+            return future
+        try:
+            return self.pool.submit(function, argument)
+        except BrokenProcessPool:
+            self.pool.shutdown(wait=False)
+            self.pool = process_pool(self.workers)
+            return self.pool.submit(function, argument)
+
+    def result(self, future, function, argument):
+        """
+        A pool future's result, retried once in a fresh pool if a worker died
+
+        Waiting on the retry before moving on means only the work that killed
+        the worker fails twice.
+
+        Returns:
+            The function's result, or None if the retry's worker died too
+        """
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            pass
+        try:
+            return self.submit(function, argument).result()
+        except BrokenProcessPool:
+            return None
+
+    def submit_images(self, batch):
+        for row in batch:
+            for path in row['images']:
+                path = os.path.join(self.image_root, path)
+                if path not in self.images and path not in self.image_results:
+                    self.images[path] = self.submit(store_image, path)
+
+    def image_result(self, path):
+        """
+        Stored name, digest and known renditions for an image path
+
+        The first time a blob is seen its renditions are looked up (if it was
+        already stored) or queued for rendering; rows are attached without
+        them and filled in by finish_renditions.
+        """
+        if path not in self.image_results:
+            name, digest, created, error = (
+                self.result(self.images.pop(path), store_image, path)
+                or (None, None, False, "worker process died")
+            )
+            renditions = None
+            if error:
+                self.report['image_errors'].append((path, error))
+            elif name not in self.renditions:
+                if not created:
+                    renditions = next((
+                        known for known in ProductImage.objects.filter(image=name).values_list('renditions', flat=True)
+                        if known.get('source') == name
+                    ), None)
+                if renditions is None:
+                    self.renders[name] = self.submit(try_generate_renditions, name)
+                self.renditions[name] = renditions
+            self.image_results[path] = (name, digest, error)
+        name, digest, error = self.image_results[path]
+        return name, digest, self.renditions.get(name), error
+
+    def finish_renditions(self):
+        """Record renditions rendered while the batches were imported"""
+        for name, future in self.renders.items():
+            name, renditions, error = (
+                self.result(future, try_generate_renditions, name)
+                or (name, None, "worker process died")
+            )
+            if error:
+                self.report['image_errors'].append((name, error))
+                continue
+            with transaction.atomic():
+                ProductImage.objects.filter(image=name).update(renditions=renditions)
+            self.report['image_files'] += 1
+
+    def import_batch(self, batch):
+        # Later rows win when a file repeats a slug, as they would row by row
+        batch = list({row['slug']: row for row in batch}.values())
+        self.submit_images(batch)
+
+        with transaction.atomic():
+            self.upsert_categories(batch)
+            product_ids, created = self.upsert_products(batch)
+            now = timezone.now()
+            with LedgerWriter(self.batch_size) as ledger:
+                for row in batch:
+                    if row['slug'] in created and row['stock']:
+                        ledger.add(product_ids[row['slug']], 'IN', 'INITIAL', row['stock'], 0, row['stock'], now,
+                                   notes='Catalog import')
+            self.report['ledger_rows'] += ledger.count
+
+        with transaction.atomic():
+            self.attach_images(batch, product_ids)
+        self.log(f"{self.report['rows']} rows, {len(self.category_ids)} categories, "
+                 f"{self.report['products_created']} new products")
+
+    def upsert_categories(self, batch):
+        new = {row['category_slug']: row['category_name'] for row in batch if row['category_slug'] not in self.category_ids}
+        if not new:
+            return
+        Category.objects.bulk_create(
+            [Category(slug=slug, name=name) for slug, name in new.items()],
+            update_conflicts=True, unique_fields=['slug'], update_fields=['name'],
+        )
+        # Not every backend returns ids from an upsert, so read them back
+        self.category_ids.update(Category.objects.filter(slug__in=new).values_list('slug', 'id'))
+        self.report['categories'] += len(new)
+
+    def upsert_products(self, batch):
+        slugs = [row['slug'] for row in batch]
+        existing = set(Product.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        Product.objects.bulk_create([
+            Product(
+                category_id=self.category_ids[row['category_slug']], title=row['title'], brand=row['brand'],
+                description=row['description'], slug=row['slug'], price=row['price'],
+                stock=row['stock'], available=row['available'],
+            )
+            for row in batch
+        ], update_conflicts=True, unique_fields=['slug'], update_fields=UPDATE_FIELDS)
+        product_ids = dict(Product.objects.filter(slug__in=slugs).values_list('slug', 'id'))
+        created = set(slugs) - existing
+        self.report['products_created'] += len(created)
+        self.report['products_updated'] += len(existing)
+        return product_ids, created
+
+    def attach_images(self, batch, product_ids):
+        with_images = [row for row in batch if row['images']]
+        if not with_images:
+            return
+        attached = {}
+        for product_id, image in ProductImage.objects.filter(
+            product_id__in=[product_ids[row['slug']] for row in with_images],
+        ).values_list('product_id', 'image'):
+            attached.setdefault(product_id, set()).add(image)
+
+        images = []
+        for row in with_images:
+            product_id = product_ids[row['slug']]
+            current = attached.get(product_id, set())
+            has_main = bool(current)
+            for order, path in enumerate(row['images']):
+                name, digest, renditions, error = self.image_result(os.path.join(self.image_root, path))
+                if error or name in current:
+                    continue
+                current.add(name)
+                images.append(ProductImage(
+                    product_id=product_id, image=name, content_hash=digest, renditions=renditions or {},
+                    alt_text=row['title'], is_main=not has_main, order=order,
+                ))
+                has_main = True
+        ProductImage.objects.bulk_create(images, batch_size=self.batch_size)
+        self.report['images'] += len(images)
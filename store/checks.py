@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = ('django.core.cache.backends.locmem.LocMemCache',)
+
+@register(Tags.caches, deploy=False)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Refuse a per-process cache when several worker processes share the database
+
+    Each would keep its own namespace versions, so a write would only
+    invalidate what the writing process had cached and the others would go
+    on serving stale pages, prices and stock settings.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    workers = getattr(settings, 'WEB_CONCURRENCY', 1)
+    if workers > 1 and backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"{workers} worker processes can't share the cache {backend}",
+            hint="Set CACHE_BACKEND and CACHE_LOCATION to a shared cache such as Redis.",
+            id='store.E001',
+        )]
+    return []
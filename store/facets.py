@@ -0,0 +1,171 @@
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+
+# (key, label, lower bound inclusive, upper bound exclusive or None)
+PRICE_BANDS = [
+    ('under-10', 'Under $10', Decimal('0'), Decimal('10')),
+    ('10-25', '$10 to $25', Decimal('10'), Decimal('25')),
+    ('25-50', '$25 to $50', Decimal('25'), Decimal('50')),
+    ('50-plus', '$50 and up', Decimal('50'), None),
+]
+IN_STOCK = 'in-stock'
+OUT_OF_STOCK = 'out-of-stock'
+FACET_FIELDS = ('category_id', 'brand', 'price', 'stock', 'available')
+_BANDS = {key: (low, high) for key, label, low, high in PRICE_BANDS}
+
+def price_band(price):
+    for key, label, low, high in PRICE_BANDS:
+        if price >= low and (high is None or price < high):
+            return key
+    return PRICE_BANDS[0][0]
+
+def facet_snapshot(product):
+    """
+    The values a product's facet counts depend on, read without triggering loads
+
+    Returns:
+        Tuple of FACET_FIELDS values, or None for unsaved products and ones
+        loaded with some of these fields deferred
+    """
+    if product.pk is None or any(field not in product.__dict__ for field in FACET_FIELDS):
+        return None
+    return tuple(product.__dict__[field] for field in FACET_FIELDS)
+
+def record_locked_facet_values(product):
+    """
+    Note a product's facet values as read under its row lock
+
+    Its next save then takes them as the stored values instead of reading
+    the row again; for adjust_stock, which saves right after locking.
+    """
+    product._locked_facet_values = facet_snapshot(product)
+
+def facet_entries(snapshot):
+    """The (category_id, facet, value) counts a product contributes one to"""
+    if snapshot is None:
+        return set()
+    category_id, brand, price, stock, available = snapshot
+    if category_id is None:
+        return set()
+    return {
+        (category_id, 'brand', brand),
+        (category_id, 'price', price_band(Decimal(price))),
+        (category_id, 'stock', IN_STOCK if available and stock > 0 else OUT_OF_STOCK),
+    }
+
+def apply_facet_change(before, after):
+    """
+    Move a product's contribution to the facet counts from one snapshot to another
+
+    Only the counts that actually change are touched, with F() increments so
+    concurrent stock adjustments don't lose updates. Runs inside the caller's
+    transaction, so counts commit or roll back with the product row. A
+    product selling out or coming back bumps the AVAILABILITY namespace.
+    """
+    from .invalidation import AVAILABILITY, bump_namespaces
+    from .models import FacetCount
+
+    old, new = facet_entries(before), facet_entries(after)
+    if any(facet == 'stock' for category_id, facet, value in old ^ new):
+        bump_namespaces(AVAILABILITY)
+    for entries, delta in ((old - new, -1), (new - old, 1)):
+        for category_id, facet, value in entries:
+            lookup = {'category_id': category_id, 'facet': facet, 'value': value}
+            if FacetCount.objects.filter(**lookup).update(count=F('count') + delta) or delta < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    FacetCount.objects.create(count=1, **lookup)
+            except IntegrityError:
+                # Created concurrently between the update and the insert
+                FacetCount.objects.filter(**lookup).update(count=F('count') + 1)
+
+def rebuild_facet_counts():
+    """
+    Recount every facet from the product table
+
+    For the bulk paths (seeding, catalog import) that create products without
+    save signals, and to repair drift. Three grouped queries and one insert.
+
+    Returns:
+        Number of FacetCount rows written
+    """
+    from .models import FacetCount, Product
+
+    products = Product.objects.filter(category__isnull=False)
+    band = Case(
+        *[
+            When(Q(price__gte=low) & (Q(price__lt=high) if high is not None else Q()), then=Value(key))
+            for key, label, low, high in PRICE_BANDS
+        ],
+        default=Value(PRICE_BANDS[0][0]), output_field=CharField(),
+    )
+    stock = Case(
+        When(available=True, stock__gt=0, then=Value(IN_STOCK)),
+        default=Value(OUT_OF_STOCK), output_field=CharField(),
+    )
+    rows = []
+    for facet, expression in (('brand', F('brand')), ('price', band), ('stock', stock)):
+        grouped = products.annotate(value=expression).values('category_id', 'value').annotate(count=Count('id'))
+        rows.extend(
+            FacetCount(category_id=row['category_id'], facet=facet, value=row['value'], count=row['count'])
+            for row in grouped.order_by()
+        )
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        FacetCount.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+def get_facets(category):
+    """
+    Facet counts for a category page, in display order, empty values left out
+
+    Counts are for the whole category rather than narrowed by the active
+    filters: that is what makes them a single indexed lookup.
+
+    Returns:
+        Dictionary with 'brands' [(brand, count)], 'prices' [(key, label, count)]
+        and 'in_stock' count
+    """
+    from .models import FacetCount
+
+    counts = {}
+    for facet, value, count in FacetCount.objects.filter(category_id=category.pk, count__gt=0).values_list(
+        'facet', 'value', 'count',
+    ):
+        counts.setdefault(facet, {})[value] = count
+    brands = counts.get('brand', {})
+    prices = counts.get('price', {})
+    return {
+        'brands': sorted(brands.items(), key=lambda item: item[0].lower()),
+        'prices': [(key, label, prices[key]) for key, label, low, high in PRICE_BANDS if key in prices],
+        'in_stock': counts.get('stock', {}).get(IN_STOCK, 0),
+    }
+
+def parse_filters(params):
+    """
+    The category page filters selected in a GET QueryDict
+
+    Returns:
+        Dictionary with 'brands' list, 'price' band key or '' and 'in_stock' flag
+    """
+    return {
+        'brands': [brand for brand in params.getlist('brand') if brand],
+        'price': params.get('price') if params.get('price') in _BANDS else '',
+        'in_stock': params.get('in_stock') == '1',
+    }
+
+def matches_filters(product, selected, in_stock_ids=frozenset()):
+    """
+    Whether an in-memory product from the catalog snapshot passes the selected filters
+
+    The snapshot holds no stock levels, so the in-stock filter checks
+    in_stock_ids (see store.snapshot.get_in_stock_ids) instead.
+    """
+    if selected['in_stock'] and product.id not in in_stock_ids:
+        return False
+    if selected['price'] and price_band(product.price) != selected['price']:
+        return False
+    return not selected['brands'] or product.brand in selected['brands']
@@ -0,0 +1,194 @@
+import hashlib
+import os
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import models
+from django.db.models import Q
+from django.db.models.fields.files import ImageFieldFile
+from django.utils import timezone
+
+# Directories in default_storage that hold product image blobs and their renditions
+IMAGE_DIRECTORIES = ('images', 'renditions')
+
+def content_hash(file):
+    """SHA-256 hex digest of a file's content, read in chunks"""
+    hasher = hashlib.sha256()
+    for chunk in file.chunks():
+        hasher.update(chunk)
+    return hasher.hexdigest()
+
+def blob_name(digest, filename):
+    """images/ab/abcdef....png: sharded by the first two hex digits, keeping the extension"""
+    return f'images/{digest[:2]}/{digest}{os.path.splitext(filename)[1].lower()}'
+
+def rendition_files(renditions):
+    """The variant file names recorded in a ProductImage.renditions dictionary"""
+    return {
+        value
+        for size, variant in (renditions or {}).items() if size != 'source'
+        for key, value in variant.items() if key not in ('width', 'height')
+    }
+
+def touch(storage, name):
+    """
+    Restart a stored file's age, so the orphan sweep leaves a reused file alone
+
+    Storage backends have no API for this: local files get a new mtime and
+    S3 objects are copied onto themselves for a new LastModified.
+
+    Returns:
+        False if the file doesn't exist (any more)
+    """
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        path = None
+    if path is not None:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+        return True
+    if not storage.exists(name):
+        return False
+    bucket = getattr(storage, 'bucket', None)
+    if bucket is not None:
+        from storages.utils import clean_name
+
+        stored = bucket.Object(storage._normalize_name(clean_name(name)))
+        stored.copy_from(
+            CopySource={'Bucket': stored.bucket_name, 'Key': stored.key}, Metadata=stored.metadata,
+            ContentType=stored.content_type, MetadataDirective='REPLACE',
+        )
+    return True
+
+class ContentHashFieldFile(ImageFieldFile):
+    """
+    Stores each distinct file once, under images/ab/abcdef....png
+
+    Both a form upload (written by FileField.pre_save) and an explicit
+    field.save() come through here. If a blob with the same content already
+    exists nothing is written: the field just points at it, and the
+    renditions already generated for that blob are reused. Reused files are
+    touched first, as the orphan sweep may be about to delete them.
+    """
+
+    def save(self, name, content, save=True):
+        from .models import ProductImage
+
+        digest = content_hash(content)
+        stored = blob_name(digest, name)
+        if touch(self.storage, stored):
+            for renditions in ProductImage.objects.filter(image=stored).values_list('renditions', flat=True):
+                if renditions.get('source') == stored:
+                    if all([touch(self.storage, variant) for variant in rendition_files(renditions)]):
+                        self.instance.renditions = renditions
+                    break
+        else:
+            stored = self.storage.save(stored, content, max_length=self.field.max_length)
+        self.instance.content_hash = digest
+        self.name = stored
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+class ContentHashImageField(models.ImageField):
+    """ImageField whose files are named by content hash; see ContentHashFieldFile"""
+    attr_class = ContentHashFieldFile
+
+def walk_storage(directory):
+    """Yield every file name under a storage directory, recursing into subdirectories"""
+    if not default_storage.exists(directory):
+        return
+    subdirectories, files = default_storage.listdir(directory)
+    for name in files:
+        yield f'{directory}/{name}'
+    for subdirectory in subdirectories:
+        yield from walk_storage(f'{directory}/{subdirectory}')
+
+def referenced_names():
+    """Every blob and rendition file some ProductImage still points at"""
+    from .models import ProductImage
+
+    names = set()
+    for image, renditions in ProductImage.objects.values_list('image', 'renditions').iterator():
+        names.add(image)
+        names.update(rendition_files(renditions))
+    return names
+
+def is_referenced(name):
+    """Whether some ProductImage points at a stored file right now, as its image or a rendition"""
+    from .models import ProductImage
+
+    if name.startswith('renditions/'):
+        # renditions/<source stem>-<size>.<ext>, see store.renditions.rendition_name
+        stem = name.removeprefix('renditions/').rsplit('-', 1)[0]
+        rows = ProductImage.objects.filter(
+            Q(image__startswith=f'{stem}.') | Q(renditions__source__startswith=f'{stem}.'),
+        )
+    else:
+        rows = ProductImage.objects.filter(image=name)
+    return any(
+        name == image or name in rendition_files(renditions)
+        for image, renditions in rows.values_list('image', 'renditions')
+    )
+
+def still_orphaned(name, min_age=timedelta(hours=24)):
+    """
+    Check a file from find_orphans again just before deleting it
+
+    The sweep can take a while, and meanwhile an upload may have reused the
+    blob: it touches the file before pointing a row at it.
+    """
+    try:
+        modified = default_storage.get_modified_time(name)
+    except FileNotFoundError:
+        return False
+    return modified < timezone.now() - min_age and not is_referenced(name)
+
+def find_orphans(min_age=timedelta(hours=24)):
+    """
+    Stored image files no ProductImage references any more
+
+    Files younger than min_age are skipped: an upload is written before its
+    row is saved, and renditions before they are recorded.
+
+    Returns:
+        Sorted list of storage names
+    """
+    referenced = referenced_names()
+    cutoff = timezone.now() - min_age
+    orphans = []
+    for directory in IMAGE_DIRECTORIES:
+        for name in walk_storage(directory):
+            if name not in referenced and default_storage.get_modified_time(name) < cutoff:
+                orphans.append(name)
+    return sorted(orphans)
+
+def rehash_legacy_images():
+    """
+    Move images uploaded before content addressing onto content-hash names
+
+    Rows sharing a file are moved together and duplicate content collapses
+    onto one blob. The old files are left for the orphan sweep, and the
+    moved rows' renditions go stale until generate_renditions runs.
+
+    Returns:
+        Number of ProductImage rows moved
+    """
+    from .models import ProductImage
+
+    moved = 0
+    legacy = ProductImage.objects.filter(content_hash='').exclude(image='')
+    for old_name in sorted(set(legacy.values_list('image', flat=True))):
+        with default_storage.open(old_name, 'rb') as handle:
+            digest = content_hash(handle)
+            new_name = blob_name(digest, old_name)
+            if not default_storage.exists(new_name):
+                new_name = default_storage.save(new_name, handle)
+        moved += ProductImage.objects.filter(image=old_name).update(image=new_name, content_hash=digest)
+    return moved
@@ -0,0 +1,180 @@
+import threading
+import uuid
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import models, transaction
+from django.utils import timezone
+
+from game_store.routers import use_primary
+
+# Namespaces models declare in cache_namespaces; a cached value lives under
+# the version of the namespace(s) it was computed from
+CATALOG = 'catalog'
+INVENTORY = 'inventory'
+STOCK_SETTINGS = 'stock_settings'
+# Which products are in stock: moves when one sells out or comes back, not
+# on every sale (see store.facets)
+AVAILABILITY = 'availability'
+
+NAMESPACE_KEY = 'namespace:{}'
+
+_deferred = threading.local()
+
+def _state(namespace):
+    """(token, modified) pair, created on first use so it is never missing"""
+    key = NAMESPACE_KEY.format(namespace)
+    state = cache.get(key)
+    if state is None:
+        cache.add(key, (uuid.uuid4().hex, timezone.now()), None)
+        state = cache.get(key)
+    return state
+
+def namespace_version(namespace):
+    """Opaque token that changes whenever a model in the namespace is written"""
+    return _state(namespace)[0]
+
+def namespace_modified(namespace):
+    """When the namespace last changed, or first got a version if that was later"""
+    return _state(namespace)[1]
+
+async def _astate(namespace):
+    """_state through the cache's async API, for async views"""
+    key = NAMESPACE_KEY.format(namespace)
+    state = await cache.aget(key)
+    if state is None:
+        await cache.aadd(key, (uuid.uuid4().hex, timezone.now()), None)
+        state = await cache.aget(key)
+    return state
+
+async def anamespace_version(namespace):
+    return (await _astate(namespace))[0]
+
+async def anamespace_modified(namespace):
+    return (await _astate(namespace))[1]
+
+def _bump(namespaces):
+    # A fresh random token rather than incr(): if the key is ever evicted,
+    # restarting from a counter could collide with entries still cached
+    now = timezone.now()
+    cache.set_many({NAMESPACE_KEY.format(namespace): (uuid.uuid4().hex, now) for namespace in namespaces}, None)
+
+def bump_namespaces(*namespaces):
+    """
+    Make everything cached under these namespaces unreachable
+
+    Bumped straight away and again when the surrounding transaction commits:
+    anything computed in between read the old rows but was stamped with the
+    new version. Inside deferred_invalidation() both wait for the block to end.
+    """
+    if not namespaces:
+        return
+    pending = getattr(_deferred, 'namespaces', None)
+    if pending is not None:
+        pending.update(namespaces)
+        return
+    _bump(namespaces)
+    transaction.on_commit(lambda: _bump(namespaces))
+
+def model_namespaces(model, fields=None):
+    """
+    The namespaces a write to model invalidates
+
+    A model can narrow them for writes of particular fields with
+    cache_field_namespaces, e.g. {'stock': (INVENTORY,)}; a write of any
+    field it doesn't list, or of unknown fields, invalidates them all.
+    """
+    by_field = getattr(model, 'cache_field_namespaces', {})
+    if fields and all(field in by_field for field in fields):
+        return set().union(*(by_field[field] for field in fields))
+    return getattr(model, 'cache_namespaces', ())
+
+def invalidate_model(model, fields=None):
+    bump_namespaces(*model_namespaces(model, fields))
+
+@contextmanager
+def deferred_invalidation():
+    """
+    Collect the bumps of a bulk job and send each namespace's once at the end
+
+    For jobs like a catalog import or a rendition backfill, where bumping per
+    batch or per row would have every worker reload its snapshots meanwhile.
+    """
+    if getattr(_deferred, 'namespaces', None) is not None:
+        # Nested: the outermost block flushes
+        yield
+        return
+    _deferred.namespaces = set()
+    try:
+        yield
+    finally:
+        namespaces, _deferred.namespaces = _deferred.namespaces, None
+        bump_namespaces(*namespaces)
+
+def versioned_key(namespace, *parts):
+    return ':'.join([namespace, namespace_version(namespace), *map(str, parts)])
+
+def get_or_compute(namespace, key, compute, timeout=None):
+    """
+    A value cached under the current version of namespace
+
+    Computed from the primary: a lagging replica could still be missing the
+    write that bumped the version.
+
+    Returns:
+        The cached value, or compute()'s result after caching it
+    """
+    cache_key = versioned_key(namespace, key)
+    value = cache.get(cache_key)
+    if value is None:
+        with use_primary():
+            value = compute()
+        cache.set(cache_key, value, timeout)
+    return value
+
+class InvalidatingQuerySet(models.QuerySet):
+    """
+    QuerySet for models with cache_namespaces
+
+    Save and delete signals cover single objects; update() and the bulk
+    operations send none, so they bump the model's namespaces themselves.
+    """
+
+    def update(self, **kwargs):
+        rows = super().update(**kwargs)
+        if rows:
+            invalidate_model(self.model, kwargs)
+        return rows
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        created = super().bulk_create(objs, *args, **kwargs)
+        if created:
+            invalidate_model(self.model)
+        return created
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        if rows:
+            invalidate_model(self.model, fields)
+        return rows
+
+InvalidatingManager = models.Manager.from_queryset(InvalidatingQuerySet)
+
+def connect_model_signals(app_models):
+    """
+    Bump a model's namespaces on every save and delete
+
+    Connected per model rather than for every sender: a post_delete receiver
+    with no sender would turn off fast deletes for all models.
+    """
+    from django.db.models.signals import post_delete, post_save
+
+    def invalidate(sender, update_fields=None, **kwargs):
+        invalidate_model(sender, update_fields)
+
+    for model in app_models:
+        if getattr(model, 'cache_namespaces', ()):
+            for signal in (post_save, post_delete):
+                signal.connect(invalidate, sender=model, weak=False, dispatch_uid=f'invalidate:{model._meta.label}')
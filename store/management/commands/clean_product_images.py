@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from store.images import find_orphans, rehash_legacy_images, still_orphaned
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete stored product image blobs and renditions that no ProductImage references, "
+        "optionally moving pre-deduplication uploads onto content-hash names first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24,
+                            help="Only delete files older than this many hours (default: 24)")
+        parser.add_argument('--rehash', action='store_true',
+                            help="Move images uploaded before deduplication onto content-hash names first")
+        parser.add_argument('--dry-run', action='store_true', help="List orphans without deleting them")
+
+    def handle(self, *args, **options):
+        if options['min_age'] < 0:
+            raise CommandError("--min-age can't be negative")
+        if options['rehash'] and options['dry_run']:
+            raise CommandError("--rehash moves files and can't be combined with --dry-run")
+
+        if options['rehash']:
+            moved = rehash_legacy_images()
+            self.stdout.write(f"Moved {moved} product images onto content-hash names")
+            if moved:
+                self.stdout.write("Run generate_renditions to rebuild their renditions")
+
+        min_age = timedelta(hours=options['min_age'])
+        orphans = find_orphans(min_age=min_age)
+        freed = deleted = 0
+        for name in orphans:
+            if options['dry_run']:
+                self.stdout.write(f"  {name}")
+            elif not still_orphaned(name, min_age):
+                # Reused by an upload since the scan
+                continue
+            freed += default_storage.size(name)
+            if not options['dry_run']:
+                default_storage.delete(name)
+            deleted += 1
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} orphaned files ({freed / 1024:,.0f} KiB)"))
+        if deleted < len(orphans):
+            self.stdout.write(f"Kept {len(orphans) - deleted} files reused since the scan")
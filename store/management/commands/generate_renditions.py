@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.renditions import backfill_renditions, find_stale_images
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate the thumb/card/detail JPEG and WebP renditions for product images "
+        "that don't have current ones, e.g. after seeding or before uploads triggered them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Worker processes (default: 4)")
+        parser.add_argument('--force', action='store_true',
+                            help="Regenerate every image, e.g. after changing the sizes or quality")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        names = find_stale_images(force=options['force'])
+        if not names:
+            self.stdout.write("All product images already have renditions")
+            return
+        self.stdout.write(f"Generating renditions for {len(names)} images with {options['workers']} workers")
+
+        updated, failed = backfill_renditions(
+            names, workers=options['workers'], log=lambda message: self.stdout.write(f"  {message}"),
+        )
+        for name, error in failed:
+            self.stdout.write(self.style.WARNING(f"  {name}: {error}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"Updated {updated} product images from {len(names) - len(failed)} files "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from store.cache import bump_catalog_version
+from store.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount the category page facet counts from the product table, after bulk "
+        "changes that bypassed Product.save() (queryset.update(), raw SQL)."
+    )
+
+    def handle(self, *args, **options):
+        rows = rebuild_facet_counts()
+        bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} facet counts"))
@@ -0,0 +1,57 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.seeding import seed_store, clear_seeded
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a deterministic synthetic dataset: categories, products, placeholder "
+        "images, users, orders and an inventory ledger consistent with Product.stock."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--ledger-rows', type=int, default=50000,
+                            help="Target number of inventory transactions (default: 50000)")
+        parser.add_argument('--images', type=int, default=16,
+                            help="Distinct placeholder image files shared by the products (default: 16)")
+        parser.add_argument('--days', type=int, default=730, help="History spread in days (default: 730)")
+        parser.add_argument('--seed', type=int, default=42, help="Random seed (default: 42)")
+        parser.add_argument('--prefix', default='seed', help="Prefix for slugs, usernames and emails")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clear', action='store_true',
+                            help="Delete data from a previous run with the same prefix first")
+
+    def handle(self, *args, **options):
+        if options['categories'] < 1 and options['products'] > 0:
+            raise CommandError("Products need at least one category")
+
+        started = time.perf_counter()
+        if options['clear']:
+            clear_seeded(options['prefix'])
+            self.stdout.write(f"Cleared previous '{options['prefix']}' data")
+
+        counts = seed_store(
+            categories=options['categories'],
+            products=options['products'],
+            users=options['users'],
+            orders=options['orders'],
+            ledger_rows=options['ledger_rows'],
+            images=options['images'],
+            days=options['days'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            log=lambda message: self.stdout.write(f"  {message}"),
+        )
+        elapsed = time.perf_counter() - started
+        rate = counts['ledger_rows'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {counts['products']} products and {counts['ledger_rows']} ledger rows "
+            f"in {elapsed:.1f}s ({rate:,.0f} ledger rows/s)"
+        ))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_alter_productimage_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Generated sizes and formats of the image, see store.renditions'),
+        ),
+    ]
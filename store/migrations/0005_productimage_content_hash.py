@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:09
+
+import store.images
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_productimage_renditions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='SHA-256 of the file; identical uploads share one stored blob', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=store.images.ContentHashImageField(upload_to='images/'),
+        ),
+    ]
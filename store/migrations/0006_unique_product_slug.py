@@ -0,0 +1,36 @@
+from django.db import migrations, models
+from django.db.models import Count
+
+import store.images
+
+
+def deduplicate_slugs(apps, schema_editor):
+    """Suffix all but the oldest product sharing a slug with its id, so the unique index can be built"""
+    Product = apps.get_model('store', 'Product')
+    duplicated = Product.objects.values('slug').annotate(count=Count('id')).filter(count__gt=1)
+    for slug in duplicated.values_list('slug', flat=True):
+        for product in Product.objects.filter(slug=slug).order_by('id')[1:]:
+            product.slug = f'{slug[:240]}-{product.id}'
+            product.save(update_fields=['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_productimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(max_length=250, unique=True),
+        ),
+        # Content-addressed blobs are looked up by name to reuse their renditions
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=store.images.ContentHashImageField(db_index=True, upload_to='images/'),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:23
+
+from decimal import Decimal
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, CharField, Count, F, Q, Value, When
+
+# The facets as they stood when this migration was written; store.facets
+# may change them later, and rebuild_facets recounts with the live ones
+PRICE_BANDS = [
+    ('under-10', Decimal('0'), Decimal('10')),
+    ('10-25', Decimal('10'), Decimal('25')),
+    ('25-50', Decimal('25'), Decimal('50')),
+    ('50-plus', Decimal('50'), None),
+]
+
+
+def count_existing_products(apps, schema_editor):
+    FacetCount = apps.get_model('store', 'FacetCount')
+    Product = apps.get_model('store', 'Product')
+
+    products = Product.objects.filter(category__isnull=False)
+    band = Case(
+        *[
+            When(Q(price__gte=low) & (Q(price__lt=high) if high is not None else Q()), then=Value(key))
+            for key, low, high in PRICE_BANDS
+        ],
+        default=Value(PRICE_BANDS[0][0]), output_field=CharField(),
+    )
+    stock = Case(
+        When(available=True, stock__gt=0, then=Value('in-stock')),
+        default=Value('out-of-stock'), output_field=CharField(),
+    )
+    rows = []
+    for facet, expression in (('brand', F('brand')), ('price', band), ('stock', stock)):
+        grouped = products.annotate(value=expression).values('category_id', 'value').annotate(count=Count('id'))
+        rows.extend(
+            FacetCount(category_id=row['category_id'], facet=facet, value=row['value'], count=row['count'])
+            for row in grouped.order_by()
+        )
+    FacetCount.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_unique_product_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('brand', 'Brand'), ('price', 'Price band'), ('stock', 'Availability')], max_length=10)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'facet counts',
+            },
+        ),
+        migrations.AddField(
+            model_name='facetcount',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to='store.category'),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('category', 'facet', 'value'), name='unique_facet_value'),
+        ),
+        migrations.RunPython(count_existing_products, migrations.RunPython.noop),
+    ]
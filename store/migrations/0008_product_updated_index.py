@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_facet_counts'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['updated'], name='product_updated_idx'),
+        ),
+    ]
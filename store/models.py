@@ -1,12 +1,19 @@
+from django.core.files.storage import default_storage
 from django.db import models
 from django.urls import reverse
 
+from .images import ContentHashImageField
+from .invalidation import CATALOG, INVENTORY, InvalidatingManager
+
 # Create your models here.
 
 class Category(models.Model):
     name = models.CharField(max_length=100, db_index=True)
     slug = models.SlugField(max_length=250, unique=True)
 
+    cache_namespaces = (CATALOG,)
+    objects = InvalidatingManager()
+
     class Meta:
         verbose_name_plural = 'categories'
 
@@ -21,7 +28,7 @@ class Product(models.Model):
     title = models.CharField(max_length=200)
     brand = models.CharField(max_length=100, default='un-branded')
     description = models.TextField(blank=True)
-    slug = models.SlugField(max_length=250)
+    slug = models.SlugField(max_length=250, unique=True)
     price = models.DecimalField(max_digits=7, decimal_places=2)
     # Documenting the removal of the image field to create a product image model
     #image = models.ImageField(upload_to='images/')
@@ -30,8 +37,20 @@ class Product(models.Model):
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
 
+    # Stock and price also feed the inventory summary
+    cache_namespaces = (CATALOG, INVENTORY)
+    # Sales and restocks save stock alone. The storefront doesn't show stock
+    # levels, only whether a product is in stock, which the facet counts
+    # bump AVAILABILITY for when it flips
+    cache_field_namespaces = {'stock': (INVENTORY,)}
+    objects = InvalidatingManager()
+
     class Meta:
         verbose_name_plural = 'products'
+        indexes = [
+            # Suggestion index refreshes read back recently changed products
+            models.Index(fields=['updated'], name='product_updated_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -41,8 +60,12 @@ class Product(models.Model):
 
     def get_main_image(self):
         """Return the first image or None if no images exist"""
-        first_image = self.images.first()
+        first_image = self.get_main_product_image()
         return first_image.image if first_image else None
+
+    def get_main_product_image(self):
+        """Return the first ProductImage (with its renditions) or None"""
+        return self.images.first()
     
     def get_all_images(self):
         """Return all images for this product"""
@@ -50,11 +73,18 @@ class Product(models.Model):
     
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, related_name='images', on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='images/')
+    image = ContentHashImageField(upload_to='images/', db_index=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False,
+                                    help_text="SHA-256 of the file; identical uploads share one stored blob")
     alt_text = models.CharField(max_length=200, blank=True, help_text="Alternative text for accessibility")
     is_main = models.BooleanField(default=False, help_text="Check if this is the main product image")
     order = models.PositiveIntegerField(default=0, help_text="Order of image display")
     created = models.DateTimeField(auto_now_add=True)
+    renditions = models.JSONField(default=dict, blank=True, editable=False,
+                                  help_text="Generated sizes and formats of the image, see store.renditions")
+
+    cache_namespaces = (CATALOG,)
+    objects = InvalidatingManager()
 
     class Meta:
         verbose_name_plural = 'Product Images'
@@ -69,3 +99,36 @@ class ProductImage(models.Model):
             # Set all other images for this product to not be main
             ProductImage.objects.filter(product=self.product, is_main=True).update(is_main=False)
         super().save(*args, **kwargs)
+
+    def has_renditions(self):
+        """Whether the generated variants belong to the current image file"""
+        return bool(self.image) and self.renditions.get('source') == self.image.name
+
+    def get_rendition_url(self, size, fmt='jpeg'):
+        """URL of a generated variant, or of the original until one exists"""
+        if self.has_renditions() and size in self.renditions:
+            return default_storage.url(self.renditions[size][fmt])
+        return self.image.url
+
+class FacetCount(models.Model):
+    """Number of products per facet value in a category, kept current by store.facets"""
+    FACETS = [
+        ('brand', 'Brand'),
+        ('price', 'Price band'),
+        ('stock', 'Availability'),
+    ]
+
+    category = models.ForeignKey(Category, related_name='facet_counts', on_delete=models.CASCADE)
+    facet = models.CharField(max_length=10, choices=FACETS)
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'facet counts'
+        constraints = [
+            models.UniqueConstraint(fields=['category', 'facet', 'value'], name='unique_facet_value'),
+        ]
+
+    def __str__(self):
+        return f"{self.category} {self.facet}={self.value}: {self.count}"
+
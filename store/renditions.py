@@ -0,0 +1,252 @@
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+
+# Bounding boxes, largest side first. Images are only ever shrunk.
+RENDITIONS = {
+    'thumb': (150, 150),
+    'card': (400, 400),
+    'detail': (1000, 1000),
+}
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def rendition_name(source_name, size, fmt):
+    """
+    Storage name for one variant of a source image
+
+    Names derive from the source path only, so regenerating overwrites the
+    same files and images shared by several products share their variants.
+    """
+    stem = os.path.splitext(source_name)[0]
+    return f'renditions/{stem}-{size}.{"jpg" if fmt == "jpeg" else fmt}'
+
+def render_variant(image, box, fmt):
+    """
+    Shrink an open Pillow image into box and encode it
+
+    Returns:
+        (bytes, width, height)
+    """
+    from PIL import Image
+
+    pil_format, _, options = FORMATS[fmt]
+    variant = image.copy()
+    variant.thumbnail(box, Image.LANCZOS)
+    if pil_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        # JPEG has no alpha channel; flatten onto white rather than black
+        background = Image.new('RGB', variant.size, (255, 255, 255))
+        background.paste(variant, mask=variant.convert('RGBA').getchannel('A'))
+        variant = background
+    buffer = io.BytesIO()
+    variant.save(buffer, pil_format, **options)
+    return buffer.getvalue(), variant.width, variant.height
+
+def generate_renditions(source_name):
+    """
+    Write every size and format of one source image through default_storage
+
+    Safe to run in a worker process: it touches storage only, never the database.
+
+    Returns:
+        Dictionary to store in ProductImage.renditions
+    """
+    from PIL import Image, ImageOps
+
+    with default_storage.open(source_name, 'rb') as handle:
+        image = Image.open(handle)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('P', 'LA') else 'RGB')
+
+    renditions = {'source': source_name}
+    previous = None
+    for size, box in RENDITIONS.items():
+        if previous and (previous['width'], previous['height']) == image.size:
+            # The original already fit the smaller box unshrunk; the files would be identical
+            renditions[size] = previous
+            continue
+        variant = {}
+        for fmt in FORMATS:
+            content, width, height = render_variant(image, box, fmt)
+            name = rendition_name(source_name, size, fmt)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variant[fmt] = default_storage.save(name, ContentFile(content))
+            variant['width'], variant['height'] = width, height
+        renditions[size] = previous = variant
+    return renditions
+
+def save_renditions(source_name, renditions):
+    """
+    Record generated renditions on every ProductImage still using source_name
+
+    The update() bumps the catalog version, so cached pages pick up the new
+    srcset.
+
+    Returns:
+        Number of ProductImage rows updated
+    """
+    from .models import ProductImage
+
+    return ProductImage.objects.filter(image=source_name).update(renditions=renditions)
+
+def init_worker():
+    """Set Django up in a freshly spawned pool worker"""
+    # Spawned workers unpickle this before Django is set up, so it must live in
+    # a module that imports no models at load time
+    import django
+    django.setup()
+
+def process_pool(workers):
+    """
+    Process pool for image work (uploads, backfills, catalog imports) and
+    stock reconciliation
+
+    Spawn rather than fork: the parent is a threaded server and a forked
+    child would inherit its locks and database sockets.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+    )
+
+def _get_executor(replace=None):
+    global _executor
+    with _executor_lock:
+        if _executor is None or _executor is replace:
+            _executor = process_pool(settings.RENDITION_WORKERS)
+        return _executor
+
+def _record_result(source_name, result):
+    try:
+        save_renditions(source_name, result())
+    except Exception:
+        # The upload itself already succeeded; pages fall back to the original
+        logger.exception("Rendition generation failed for %s", source_name)
+
+def schedule_renditions(source_name):
+    """
+    Generate renditions for an uploaded image off the request thread
+
+    With RENDITION_WORKERS set to 0 the work is done inline instead, which
+    is what tests and one-off scripts want.
+    """
+    if not settings.RENDITION_WORKERS:
+        _record_result(source_name, lambda: generate_renditions(source_name))
+        return
+
+    def done(future):
+        # Runs on the executor's management thread, which gets its own connection
+        try:
+            _record_result(source_name, future.result)
+        finally:
+            connection.close()
+
+    executor = _get_executor()
+    try:
+        future = executor.submit(generate_renditions, source_name)
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory); start a fresh pool once
+        future = _get_executor(replace=executor).submit(generate_renditions, source_name)
+    future.add_done_callback(done)
+
+def store_image(path):
+    """
+    Store a local image file under its content-hash name
+
+    Runs in a worker process during catalog imports; rendering is queued
+    separately so attaching rows never waits for it.
+
+    Returns:
+        (storage name, digest, whether a new blob was written, error or None)
+    """
+    from django.core.files import File
+    from .images import blob_name, content_hash
+
+    try:
+        with open(path, 'rb') as handle:
+            file = File(handle)
+            digest = content_hash(file)
+            name = blob_name(digest, path)
+            if default_storage.exists(name):
+                return name, digest, False, None
+            return default_storage.save(name, file), digest, True, None
+    except Exception as e:
+        return None, None, False, str(e)
+
+def try_generate_renditions(source_name):
+    """generate_renditions for pool workers: errors come back as values instead of breaking the map"""
+    try:
+        return source_name, generate_renditions(source_name), None
+    except Exception as e:
+        return source_name, None, str(e)
+
+def find_stale_images(force=False):
+    """
+    Distinct source names whose renditions are missing or belong to an older file
+
+    Returns:
+        Sorted list of storage names
+    """
+    from .models import ProductImage
+
+    names = set()
+    for name, renditions in ProductImage.objects.exclude(image='').values_list('image', 'renditions').iterator():
+        if force or (renditions or {}).get('source') != name:
+            names.add(name)
+    return sorted(names)
+
+def backfill_renditions(source_names, workers=1, log=None):
+    """
+    Generate renditions for many source images over a process pool
+
+    Each distinct file is rendered once however many products share it. The
+    parent records results as they arrive; the catalog version is bumped once
+    at the end rather than per image.
+
+    Returns:
+        (number of ProductImage rows updated, list of (source name, error))
+    """
+    from .invalidation import deferred_invalidation
+    from .models import ProductImage
+
+    log = log or (lambda message: None)
+    updated, failed = 0, []
+    if workers > 1:
+        pool = process_pool(workers)
+        results = pool.map(try_generate_renditions, source_names, chunksize=4)
+    else:
+        pool = None
+        results = map(try_generate_renditions, source_names)
+    try:
+        with deferred_invalidation():
+            for index, (source_name, renditions, error) in enumerate(results, 1):
+                if error:
+                    failed.append((source_name, error))
+                else:
+                    updated += ProductImage.objects.filter(image=source_name).update(renditions=renditions)
+                if index % 100 == 0:
+                    log(f"{index}/{len(source_names)} images")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return updated, failed
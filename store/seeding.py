@@ -0,0 +1,278 @@
+import io
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from .cache import bump_catalog_version
+from .facets import rebuild_facet_counts
+from .models import Category, Product, ProductImage
+
+BRANDS = ['Nintendo', 'Sega', 'Sony', 'Atari', 'Capcom', 'Konami', 'Namco', 'SNK', 'Hudson', 'Taito']
+ADJECTIVES = ['Super', 'Mega', 'Ultra', 'Hyper', 'Turbo', 'Final', 'Legendary', 'Secret', 'Dark', 'Golden']
+NOUNS = ['Quest', 'Fighter', 'Racer', 'Kart', 'Saga', 'Tactics', 'Island', 'Dungeon', 'Galaxy', 'Arena']
+PLATFORMS = ['NES', 'SNES', 'N64', 'Genesis', 'Saturn', 'PS1', 'Game Boy', 'Dreamcast']
+
+LEDGER_COLUMNS = (
+    'product', 'transaction_type', 'reason', 'quantity', 'previous_stock', 'new_stock',
+    'created_at', 'order_item', 'user', 'notes',
+)
+
+class LedgerWriter:
+    """
+    Buffered executemany insert into the inventory ledger
+
+    Going through bulk_create costs tens of microseconds per row in model
+    instantiation and SQL compilation, which dominates a million-row seed.
+    Rows here are plain tuples in LEDGER_COLUMNS order, flushed every
+    batch_size rows with a single prepared statement.
+    """
+
+    def __init__(self, batch_size):
+        from inventory.models import InventoryTransaction
+
+        meta = InventoryTransaction._meta
+        quote = connection.ops.quote_name
+        columns = [meta.get_field(name).column for name in LEDGER_COLUMNS]
+        self.sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(meta.db_table),
+            ', '.join(quote(column) for column in columns),
+            ', '.join(['%s'] * len(columns)),
+        )
+        self.adapt_datetime = connection.ops.adapt_datetimefield_value
+        self.batch_size = batch_size
+        self.rows = []
+        self.count = 0
+
+    def __enter__(self):
+        self.cursor = connection.cursor()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        try:
+            if exc_type is None:
+                self.flush()
+        finally:
+            self.cursor.close()
+
+    def add(self, product_id, transaction_type, reason, quantity, previous_stock, new_stock,
+            created_at, order_item_id=None, user_id=None, notes=''):
+        self.rows.append((
+            product_id, transaction_type, reason, quantity, previous_stock, new_stock,
+            self.adapt_datetime(created_at), order_item_id, user_id, notes,
+        ))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.cursor.executemany(self.sql, self.rows)
+            self.count += len(self.rows)
+            self.rows = []
+
+def placeholder_png(color):
+    """A tiny solid-colour PNG"""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8), color).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def _batched_create(model, objects, batch_size):
+    created = []
+    for start in range(0, len(objects), batch_size):
+        created.extend(model.objects.bulk_create(objects[start:start + batch_size]))
+    return created
+
+def clear_seeded(prefix):
+    """Delete everything a previous seed_store run created with this prefix"""
+    from inventory.models import InventoryTransaction
+    from payment.models import Order
+
+    # Ledger rows have no dependants, so this is a single DELETE rather than
+    # the cascade collector loading every row into memory.
+    InventoryTransaction.objects.filter(product__slug__startswith=f'{prefix}-').delete()
+    Order.objects.filter(email__endswith=f'@{prefix}.example').delete()
+    User.objects.filter(username__startswith=f'{prefix}_user_').delete()
+    Category.objects.filter(slug__startswith=f'{prefix}-').delete()
+
+    for directory in (f'images/{prefix}', f'renditions/images/{prefix}'):
+        if default_storage.exists(directory):
+            for name in default_storage.listdir(directory)[1]:
+                default_storage.delete(f'{directory}/{name}')
+
+def seed_store(categories=10, products=1000, users=100, orders=2000, ledger_rows=50000,
+               images=16, days=730, seed=42, prefix='seed', batch_size=5000, log=None):
+    """
+    Create a deterministic, internally consistent store dataset
+
+    Every product's stock equals the net of its ledger: an INITIAL entry large
+    enough to cover all later outflows, one SALE per order item, and PURCHASE /
+    DAMAGED entries filling the ledger up to ledger_rows.
+
+    Returns:
+        Dictionary of created row counts
+    """
+    from payment.models import Order, OrderItem
+
+    log = log or (lambda message: None)
+    rng = random.Random(seed)
+    end = timezone.now().replace(microsecond=0)
+    start = end - timedelta(days=days)
+
+    def moment():
+        return start + timedelta(seconds=rng.randrange(days * 86400))
+
+    counts = {}
+    with transaction.atomic():
+        category_objects = _batched_create(Category, [
+            Category(name=f'{PLATFORMS[i % len(PLATFORMS)]} {i + 1}', slug=f'{prefix}-category-{i + 1:04d}')
+            for i in range(categories)
+        ], batch_size)
+        counts['categories'] = len(category_objects)
+        log(f"categories: {len(category_objects)}")
+
+        password = make_password(f'{prefix}-password')
+        user_objects = _batched_create(User, [
+            User(username=f'{prefix}_user_{i + 1:06d}', email=f'user{i + 1}@{prefix}.example', password=password)
+            for i in range(users)
+        ], batch_size)
+        counts['users'] = len(user_objects)
+        log(f"users: {len(user_objects)}")
+
+        # Plan order items first so each product's initial stock can cover its sales
+        order_plan = []
+        item_plan = []
+        for order_index in range(orders):
+            user = rng.choice(user_objects) if user_objects and rng.random() < 0.7 else None
+            ordered_at = moment()
+            order_plan.append((user, ordered_at))
+            for _ in range(rng.randint(1, 3)):
+                item_plan.append((order_index, rng.randrange(products), rng.randint(1, 3)))
+
+        extra_rows = max(ledger_rows - products - len(item_plan), 0)
+        extra_per_product = [extra_rows // products] * products if products else []
+        for index in rng.sample(range(products), extra_rows % products) if products else []:
+            extra_per_product[index] += 1
+
+        # Extra movements: mostly restocks, some write-offs, drawn per product
+        extra_events = []
+        outflow = [0] * products
+        for _, product_index, quantity in item_plan:
+            outflow[product_index] += quantity
+        for product_index in range(products):
+            events = []
+            for _ in range(extra_per_product[product_index]):
+                if rng.random() < 0.8:
+                    events.append((moment(), rng.randint(5, 50), 'IN', 'PURCHASE'))
+                else:
+                    quantity = rng.randint(1, 3)
+                    outflow[product_index] += quantity
+                    events.append((moment(), -quantity, 'OUT', 'DAMAGED'))
+            extra_events.append(events)
+
+        initial_stock = [outflow[i] + rng.randint(0, 100) for i in range(products)]
+        final_stock = [
+            initial_stock[i] - outflow[i] + sum(qty for _, qty, _, _ in extra_events[i] if qty > 0)
+            for i in range(products)
+        ]
+
+        product_objects = []
+        for i in range(products):
+            title = f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i + 1}'
+            product_objects.append(Product(
+                category=category_objects[i % len(category_objects)] if category_objects else None,
+                title=title,
+                brand=rng.choice(BRANDS),
+                description=f'{title} for {rng.choice(PLATFORMS)}.',
+                slug=f'{prefix}-{slugify(title)}',
+                price=Decimal(rng.randint(499, 9999)) / 100,
+                stock=final_stock[i],
+            ))
+        product_objects = _batched_create(Product, product_objects, batch_size)
+        counts['products'] = len(product_objects)
+        log(f"products: {len(product_objects)}")
+
+        image_names = [
+            default_storage.save(
+                f'images/{prefix}/placeholder-{i:02d}.png',
+                ContentFile(placeholder_png((rng.randrange(256), rng.randrange(256), rng.randrange(256)))),
+            )
+            for i in range(images)
+        ]
+        image_objects = _batched_create(ProductImage, [
+            ProductImage(product=product, image=image_names[i % len(image_names)],
+                         alt_text=product.title, is_main=True)
+            for i, product in enumerate(product_objects)
+        ] if image_names else [], batch_size)
+        counts['product_images'] = len(image_objects)
+        log(f"product images: {len(image_objects)}")
+
+        totals = [Decimal('0')] * len(order_plan)
+        for order_index, product_index, quantity in item_plan:
+            totals[order_index] += product_objects[product_index].price * quantity
+
+        order_objects = _batched_create(Order, [
+            Order(
+                full_name=user.username if user else f'Guest {i + 1}',
+                email=user.email if user else f'guest{i + 1}@{prefix}.example',
+                shipping_address='1 Seed Street\nSeedville',
+                amount_paid=totals[i],
+                user=user,
+            )
+            for i, (user, ordered_at) in enumerate(order_plan)
+        ], batch_size)
+        # date_ordered is auto_now_add, which bulk_create fills in with the
+        # current time; bulk_update writes the historic dates as given
+        for order, (user, ordered_at) in zip(order_objects, order_plan):
+            order.date_ordered = ordered_at
+        Order.objects.bulk_update(order_objects, ['date_ordered'], batch_size=batch_size)
+        counts['orders'] = len(order_objects)
+
+        item_objects = _batched_create(OrderItem, [
+            OrderItem(
+                order=order_objects[order_index],
+                product=product_objects[product_index],
+                quantity=quantity,
+                price=product_objects[product_index].price,
+                user=order_plan[order_index][0],
+            )
+            for order_index, product_index, quantity in item_plan
+        ], batch_size)
+        counts['order_items'] = len(item_objects)
+        log(f"orders: {len(order_objects)}, order items: {len(item_objects)}")
+
+        sales = [[] for _ in range(products)]
+        for item, (order_index, product_index, quantity) in zip(item_objects, item_plan):
+            sales[product_index].append((order_plan[order_index][1], -quantity, 'SALE', 'SALE', item))
+
+        with LedgerWriter(batch_size) as writer:
+            for i, product in enumerate(product_objects):
+                stock = initial_stock[i]
+                writer.add(product.id, 'IN', 'INITIAL', stock, 0, stock, start, None, None, 'Seeded initial stock')
+                events = sorted(
+                    [event + (None,) for event in extra_events[i]] + sales[i],
+                    key=lambda event: event[0],
+                )
+                for created_at, quantity, transaction_type, reason, order_item in events:
+                    writer.add(
+                        product.id, transaction_type, reason, quantity, stock, stock + quantity, created_at,
+                        order_item.id if order_item else None,
+                        order_item.user_id if order_item else None,
+                    )
+                    stock += quantity
+        counts['ledger_rows'] = writer.count
+        log(f"ledger rows: {writer.count}")
+
+    # bulk_create skips the signals that keep facet counts current, and the
+    # cached pages include the counts
+    counts['facet_counts'] = rebuild_facet_counts()
+    bump_catalog_version()
+    return counts
@@ -0,0 +1,55 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .facets import FACET_FIELDS, apply_facet_change, facet_snapshot
+from .models import Product, ProductImage
+from .renditions import schedule_renditions
+
+@receiver(post_save, sender=ProductImage)
+def generate_image_renditions(sender, instance, **kwargs):
+    """Queue thumbnails and WebP variants once an uploaded image is committed"""
+    if instance.image and not instance.has_renditions():
+        transaction.on_commit(partial(schedule_renditions, instance.image.name))
+
+def stored_facet_values(product):
+    """The facet values currently stored for a product, read fresh so a stale instance can't skew counts"""
+    if product.pk is None:
+        return None
+    return Product.objects.filter(pk=product.pk).values_list(*FACET_FIELDS).first()
+
+def saves_facet_fields(update_fields):
+    return update_fields is None or any(
+        field in update_fields or field.removesuffix('_id') in update_fields for field in FACET_FIELDS
+    )
+
+@receiver(pre_save, sender=Product)
+def load_facet_values(sender, instance, update_fields=None, **kwargs):
+    locked = instance.__dict__.pop('_locked_facet_values', None)
+    if saves_facet_fields(update_fields):
+        instance._facet_before = locked or stored_facet_values(instance)
+
+@receiver(post_save, sender=Product)
+def update_facet_counts(sender, instance, update_fields=None, **kwargs):
+    """Shift the product's facet counts from what was stored to what was just saved"""
+    if not saves_facet_fields(update_fields):
+        return
+    before = instance._facet_before
+    after = tuple(
+        instance.__dict__[field]
+        if update_fields is None or before is None or field in update_fields or field.removesuffix('_id') in update_fields
+        else before[index]
+        for index, field in enumerate(FACET_FIELDS)
+    )
+    apply_facet_change(before, after)
+
+@receiver(pre_delete, sender=Product)
+def load_deleted_facet_values(sender, instance, **kwargs):
+    # Cascades load full rows; only a deferred instance needs reading back
+    instance._facet_before = facet_snapshot(instance) or stored_facet_values(instance)
+
+@receiver(post_delete, sender=Product)
+def remove_facet_counts(sender, instance, **kwargs):
+    apply_facet_change(instance._facet_before, None)
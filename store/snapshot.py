@@ -0,0 +1,218 @@
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import SynchronousOnlyOperation
+from django.core.files.storage import default_storage
+from django.db import DatabaseError
+from django.urls import reverse
+
+from game_store.routers import use_primary
+from .cache import aget_catalog_version, get_catalog_version
+from .invalidation import AVAILABILITY, namespace_version
+from .models import Category, Product, ProductImage
+
+logger = logging.getLogger(__name__)
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+# (AVAILABILITY version, ids of the products in stock)
+_in_stock = None
+
+class CatalogImage:
+    """Read-only stand-in for a ProductImage, for templates and the store_images tags"""
+    __slots__ = ('name', 'alt_text', 'renditions')
+
+    def __init__(self, name, alt_text, renditions):
+        self.name = name
+        self.alt_text = alt_text
+        self.renditions = renditions
+
+    def has_renditions(self):
+        return bool(self.name) and self.renditions.get('source') == self.name
+
+    def get_rendition_url(self, size, fmt='jpeg'):
+        if self.has_renditions() and size in self.renditions:
+            return default_storage.url(self.renditions[size][fmt])
+        return default_storage.url(self.name)
+
+class CatalogProduct:
+    """Read-only stand-in for a Product with its images, ordered as ProductImage.Meta orders them"""
+    __slots__ = (
+        'id', 'category_id', 'title', 'brand', 'description', 'slug', 'price', 'available', 'updated', 'images',
+    )
+
+    def __init__(self, id, category_id, title, brand, description, slug, price, available, updated):
+        self.id = id
+        self.category_id = category_id
+        self.title = title
+        self.brand = brand
+        self.description = description
+        self.slug = slug
+        self.price = price
+        self.available = available
+        self.updated = updated
+        self.images = ()
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.title
+
+    def get_absolute_url(self):
+        return reverse('product_info', args=[self.slug])
+
+    def get_main_product_image(self):
+        return self.images[0] if self.images else None
+
+    def get_all_images(self):
+        return self.images
+
+class CatalogCategory:
+    """Read-only stand-in for a Category, with its products in id order"""
+    __slots__ = ('id', 'name', 'slug', 'products')
+
+    def __init__(self, id, name, slug):
+        self.id = id
+        self.name = name
+        self.slug = slug
+        self.products = ()
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return reverse('list_category', args=[self.slug])
+
+class CatalogSnapshot:
+    """
+    The whole storefront catalog as plain read-only objects
+
+    Loaded with three queries and never changed afterwards: a newer catalog
+    version gets a new snapshot, swapped in whole, so a request holding this
+    one reads a consistent catalog to the end. Stock levels are left out, as
+    every sale changes them; see get_in_stock_ids.
+    """
+    __slots__ = ('version', 'products', 'categories', '_products_by_id', '_products_by_slug', '_categories_by_slug')
+
+    def __init__(self, version, categories, products):
+        self.version = version
+        self.categories = tuple(categories)
+        self.products = tuple(products)
+        self._products_by_id = {product.id: product for product in self.products}
+        self._products_by_slug = {product.slug: product for product in self.products}
+        self._categories_by_slug = {category.slug: category for category in self.categories}
+
+    @classmethod
+    def load(cls, version):
+        categories = [
+            CatalogCategory(*row) for row in Category.objects.values_list('id', 'name', 'slug').order_by('id')
+        ]
+        # Values repeated across rows (brands, shared image blobs and their
+        # renditions, alt text copied from the title) are held once
+        shared = {}
+        products = []
+        for row in Product.objects.values_list(
+            'id', 'category_id', 'title', 'brand', 'description', 'slug', 'price', 'available', 'updated',
+        ).order_by('id'):
+            product = CatalogProduct(*row)
+            product.brand = shared.setdefault(('brand', product.brand), product.brand)
+            products.append(product)
+        by_id = {product.id: product for product in products}
+        images = {}
+        for product_id, name, alt_text, renditions in ProductImage.objects.values_list(
+            'product_id', 'image', 'alt_text', 'renditions',
+        ).order_by('product_id', 'order', 'created', 'id'):
+            product = by_id.get(product_id)
+            if product is None:
+                # Added between the two queries
+                continue
+            if alt_text == product.title:
+                alt_text = product.title
+            name = shared.setdefault(('name', name), name)
+            known = shared.setdefault(('renditions', name), renditions)
+            images.setdefault(product_id, []).append(
+                CatalogImage(name, alt_text, known if known == renditions else renditions),
+            )
+        for product_id, product_images in images.items():
+            by_id[product_id].images = tuple(product_images)
+
+        in_category = {}
+        for product in products:
+            in_category.setdefault(product.category_id, []).append(product)
+        for category in categories:
+            category.products = tuple(in_category.get(category.id, ()))
+        return cls(version, categories, products)
+
+    def get_product(self, product_id):
+        return self._products_by_id.get(product_id)
+
+    def get_product_by_slug(self, slug):
+        return self._products_by_slug.get(slug)
+
+    def get_category_by_slug(self, slug):
+        return self._categories_by_slug.get(slug)
+
+def get_catalog_snapshot():
+    """
+    This process's catalog snapshot for the current catalog version
+
+    Checking the version is a cache read. When it has moved, the first
+    request to notice loads the new snapshot while the others wait for it,
+    so nothing is rendered from a catalog older than the version it would
+    be cached under.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == get_catalog_version():
+        return snapshot
+    with _snapshot_lock:
+        # Re-read: the version may have moved again while this thread waited
+        version = get_catalog_version()
+        if _snapshot is None or _snapshot.version != version:
+            # From the primary, as it is kept until the version next moves
+            with use_primary():
+                _snapshot = CatalogSnapshot.load(version)
+        return _snapshot
+
+async def aget_catalog_snapshot():
+    """get_catalog_snapshot for async views: the version is read with the async cache API, a reload in a thread"""
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == await aget_catalog_version():
+        return snapshot
+    return await sync_to_async(get_catalog_snapshot)()
+
+def get_in_stock_ids():
+    """
+    Ids of the available products with stock, for the category page's in-stock filter
+
+    Held apart from the snapshot under the AVAILABILITY version, which moves
+    when a product sells out or comes back rather than on every sale, and
+    reloaded with a single query of ids.
+    """
+    global _in_stock
+    # Read before the ids: if it moves meanwhile, the next call reloads
+    version = namespace_version(AVAILABILITY)
+    current = _in_stock
+    if current is None or current[0] != version:
+        with use_primary():
+            ids = frozenset(Product.objects.filter(available=True, stock__gt=0).values_list('id', flat=True))
+        current = _in_stock = (version, ids)
+    return current[1]
+
+def warm_catalog_snapshot():
+    """Load the snapshot at worker start so the first page doesn't pay for it"""
+    try:
+        snapshot = get_catalog_snapshot()
+    except (DatabaseError, SynchronousOnlyOperation):
+        # e.g. before migrations have run, or called on an event loop; the
+        # first request loads it instead
+        logger.warning("Catalog snapshot not loaded at startup", exc_info=True)
+        return
+    logger.info("Catalog snapshot loaded: %d products, %d categories", len(snapshot.products), len(snapshot.categories))
@@ -0,0 +1,294 @@
+import heapq
+import logging
+from bisect import bisect_left
+import re
+import sys
+import threading
+import time
+import unicodedata
+from array import array
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import SynchronousOnlyOperation
+from django.db import DatabaseError
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from game_store.routers import use_primary
+from .cache import get_catalog_version
+from .models import Product
+
+# Saves are stamped before they commit, so each refresh re-reads a little
+# further back than the previous one started
+REFRESH_OVERLAP = timedelta(seconds=60)
+# Changed products are kept beside the built arrays until there are this many
+OVERLAY_LIMIT = 2000
+# Prefixes spanning more tokens than this (e.g. every number starting with
+# '1') are ranked with one sort of their postings instead of a heap merge
+MERGE_LIMIT = 64
+
+_WORD = re.compile(r'[^\W_]+')
+
+logger = logging.getLogger(__name__)
+
+_index = None
+_index_lock = threading.Lock()
+
+def normalize(text):
+    """Lowercase, accent-free word tokens: 'Pokémon Red-Blue' -> ['pokemon', 'red', 'blue']"""
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return _WORD.findall(stripped.casefold())
+
+def _prefix_range(tokens, term):
+    """[lo, hi) of the sorted tokens starting with term"""
+    return tokens.bisect(term), tokens.bisect(term[:-1] + chr(ord(term[-1]) + 1))
+
+def _matches(terms, text):
+    words = normalize(text)
+    return all(any(word.startswith(term) for word in words) for term in terms)
+
+def _product_rows(queryset):
+    """(id, title, brand, units sold, available) rows, popularity from order items"""
+    return queryset.annotate(sold=Coalesce(Sum('orderitem__quantity'), 0)).values_list(
+        'id', 'title', 'brand', 'sold', 'available',
+    ).order_by()
+
+def _packed(values, largest=None):
+    """values in the narrowest unsigned array that holds the largest of them"""
+    if largest is None:
+        values = list(values)
+        largest = max(values, default=0)
+    typecode = next(code for code in 'BHIQ' if largest < 1 << 8 * array(code).itemsize)
+    return array(typecode, values)
+
+class _Strings:
+    """Many short strings packed into one str, read back by position"""
+
+    def __init__(self, strings):
+        self.text = ''.join(strings)
+        self.offsets = array('I', [0])
+        for string in strings:
+            self.offsets.append(self.offsets[-1] + len(string))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        return self.text[self.offsets[index]:self.offsets[index + 1]]
+
+    def bisect(self, value):
+        """Position of the first string >= value, the strings being sorted"""
+        lo, hi = 0, len(self)
+        while lo < hi:
+            middle = (lo + hi) // 2
+            if self[middle] < value:
+                lo = middle + 1
+            else:
+                hi = middle
+        return lo
+
+    def __sizeof__(self):
+        return sys.getsizeof(self.text) + sys.getsizeof(self.offsets)
+
+class _Base:
+    """
+    The built part of the index: products ranked by popularity, and postings
+
+    Products are numbered by rank, so every posting list (a token's products,
+    in ascending number) is also in popularity order and the first matches
+    found are the best ones. All posting lists sit in one flat array in token
+    order, which makes a prefix's postings one contiguous slice. Strings are
+    packed rather than kept as objects, and numbers in the narrowest array
+    type that holds them: per-object overhead would otherwise be most of the
+    footprint. 100k products with 23-character titles, each carrying a unique
+    number token, take about 7 MB, 2.7 MB of it the titles; building the
+    index peaks at about five times that.
+    """
+
+    def __init__(self, rows):
+        rows = sorted(rows, key=lambda row: (-row[3], row[1].casefold(), row[0]))
+        self.ids = _packed(row[0] for row in rows)
+        # For membership tests, which refreshes run once per changed product
+        self.sorted_ids = _packed(sorted(self.ids))
+        self.weights = _packed(row[3] for row in rows)
+        self.titles = _Strings([row[1] for row in rows])
+        self.brands = sorted({row[2] for row in rows})
+        positions = {brand: position for position, brand in enumerate(self.brands)}
+        self.brand_numbers = _packed(positions[row[2]] for row in rows)
+
+        postings = {}
+        for number, row in enumerate(rows):
+            for token in set(normalize(f'{row[1]} {row[2]}')):
+                postings.setdefault(token, []).append(number)
+        tokens = sorted(postings)
+        self.tokens = _Strings(tokens)
+        offsets = [0]
+        for token in tokens:
+            offsets.append(offsets[-1] + len(postings[token]))
+        self.posting_offsets = _packed(offsets)
+        self.postings = _packed((number for token in tokens for number in postings[token]), largest=len(rows))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, product_id):
+        position = bisect_left(self.sorted_ids, product_id)
+        return position < len(self.sorted_ids) and self.sorted_ids[position] == product_id
+
+    def entry(self, number):
+        return self.ids[number], self.titles[number], self.brands[self.brand_numbers[number]], self.weights[number]
+
+    def postings_count(self, lo, hi):
+        return self.posting_offsets[hi] - self.posting_offsets[lo]
+
+    def numbers(self, lo, hi):
+        """Set of the product numbers under tokens lo..hi"""
+        return set(self.postings[self.posting_offsets[lo]:self.posting_offsets[hi]])
+
+    def ranked(self, lo, hi):
+        """Product numbers under tokens lo..hi, best first, each once"""
+        offsets = self.posting_offsets
+        if hi - lo > MERGE_LIMIT:
+            yield from sorted(self.numbers(lo, hi))
+            return
+        postings = memoryview(self.postings)
+        previous = None
+        for number in heapq.merge(*(postings[offsets[token]:offsets[token + 1]] for token in range(lo, hi))):
+            if number != previous:
+                yield number
+                previous = number
+
+    def __sizeof__(self):
+        return sum(sys.getsizeof(part) for part in (
+            self.ids, self.sorted_ids, self.weights, self.titles, self.brand_numbers, self.tokens,
+            self.posting_offsets, self.postings,
+        )) + sum(sys.getsizeof(brand) for brand in self.brands)
+
+class SuggestionIndex:
+    """
+    In-process prefix index over available products' titles and brands
+
+    An immutable snapshot: the arrays built from one query, plus an overlay
+    of products changed since (product id -> entry, or None once deleted or
+    unavailable). Refreshing returns a new snapshot, so searches running
+    on other threads never see one half-updated.
+    """
+
+    def __init__(self, base, overlay, version, since, live):
+        self.base = base
+        self.overlay = overlay
+        self.version = version
+        self.since = since
+        self.live = live
+        self.checked = time.monotonic()
+
+    @classmethod
+    def build(cls, version=None):
+        """Build from one query over every product"""
+        version = get_catalog_version() if version is None else version
+        since = timezone.now()
+        base = _Base([row[:4] for row in _product_rows(Product.objects.filter(available=True))])
+        return cls(base, {}, version, since, len(base))
+
+    def refreshed(self, version):
+        """
+        This index with products changed since it was built or last refreshed
+
+        Reads back only the products whose updated stamp moved, then checks
+        the available count: a mismatch means products were deleted or
+        changed behind the ORM, and the index is rebuilt.
+        """
+        since = timezone.now()
+        changed = _product_rows(Product.objects.filter(updated__gte=self.since - REFRESH_OVERLAP))
+        overlay = dict(self.overlay)
+        live = self.live
+        for product_id, title, brand, sold, available in changed:
+            if len(overlay) > OVERLAY_LIMIT:
+                # e.g. a catalog import: cheaper to start over than to patch
+                return type(self).build(version)
+            entry = (product_id, title, brand, sold) if available else None
+            was_live = overlay[product_id] is not None if product_id in overlay else product_id in self.base
+            live += (entry is not None) - was_live
+            overlay[product_id] = entry
+
+        if live != Product.objects.filter(available=True).count():
+            return type(self).build(version)
+        return type(self)(self.base, overlay, version, since, live)
+
+    def search(self, query, limit=8):
+        """
+        Best-selling products whose title or brand words start with every query word
+
+        Returns:
+            List of (id, title, brand, units sold), most popular first
+        """
+        terms = normalize(query)
+        if not terms:
+            return []
+        matches = [
+            entry for entry in self.overlay.values()
+            if entry is not None and _matches(terms, f'{entry[1]} {entry[2]}')
+        ]
+
+        base = self.base
+        ranges = [_prefix_range(base.tokens, term) for term in terms]
+        if len(ranges) == 1:
+            # One word: walk its prefix in rank order and stop at the limit
+            candidates = base.ranked(*ranges[0])
+        elif all(lo < hi for lo, hi in ranges):
+            candidates = sorted(set.intersection(*(base.numbers(*bounds) for bounds in ranges)))
+        else:
+            candidates = ()
+        found = 0
+        for number in candidates:
+            if found >= limit:
+                break
+            if base.ids[number] not in self.overlay:
+                matches.append(base.entry(number))
+                found += 1
+
+        matches.sort(key=lambda entry: (-entry[3], entry[1].casefold(), entry[0]))
+        return matches[:limit]
+
+    def memory_size(self):
+        """Approximate bytes held, for checking the per-worker footprint"""
+        return sys.getsizeof(self.base) + sum(sys.getsizeof(entry) for entry in self.overlay.values())
+
+def get_suggestion_index():
+    """
+    This process's index, brought up to date if the catalog version moved
+
+    The version check is a cache read, so an unchanged catalog costs no
+    database query. The index is also refreshed after SUGGEST_MAX_AGE
+    seconds, to pick up saves that committed after their version bump.
+    """
+    global _index
+    version = get_catalog_version()
+    index = _index
+    if index is not None and index.version == version and time.monotonic() - index.checked < settings.SUGGEST_MAX_AGE:
+        return index
+    with _index_lock, use_primary():
+        if _index is None:
+            _index = SuggestionIndex.build(version)
+        elif _index is index:
+            _index = index.refreshed(version)
+        return _index
+
+def reset_suggestion_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+def warm_suggestion_index():
+    """Build the index at worker start so the first keystroke doesn't pay for it"""
+    try:
+        index = get_suggestion_index()
+    except (DatabaseError, SynchronousOnlyOperation):
+        # e.g. before migrations have run, or called on an event loop; the
+        # first request builds it instead
+        logger.warning("Suggestion index not built at startup", exc_info=True)
+        return
+    logger.info("Suggestion index built: %d products, %d KB", len(index.base), index.memory_size() // 1024)
@@ -0,0 +1,71 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+
+from store.renditions import FORMATS, RENDITIONS
+
+register = template.Library()
+
+# How wide each slot is laid out, for the browser to pick from srcset
+SLOT_SIZES = {
+    'thumb': '80px',
+    'card': '(max-width: 576px) 100vw, (max-width: 992px) 50vw, 300px',
+    'detail': '(max-width: 768px) 100vw, 45vw',
+}
+
+@register.simple_tag
+def rendition_url(image, size, fmt='jpeg'):
+    """URL of one variant of a ProductImage, falling back to the original or the placeholder"""
+    if image is None:
+        return static('images/no-image.png')
+    return image.get_rendition_url(size, fmt)
+
+@register.simple_tag
+def rendition_srcset(image, fmt='jpeg'):
+    """
+    srcset listing every generated width of a ProductImage in one format
+
+    Returns:
+        String like "a-thumb.jpg 150w, a-card.jpg 400w", or '' before renditions exist
+    """
+    if image is None or not image.has_renditions():
+        return ''
+    candidates = {}
+    for size in RENDITIONS:
+        variant = image.renditions.get(size)
+        # Small originals come out the same width at several sizes; keep one
+        if variant and variant['width'] not in candidates:
+            candidates[variant['width']] = default_storage.url(variant[fmt])
+    return ', '.join(f'{url} {width}w' for width, url in sorted(candidates.items()))
+
+@register.simple_tag
+def responsive_image(image, slot, **attrs):
+    """
+    <picture> for a ProductImage in a layout slot (thumb, card or detail)
+
+    WebP is offered first with a JPEG fallback, both as srcsets so the browser
+    picks the smallest variant that fills the slot. Images without renditions
+    yet render as a plain <img> of the original, and None as the placeholder.
+
+    Args:
+        image: ProductImage or None
+        slot: Key of RENDITIONS the src and sizes are chosen for
+        **attrs: Extra <img> attributes, e.g. class, id, alt
+    """
+    attrs.setdefault('alt', image.alt_text if image is not None and image.alt_text else '')
+    if slot != 'detail':
+        attrs.setdefault('loading', 'lazy')
+    extra = format_html_join(' ', '{}="{}"', sorted(attrs.items()))
+    src = rendition_url(image, slot)
+
+    if image is None or not image.has_renditions():
+        return format_html('<img src="{}" {}>', src, extra)
+
+    variant = image.renditions[slot]
+    return format_html(
+        '<picture><source type="{}" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" {}></picture>',
+        FORMATS['webp'][1], rendition_srcset(image, 'webp'), SLOT_SIZES[slot],
+        src, rendition_srcset(image, 'jpeg'), SLOT_SIZES[slot], variant['width'], variant['height'], extra,
+    )
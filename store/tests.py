@@ -1,3 +1,659 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.template import Context, Template
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.text import slugify
+
+from inventory.reconcile import find_discrepancies
+from monitoring.testing import QueryBudgetTestCase, media_storage
+from payment.models import Order
+from .cache import get_catalog_version
+from .facets import price_band, rebuild_facet_counts
+from .invalidation import AVAILABILITY, CATALOG, INVENTORY, deferred_invalidation, get_or_compute, namespace_version
+from .models import Category, FacetCount, Product, ProductImage
+from .catalog_import import CatalogImport, read_rows
+from .checks import check_shared_cache
+from .images import find_orphans, still_orphaned
+from .renditions import backfill_renditions, find_stale_images
+from .seeding import clear_seeded, placeholder_png, seed_store
+from .snapshot import aget_catalog_snapshot, get_catalog_snapshot, get_in_stock_ids, warm_catalog_snapshot
+from .suggest import SuggestionIndex, _Base, get_suggestion_index, warm_suggestion_index
+from .views import async_live_search, categories, live_search
+
+class StoreQueryBudgetTests(QueryBudgetTestCase):
+
+    def test_store(self):
+        self.assertQueryBudget(1, lambda: self.client.get(reverse('store')))
+
+    def test_list_category(self):
+        url = reverse('list_category', args=[self.category.slug])
+        self.assertQueryBudget(2, lambda: self.client.get(url))
+
+    def test_list_category_filtered(self):
+        url = reverse('list_category', args=[self.category.slug])
+        filters = {'price': price_band(self.product.price), 'brand': self.product.brand}
+        self.assertQueryBudget(2, lambda: self.client.get(url, filters))
+
+    def test_product_info(self):
+        url = reverse('product_info', args=[self.product.slug])
+        self.assertQueryBudget(1, lambda: self.client.get(url))
+
+    def test_live_search(self):
+        self.assertQueryBudget(2, lambda: self.client.get(
+            reverse('live_search'), {'q': 'e'}, headers={'x-requested-with': 'XMLHttpRequest'},
+        ))
+
+    async def test_async_live_search_matches_live_search(self):
+        headers = {'x-requested-with': 'XMLHttpRequest'}
+        for query in ('e', self.product.title, ''):
+            request = RequestFactory().get('/', {'q': query}, headers=headers)
+            expected = await sync_to_async(live_search)(request)
+            response = await async_live_search(AsyncRequestFactory().get('/', {'q': query}, headers=headers))
+            self.assertEqual(json.loads(response.content), json.loads(expected.content))
+            self.assertEqual(response['ETag'], expected['ETag'])
+
+    async def test_async_live_search_validates_off_the_event_loop(self):
+        headers = {'x-requested-with': 'XMLHttpRequest'}
+        sync_reads = AssertionError('sync cache read on the event loop')
+        with mock.patch('store.cache.get_catalog_version', side_effect=sync_reads), \
+                mock.patch('store.cache.get_catalog_modified', side_effect=sync_reads):
+            response = await async_live_search(AsyncRequestFactory().get('/', {'q': 'e'}, headers=headers))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.has_header('Last-Modified'))
+            revalidated = await async_live_search(AsyncRequestFactory().get(
+                '/', {'q': 'e'}, headers={**headers, 'if-none-match': response['ETag']},
+            ))
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_categories_context_processor(self):
+        request = RequestFactory().get('/')
+        self.assertQueryBudget(0, lambda: list(categories(request)['all_categories']), status=None)
+
+@override_settings(PAGE_CACHE_TIMEOUT=600)
+class AnonymousPageCacheTests(QueryBudgetTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def test_hit_skips_rendering(self):
+        url = reverse('product_info', args=[self.product.slug])
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+        self.assertQueryBudget(1, lambda: self.client.get(url))
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+
+    def test_cart_badge_is_per_session(self):
+        url = reverse('store')
+        self.client.get(url)
+        session = self.client.session
+        session['session_key'] = {str(self.product.id): {'price': str(self.product.price), 'qty': 3}}
+        session.save()
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertRegex(response.content.decode(), r'id="cart-qty"[^>]*>\s*3\s*</div>')
+
+    def test_catalog_change_invalidates(self):
+        url = reverse('list_category', args=[self.category.slug])
+        self.client.get(url)
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'hit')
+        self.product.title = 'Renamed'
+        self.product.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Renamed')
+
+    def test_authenticated_users_bypass(self):
+        self.client.force_login(self.customer)
+        url = reverse('store')
+        self.client.get(url)
+        self.assertNotIn('X-Page-Cache', self.client.get(url))
+
+class ConditionalGetTests(QueryBudgetTestCase):
+
+    def assertNotModified(self, url, data=None, **headers):
+        def refresh_etag():
+            self.etag = self.client.get(url, data, headers=headers)['ETag']
+
+        self.refresh_etag = refresh_etag
+        refresh_etag()
+        self.assertQueryBudget(
+            2, lambda: self.client.get(url, data, headers={**headers, 'If-None-Match': self.etag}), status=304,
+        )
+
+    def grow_dataset(self):
+        super().grow_dataset()
+        # The grown catalog has a new version, so the pages have new ETags
+        self.refresh_etag()
+
+    def test_product_info_not_modified(self):
+        self.assertNotModified(reverse('product_info', args=[self.product.slug]))
+
+    def test_list_category_not_modified(self):
+        self.assertNotModified(reverse('list_category', args=[self.category.slug]))
+
+    def test_live_search_not_modified(self):
+        self.assertNotModified(reverse('live_search'), {'q': 'e'}, **{'x-requested-with': 'XMLHttpRequest'})
+
+    def test_product_change_changes_etag(self):
+        url = reverse('product_info', args=[self.product.slug])
+        etag = self.client.get(url)['ETag']
+        self.product.price += 1
+        self.product.save()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cart_change_changes_etag(self):
+        url = reverse('store')
+        etag = self.client.get(url)['ETag']
+        session = self.client.session
+        session['session_key'] = {str(self.product.id): {'price': str(self.product.price), 'qty': 2}}
+        session.save()
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 200)
+
+    def test_if_modified_since_for_anonymous_only(self):
+        url = reverse('product_info', args=[self.product.slug])
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, headers={'If-Modified-Since': last_modified}).status_code, 304)
+        self.client.force_login(self.customer)
+        response = self.client.get(url, headers={'If-Modified-Since': last_modified})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+@override_settings(SQL_INSTRUMENTATION_SAMPLE_RATE=0, PROFILER_SAMPLE_RATE=0, PAGE_CACHE_TIMEOUT=0)
+class StoreTestCase(TestCase):
+    """
+    A category and a product with one image, in scratch media storage
+
+    Each test's rows are rolled back without a namespace bump, so the cache
+    is cleared before every test.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls._media = media_storage()
+        cls._media.__enter__()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls._media.__exit__(None, None, None)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Consoles', slug='consoles')
+        cls.product = Product.objects.create(
+            category=cls.category, title='Mega Console', slug='mega-console', brand='Sega', price='49.99', stock=8,
+        )
+        name = default_storage.save('images/test/box.png', ContentFile(placeholder_png((10, 20, 30))))
+        ProductImage.objects.create(product=cls.product, image=name, alt_text=cls.product.title, is_main=True)
+
+    def setUp(self):
+        cache.clear()
+
+@override_settings(RENDITION_WORKERS=0)
+class RenditionTests(StoreTestCase):
+
+    def upload(self, size=(1600, 1200)):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGBA', size, (200, 10, 10, 128)).save(buffer, 'PNG')
+        image = ProductImage(product=self.product, alt_text='Box art')
+        image.image.save('box-art.png', ContentFile(buffer.getvalue()), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        image.refresh_from_db()
+        return image
+
+    def test_upload_generates_every_size_and_format(self):
+        image = self.upload()
+        self.assertTrue(image.has_renditions())
+        self.assertEqual(
+            {size: (image.renditions[size]['width'], image.renditions[size]['height']) for size in ('thumb', 'card', 'detail')},
+            {'thumb': (150, 113), 'card': (400, 300), 'detail': (1000, 750)},
+        )
+        for fmt in ('jpeg', 'webp'):
+            self.assertTrue(default_storage.exists(image.renditions['card'][fmt]))
+
+        html = Template("{% load store_images %}{% responsive_image image 'card' %}").render(Context({'image': image}))
+        self.assertIn('<source type="image/webp"', html)
+        self.assertIn('150w', html)
+        self.assertIn(f'src="{image.get_rendition_url("card")}"', html)
+
+    def test_small_originals_are_not_written_twice(self):
+        image = self.upload(size=(120, 90))
+        self.assertEqual(image.renditions['thumb'], image.renditions['detail'])
+
+    def test_backfill_covers_images_without_renditions(self):
+        stale = find_stale_images()
+        self.assertTrue(stale)
+        updated, failed = backfill_renditions(stale)
+        self.assertEqual(failed, [])
+        self.assertEqual(updated, ProductImage.objects.count())
+        self.assertEqual(find_stale_images(), [])
+
+@override_settings(RENDITION_WORKERS=0)
+class ContentHashTests(StoreTestCase):
+
+    def upload(self, content, filename='box-art.png'):
+        image = ProductImage(product=self.product, image=SimpleUploadedFile(filename, content))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        image.refresh_from_db()
+        return image
+
+    def png(self, colour):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 200), colour).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.upload(self.png((1, 2, 3)))
+        second = self.upload(self.png((1, 2, 3)), filename='Another Name.PNG')
+        other = self.upload(self.png((9, 9, 9)))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image.name, f'images/{first.content_hash[:2]}/{first.content_hash}.png')
+        self.assertEqual(second.renditions, first.renditions)
+        self.assertNotEqual(other.image.name, first.image.name)
+        self.assertEqual(len(default_storage.listdir(f'images/{first.content_hash[:2]}')[1]), 1)
+
+    def test_reused_blob_survives_a_sweep_in_progress(self):
+        image = self.upload(self.png((4, 5, 6)))
+        files = [image.image.name, image.renditions['thumb']['jpeg']]
+        image.delete()
+        two_days_ago = time.time() - 2 * 24 * 3600
+        for name in files:
+            os.utime(default_storage.path(name), (two_days_ago, two_days_ago))
+        orphans = find_orphans()
+        self.assertTrue(set(files) <= set(orphans))
+
+        # Uploaded again after the sweep listed the files, before it deletes them
+        reused = self.upload(self.png((4, 5, 6)))
+        self.assertEqual(reused.image.name, files[0])
+        for name in files:
+            # Touched, so they are young again even before the row commits
+            self.assertGreater(default_storage.get_modified_time(name).timestamp(), two_days_ago + 3600)
+            self.assertFalse(still_orphaned(name))
+        self.assertFalse(set(files) & set(find_orphans()))
+
+    def test_orphans_exclude_referenced_and_recent_files(self):
+        image = self.upload(self.png((1, 2, 3)))
+        orphan = default_storage.save('images/ff/orphan.png', ContentFile(b'stale'))
+
+        orphans = find_orphans(min_age=timedelta(0))
+        self.assertIn(orphan, orphans)
+        self.assertNotIn(image.image.name, orphans)
+        self.assertNotIn(image.renditions['thumb']['webp'], orphans)
+        self.assertNotIn(orphan, find_orphans())
+
+class CatalogImportTests(StoreTestCase):
+
+    def write_catalog(self, directory, rows):
+        from PIL import Image
+
+        Image.new('RGB', (500, 400), (5, 6, 7)).save(os.path.join(directory, 'box.png'))
+        path = os.path.join(directory, 'catalog.csv')
+        with open(path, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['category', 'title', 'price', 'stock', 'images'])
+            writer.writerows(rows)
+        return path
+
+    def run_import(self, rows):
+        with tempfile.TemporaryDirectory() as directory:
+            path = self.write_catalog(directory, rows)
+            return CatalogImport(batch_size=2, workers=1, image_root=directory).run(read_rows(path))
+
+    def test_import_then_reimport(self):
+        from inventory.models import InventoryTransaction
+
+        report = self.run_import([
+            ['Imports', 'Alpha Game', '19.99', '5', 'box.png'],
+            ['Imports', 'Beta Game', '9.99', '0', 'box.png|box.png'],
+            ['Imports', 'Gamma Game', 'free', '1', ''],
+        ])
+        self.assertEqual(report['errors'], [(4, "invalid price 'free'")])
+        self.assertEqual((report['products_created'], report['ledger_rows'], report['image_files']), (2, 1, 1))
+        alpha = Product.objects.get(slug='alpha-game')
+        self.assertEqual((alpha.stock, alpha.category.slug), (5, 'imports'))
+        self.assertEqual(InventoryTransaction.objects.get(product=alpha).reason, 'INITIAL')
+        images = ProductImage.objects.filter(product__slug__in=['alpha-game', 'beta-game'])
+        self.assertEqual(len({image.image.name for image in images}), 1)
+        self.assertTrue(all(image.has_renditions() for image in images))
+
+        report = self.run_import([['Imports', 'Alpha Game', '24.99', '50', 'box.png']])
+        alpha.refresh_from_db()
+        self.assertEqual((report['products_updated'], report['ledger_rows'], report['images']), (1, 0, 0))
+        self.assertEqual((str(alpha.price), alpha.stock), ('24.99', 5))
+
+    def test_malformed_jsonl_line_is_a_row_error(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'catalog.jsonl')
+            with open(path, 'w') as handle:
+                handle.write(json.dumps({'category': 'Imports', 'title': 'Alpha Game', 'price': '19.99'}) + '\n')
+                handle.write('{"category": "Imports", "title": \n')
+                handle.write('["Imports"]\n')
+                handle.write(json.dumps({'category': 'Imports', 'title': 'Beta Game', 'price': '9.99'}) + '\n')
+            report = CatalogImport(batch_size=1, workers=1).run(read_rows(path))
+
+        self.assertEqual([number for number, error in report['errors']], [2, 3])
+        self.assertTrue(report['errors'][0][1].startswith('invalid JSON'))
+        self.assertEqual(report['products_created'], 2)
+
+    def test_dead_worker_fails_only_its_image(self):
+        class InlinePool:
+            # Work that names the poisoned file breaks the pool, as a killed worker would
+            def submit(self, function, argument):
+                future = Future()
+                if str(argument).endswith('poison.png'):
+                    future.set_exception(BrokenProcessPool())
+                else:
+                    future.set_result(function(argument))
+                return future
+
+            def shutdown(self, wait=True):
+                pass
+
+        with tempfile.TemporaryDirectory() as directory, \
+                mock.patch('store.catalog_import.process_pool', lambda workers: InlinePool()):
+            path = self.write_catalog(directory, [
+                ['Imports', 'Alpha Game', '19.99', '5', 'poison.png|box.png'],
+                ['Imports', 'Beta Game', '9.99', '1', 'box.png'],
+            ])
+            report = CatalogImport(batch_size=1, workers=2, image_root=directory).run(read_rows(path))
+
+        self.assertEqual(report['image_errors'], [(os.path.join(directory, 'poison.png'), "worker process died")])
+        self.assertEqual((report['products_created'], report['images'], report['image_files']), (2, 2, 1))
+
+class FacetCountTests(StoreTestCase):
+
+    def counts(self):
+        return sorted(FacetCount.objects.filter(count__gt=0).values_list('category_id', 'facet', 'value', 'count'))
+
+    def assertCountsMatchRebuild(self):
+        incremental = self.counts()
+        rebuild_facet_counts()
+        self.assertEqual(incremental, self.counts())
+
+    def test_incremental_updates_match_a_rebuild(self):
+        from inventory.utils import adjust_stock
+
+        product = Product.objects.create(
+            category=self.category, title='Facet Test', slug='facet-test', brand='Facetco', price='12.00', stock=3,
+        )
+        self.assertCountsMatchRebuild()
+        adjust_stock(product, -3, 'OUT', 'MANUAL')
+        self.assertCountsMatchRebuild()
+        product.refresh_from_db()
+        product.price, product.brand = 60, 'Othercorp'
+        product.save()
+        self.assertCountsMatchRebuild()
+        Product.objects.only('id').get(pk=product.pk).delete()
+        self.assertCountsMatchRebuild()
+
+    def test_saves_skip_the_stored_values_read_when_they_can(self):
+        from inventory.utils import adjust_stock
+
+        product = Product.objects.get(pk=self.product.pk)
+        product.description = 'Reworded'
+        with CaptureQueriesContext(connection) as queries:
+            product.save(update_fields=['description'])
+        self.assertEqual(len(queries), 1)
+
+        for quantity in (-product.stock, 2):
+            with CaptureQueriesContext(connection) as queries:
+                adjust_stock(product, quantity, 'ADJUSTMENT', 'MANUAL')
+            selects = [query['sql'] for query in queries if query['sql'].startswith('SELECT') and 'store_product' in query['sql']]
+            self.assertEqual(len(selects), 1, selects)
+            self.assertCountsMatchRebuild()
+
+    def test_filters_narrow_the_listing(self):
+        Product.objects.create(
+            category=self.category, title='Other Console', slug='other-console', brand='Nintendo', price='20.00', stock=1,
+        )
+        url = reverse('list_category', args=[self.category.slug])
+        brand = self.product.brand
+        response = self.client.get(url, {'brand': brand})
+        self.assertTrue(response.context['products'])
+        self.assertEqual({product.brand for product in response.context['products']}, {brand})
+        self.assertIn((brand, Product.objects.filter(category=self.category, brand=brand).count()),
+                      response.context['facets']['brands'])
+
+class SuggestionIndexTests(StoreTestCase):
+
+    def create_product(self, title, sold=0, **fields):
+        from payment.models import OrderItem
+
+        product = Product.objects.create(
+            category=self.category, title=title, slug=slugify(title), brand='Zephyr', price='10.00', stock=5, **fields,
+        )
+        if sold:
+            OrderItem.objects.create(product=product, quantity=sold, price=product.price)
+        return product
+
+    def titles(self, index, query):
+        return [title for product_id, title, brand, sold in index.search(query)]
+
+    def test_prefixes_ranked_by_units_sold(self):
+        self.create_product('Zephyr Quest', sold=2)
+        self.create_product('Zephyr Quest Deluxe', sold=9)
+        self.create_product('Zephyr Kart', sold=5)
+        self.create_product('Pokémon Zephyr')
+        index = SuggestionIndex.build()
+        self.assertEqual(self.titles(index, 'zeph'), ['Zephyr Quest Deluxe', 'Zephyr Kart', 'Zephyr Quest', 'Pokémon Zephyr'])
+        self.assertEqual(self.titles(index, 'QU zep'), ['Zephyr Quest Deluxe', 'Zephyr Quest'])
+        self.assertEqual(self.titles(index, 'pokemon'), ['Pokémon Zephyr'])
+        self.assertEqual(self.titles(index, 'zephyr nothing'), [])
+
+    def test_refresh_patches_changes_and_rebuilds_after_deletes(self):
+        quest = self.create_product('Zephyr Quest')
+        kart = self.create_product('Zephyr Kart')
+        index = SuggestionIndex.build()
+
+        quest.title = 'Zephyr Odyssey'
+        quest.save()
+        kart.available = False
+        kart.save()
+        self.create_product('Zephyr Racer')
+        refreshed = index.refreshed('changed')
+        self.assertIs(refreshed.base, index.base)
+        self.assertEqual(sorted(self.titles(refreshed, 'zephyr')), ['Zephyr Odyssey', 'Zephyr Racer'])
+
+        # Deletes leave nothing to read back; the live count catches them
+        Product.objects.filter(title='Zephyr Racer').delete()
+        rebuilt = refreshed.refreshed('deleted')
+        self.assertIsNot(rebuilt.base, index.base)
+        self.assertEqual(self.titles(rebuilt, 'zephyr'), ['Zephyr Odyssey'])
+
+    def test_endpoint_answers_from_memory(self):
+        self.create_product('Zephyr Quest', sold=1)
+        get_suggestion_index()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('suggest'), {'q': 'zephyr q'})
+        self.assertEqual([suggestion['title'] for suggestion in response.json()['suggestions']], ['Zephyr Quest'])
+
+    def test_membership_and_packed_arrays(self):
+        base = _Base([(7, 'Zephyr Quest', 'Zephyr', 3), (2, 'Zephyr Kart', 'Zephyr', 300), (70000, 'Pokémon', 'Nintendo', 0)])
+        self.assertEqual([product_id in base for product_id in (2, 7, 70000, 1, 8, 70001)], [True] * 3 + [False] * 3)
+        self.assertEqual((base.ids.typecode, base.weights.typecode, base.brand_numbers.typecode), ('I', 'H', 'B'))
+        self.assertEqual(list(base.ids), [2, 7, 70000])
+
+    async def test_warm_up_on_the_event_loop_is_skipped(self):
+        with self.assertLogs('store.suggest', 'WARNING'):
+            warm_suggestion_index()
+
+class CatalogSnapshotTests(StoreTestCase):
+
+    def test_swapped_whole_when_the_catalog_changes(self):
+        snapshot = get_catalog_snapshot()
+        self.assertIs(get_catalog_snapshot(), snapshot)
+        title = self.product.title
+        self.product.title = 'Renamed Product'
+        self.product.save()
+
+        current = get_catalog_snapshot()
+        self.assertIsNot(current, snapshot)
+        self.assertEqual(current.get_product(self.product.id).title, 'Renamed Product')
+        self.assertEqual(snapshot.get_product(self.product.id).title, title)
+        self.assertIn(current.get_product(self.product.id), current.get_category_by_slug(self.category.slug).products)
+
+    def test_images_in_display_order(self):
+        name = default_storage.save('images/test/back.png', ContentFile(placeholder_png((30, 20, 10))))
+        ProductImage.objects.create(product=self.product, image=name, alt_text='Back', order=1)
+        product = get_catalog_snapshot().get_product(self.product.id)
+        names = [image.name for image in product.images]
+        self.assertEqual(names, [image.image.name for image in self.product.images.all()])
+        self.assertEqual(product.get_main_product_image().get_rendition_url('thumb'),
+                         self.product.get_main_product_image().get_rendition_url('thumb'))
+
+    async def test_async_lookup_reads_the_version_off_the_event_loop(self):
+        snapshot = await sync_to_async(get_catalog_snapshot)()
+        sync_read = AssertionError('sync cache read on the event loop')
+        with mock.patch('store.snapshot.get_catalog_version', side_effect=sync_read):
+            self.assertIs(await aget_catalog_snapshot(), snapshot)
+
+    def test_cart_add_unknown_product(self):
+        response = self.client.post(reverse('cart_add'), {'action': 'post', 'product_id': '0', 'product_quantity': 1})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_warm_up_on_the_event_loop_is_skipped(self):
+        with self.assertLogs('store.snapshot', 'WARNING'):
+            warm_catalog_snapshot()
+
+    def test_lifespan_startup_warms_the_catalog(self):
+        with mock.patch.dict(os.environ):
+            from game_store import asgi
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        # Closing the startup connection would end the test's transaction
+        with mock.patch('game_store.asgi.close_old_connections'):
+            async_to_sync(asgi.application)({'type': 'lifespan'}, receive, send)
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+        with self.assertNumQueries(0):
+            get_catalog_snapshot()
+
+class InvalidationTests(StoreTestCase):
+
+    def test_writes_bypassing_signals_bump(self):
+        version = get_catalog_version()
+        ProductImage.objects.filter(product=self.product).update(alt_text='Updated')
+        self.assertNotEqual(get_catalog_version(), version)
+
+        version = namespace_version(INVENTORY)
+        Product.objects.filter(pk=self.product.pk).update(stock=5)
+        self.assertNotEqual(namespace_version(INVENTORY), version)
+
+        version = get_catalog_version()
+        Product.objects.filter(pk=0).update(stock=5)
+        self.assertEqual(get_catalog_version(), version)
+
+    def test_sales_leave_the_catalog_alone(self):
+        from inventory.utils import adjust_stock
+
+        adjust_stock(self.product, 100, 'IN', 'PURCHASE')
+        catalog, inventory, availability = (
+            namespace_version(namespace) for namespace in (CATALOG, INVENTORY, AVAILABILITY)
+        )
+        adjust_stock(self.product, -1, 'SALE', 'SALE')
+        self.assertEqual(namespace_version(CATALOG), catalog)
+        self.assertEqual(namespace_version(AVAILABILITY), availability)
+        self.assertNotEqual(namespace_version(INVENTORY), inventory)
+
+        # Selling out changes what the in-stock filter shows
+        url = reverse('list_category', args=[self.category.slug])
+        self.assertContains(self.client.get(url, {'in_stock': '1'}), self.product.title)
+        self.product.refresh_from_db()
+        adjust_stock(self.product, -self.product.stock, 'SALE', 'SALE')
+        self.assertEqual(namespace_version(CATALOG), catalog)
+        self.assertNotEqual(namespace_version(AVAILABILITY), availability)
+        self.assertNotIn(self.product.id, get_in_stock_ids())
+        self.assertNotContains(self.client.get(url, {'in_stock': '1'}), self.product.title)
+
+    def test_versioned_values_unreachable_after_a_bump(self):
+        self.assertEqual(get_or_compute(CATALOG, 'answer', lambda: 'old'), 'old')
+        self.assertEqual(get_or_compute(CATALOG, 'answer', lambda: 'new'), 'old')
+        self.category.save()
+        self.assertEqual(get_or_compute(CATALOG, 'answer', lambda: 'new'), 'new')
+
+    def test_deferred_bumps_sent_once(self):
+        version = get_catalog_version()
+        with deferred_invalidation():
+            self.product.save()
+            with deferred_invalidation():
+                ProductImage.objects.filter(product=self.product).update(alt_text='Updated')
+            self.assertEqual(get_catalog_version(), version)
+        self.assertNotEqual(get_catalog_version(), version)
+
+class SharedCacheCheckTests(SimpleTestCase):
+
+    def test_local_memory_cache_refused_for_several_workers(self):
+        with self.settings(WEB_CONCURRENCY=1):
+            self.assertEqual(check_shared_cache(None), [])
+        with self.settings(WEB_CONCURRENCY=4):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ['store.E001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with self.settings(WEB_CONCURRENCY=4, CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+class SeedingTests(TestCase):
+
+    def setUp(self):
+        media = media_storage()
+        self.media_root = media.__enter__()
+        self.addCleanup(media.__exit__, None, None, None)
+
+    def test_seeded_data_is_consistent(self):
+        counts = seed_store(categories=2, products=5, users=3, orders=10, ledger_rows=40, images=2, prefix='t')
+
+        self.assertEqual(counts['products'], 5)
+        self.assertGreaterEqual(counts['ledger_rows'], 40)
+        self.assertEqual(find_discrepancies(), [])
+        oldest = Order.objects.order_by('date_ordered').first().date_ordered
+        self.assertLess(oldest, timezone.now() - timedelta(days=1))
+        # Historic dates without switching auto_now_add off for everyone else
+        self.assertTrue(Order._meta.get_field('date_ordered').auto_now_add)
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media_root, 'images', 't'))),
+                         ['placeholder-00.png', 'placeholder-01.png'])
+
+    def test_clear_removes_the_prefix_only(self):
+        seed_store(categories=1, products=2, users=1, orders=2, ledger_rows=5, images=1, prefix='keep')
+        seed_store(categories=1, products=2, users=1, orders=2, ledger_rows=5, images=1, prefix='gone')
+        clear_seeded('gone')
+
+        self.assertFalse(Product.objects.filter(slug__startswith='gone-').exists())
+        self.assertFalse(Order.objects.filter(email__endswith='@gone.example').exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, 'images', 'gone')), [])
+        self.assertEqual(Product.objects.filter(slug__startswith='keep-').count(), 2)
+        self.assertTrue(Category.objects.filter(slug__startswith='keep-').exists())
+        self.assertEqual(find_discrepancies(), [])
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -5,5 +6,6 @@ urlpatterns = [
     path('', views.store, name='store'),
     path('product/<slug:product_slug>/', views.product_info, name='product_info'),
     path('search/<slug:category_slug>/', views.list_category, name='list_category'),
-    path('live-search/', views.live_search, name='live_search'),
+    path('live-search/', views.async_live_search if settings.ASYNC_VIEWS else views.live_search, name='live_search'),
+    path('suggest/', views.suggest, name='suggest'),
 ]
\ No newline at end of file
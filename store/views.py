@@ -1,31 +1,103 @@
 from django.shortcuts import render
-from . models import Category, Product
-from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from . models import Product
+from django.http import Http404, JsonResponse
 from django.db.models import Q
+from django.views.decorators.http import condition
+
+from .cache import (
+    acondition, alive_search_etag, alive_search_last_modified, cache_anonymous_page, catalog_page_etag,
+    catalog_page_last_modified, category_page_etag, category_page_last_modified, get_requested_product,
+    live_search_etag, live_search_last_modified, product_page_etag, product_page_last_modified,
+)
+from .facets import get_facets, matches_filters, parse_filters
+from .invalidation import AVAILABILITY, CATALOG
+from .snapshot import get_catalog_snapshot, get_in_stock_ids
+from .suggest import get_suggestion_index
 
 # Create your views here.
+@condition(etag_func=catalog_page_etag, last_modified_func=catalog_page_last_modified)
+@cache_anonymous_page
 def store(request):
-    all_products = Product.objects.prefetch_related('images').all()
+    all_products = get_catalog_snapshot().products
     context = {'my_products': all_products}
     return render(request, 'store/store.html', context=context)
 
 def categories(request):
-    all_categories = Category.objects.all()
+    all_categories = get_catalog_snapshot().categories
     return {'all_categories': all_categories}
 
+@condition(etag_func=category_page_etag, last_modified_func=category_page_last_modified)
+@cache_anonymous_page(namespaces=(CATALOG, AVAILABILITY))
 def list_category(request, category_slug=None):
-    category = get_object_or_404(Category, slug=category_slug)
-    products = Product.objects.filter(category=category).prefetch_related('images')
-    context = {'category': category, 'products': products}
+    category = get_catalog_snapshot().get_category_by_slug(category_slug)
+    if category is None:
+        raise Http404('No Category matches the given query.')
+    selected = parse_filters(request.GET)
+    in_stock_ids = get_in_stock_ids() if selected['in_stock'] else frozenset()
+    products = [product for product in category.products if matches_filters(product, selected, in_stock_ids)]
+    context = {
+        'category': category,
+        'products': products,
+        'facets': get_facets(category),
+        'selected': selected,
+    }
     return render(request, 'store/list_category.html', context=context)
 
+@condition(etag_func=product_page_etag, last_modified_func=product_page_last_modified)
+@cache_anonymous_page
 def product_info(request, product_slug):
-    product = get_object_or_404(Product, slug=product_slug)
-    product_images = product.images.all()
+    product = get_requested_product(request, product_slug)
+    if product is None:
+        raise Http404('No Product matches the given query.')
+    product_images = product.images
     context = {'product': product, 'product_images': product_images}
     return render(request, 'store/product_info.html', context=context)
 
+def suggest(request):
+    """
+    Type-ahead suggestions for the search box, served from the in-process index
+    Returns JSON with up to 8 popular products whose title or brand words start with the query words
+    """
+    query = request.GET.get('q', '')[:100]
+    suggestions = [
+        {'id': product_id, 'title': title, 'brand': brand}
+        for product_id, title, brand, sold in get_suggestion_index().search(query)
+    ]
+    return JsonResponse({'status': 'success', 'suggestions': suggestions})
+
+def _live_search_products(query):
+    # Search in title, brand, and description
+    return Product.objects.filter(
+        Q(title__icontains=query) | 
+        Q(brand__icontains=query) | 
+        Q(description__icontains=query),
+        available=True  # Only show available products
+    ).prefetch_related('images')[:20]  # Limit to 20 results for performance
+
+def _live_search_result(product):
+    main_image_url = ''
+    main_image = product.get_main_product_image()
+    if main_image:
+        main_image_url = main_image.get_rendition_url('thumb')
+
+    return {
+        'id': product.id,
+        'title': product.title,
+        'brand': product.brand,
+        'price': str(product.price),
+        'slug': product.slug,
+        'image_url': main_image_url,
+        'url': product.get_absolute_url()
+    }
+
+def _live_search_response(results):
+    return JsonResponse({
+        'status': 'success',
+        'results': results,
+        'count': len(results)
+    })
+
+@condition(etag_func=live_search_etag, last_modified_func=live_search_last_modified)
 def live_search(request):
     """
     Handle live search requests via AJAX
@@ -35,41 +107,30 @@ def live_search(request):
         query = request.GET.get('q', '').strip()
         
         if query:
-            # Search in title, brand, and description
-            products = Product.objects.filter(
-                Q(title__icontains=query) | 
-                Q(brand__icontains=query) | 
-                Q(description__icontains=query),
-                available=True  # Only show available products
-            ).prefetch_related('images')[:20]  # Limit to 20 results for performance
-            
-            # Prepare data for JSON response
-            results = []
-            for product in products:
-                main_image_url = ''
-                if product.get_main_image():
-                    main_image_url = product.get_main_image().url
-                
-                results.append({
-                    'id': product.id,
-                    'title': product.title,
-                    'brand': product.brand,
-                    'price': str(product.price),
-                    'slug': product.slug,
-                    'image_url': main_image_url,
-                    'url': product.get_absolute_url()
-                })
-            
-            return JsonResponse({
-                'status': 'success',
-                'results': results,
-                'count': len(results)
-            })
+            return _live_search_response([_live_search_result(product) for product in _live_search_products(query)])
         else:
-            return JsonResponse({
-                'status': 'success',
-                'results': [],
-                'count': 0
-            })
+            return _live_search_response([])
     
-    return JsonResponse({'status': 'error', 'message': 'Invalid request'})
\ No newline at end of file
+    return JsonResponse({'status': 'error', 'message': 'Invalid request'})
+
+@acondition(etag_func=alive_search_etag, last_modified_func=alive_search_last_modified)
+async def async_live_search(request):
+    """
+    live_search for ASGI deployments (see ASYNC_VIEWS)
+
+    The query runs through the async ORM and the validators read the catalog
+    version with the async cache API, so a worker waiting on either for one
+    keystroke keeps serving the others from its event loop.
+    """
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        query = request.GET.get('q', '').strip()
+
+        if query:
+            # Images are prefetched with the products, so building results doesn't query
+            return _live_search_response(
+                [_live_search_result(product) async for product in _live_search_products(query)]
+            )
+        else:
+            return _live_search_response([])
+
+    return JsonResponse({'status': 'error', 'message': 'Invalid request'})